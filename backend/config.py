@@ -2,45 +2,273 @@
 config.py - Configuration module for the KnowPilot application.
 
 This module loads the YAML configuration from config/config.yaml and provides
-global constants for the application, including database settings and LLM prompt templates.
+the application settings, including database settings and LLM prompt templates.
+
+The file is read lazily on first access and cached, so importing this module
+(and everything that depends on it) costs nothing. Set the KNOWPILOT_CONFIG
+environment variable to load a different file, and KNOWPILOT_SQLITE_PATH to
+override the database location.
+
+The cache is keyed by the file's modification time, so edits (e.g. to the
+prompt templates) are picked up on the next access without a restart. Settings
+that are only used at startup, such as the database URL or the HTTP middleware
+options, still need a restart.
+
+Settings are read through get_settings(). The legacy module-level constants
+(e.g. QA_PROMPT_TEMPLATE) remain available and are resolved on first access.
 """
 import os
-from typing import Dict, Any
-import yaml
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Any, Optional
 
 # ----------------------
 # Configuration Loading
 # ----------------------
 
-# Path to the configuration file
+# Path to the default configuration file
 CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config", "config.yaml"))
 
-# Load configuration from YAML file
-with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-    CONFIG: Dict[str, Any] = yaml.safe_load(f)
+# Environment variables overriding the configuration
+CONFIG_PATH_ENV = "KNOWPILOT_CONFIG"
+SQLITE_PATH_ENV = "KNOWPILOT_SQLITE_PATH"
 
-# ----------------------
-# Database Configuration
-# ----------------------
 
-DB_CONFIG = CONFIG["database"]
-DB_ENGINE = DB_CONFIG.get("engine", "sqlite")
-SQLITE_DB_PATH = os.path.abspath(DB_CONFIG["sqlite_path"])
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{SQLITE_DB_PATH}"
-SQL_ECHO = DB_CONFIG.get("echo", False)
+@dataclass(frozen=True)
+class Settings:  # pylint: disable=too-many-instance-attributes
+    """
+    Settings - Application settings parsed from the YAML configuration.
+    """
+    config: Dict[str, Any]
 
-# ----------------------
-# LLM API Configuration
-# ----------------------
+    # Database
+    db_engine: str
+    sqlite_db_path: str
+    sqlalchemy_database_url: str
+    sql_echo: bool
+
+    # LLM service
+    llm_base_url: str
+    llm_model: str
+    llm_timeout: float
+    structured_output: bool
+    structured_retries: int
+    structured_extra_tokens: int
+    generation_presets: Dict[str, Dict[str, Any]]
+    input_chars_per_token: float
+    input_budgets: Dict[str, Dict[str, Any]]
+    routing_enabled: bool
+    routing_rules: Dict[str, Dict[str, Any]]
+    warmup_enabled: bool
+    warmup_keep_alive: Any
+    warmup_refresh_interval: float
+    warmup_retry_interval: float
+    warmup_timeout: float
+    hedging_enabled: bool
+    hedging_quantile: float
+    hedging_min_samples: int
+    hedging_min_delay: float
+    breaker_enabled: bool
+    breaker_failure_threshold: int
+    breaker_reset_timeout: float
+    breaker_max_pause: float
+
+    # HTTP
+    gzip_minimum_size: int
+    gzip_compress_level: int
+    response_cache_enabled: bool
+    response_cache_max_entries: int
+
+    # Profiling
+    profiling_header_enabled: bool
+    profiling_sample_interval: float
+    profiling_max_profiles: int
+    profiling_traceback_frames: int
+    profiling_top_allocations: int
+
+    # LLM prompts: static system prompts, per-row templates and free-text formats
+    qa_system_prompt: str
+    qa_prompt_template: str
+    qa_text_format: str
+    knowledge_system_prompt: str
+    knowledge_prompt_template: str
+    knowledge_text_format: str
+    content_group_question_system_prompt: str
+    content_group_question_template: str
+    content_group_question_text_format: str
+
+    # Bulk write-back
+    writeback_batch_size: int
+    writeback_flush_interval: float
+    outcome_retention_days: float
+
+    # Near-duplicate detection
+    dedup_enabled: bool
+    dedup_similarity_threshold: float
+    dedup_shingle_size: int
+    dedup_num_permutations: int
+
+    # Embeddings and content grouping
+    embedding_model: str
+    embedding_batch_size: int
+    embedding_timeout: float
+    embedding_index_path: str
+    embedding_sync_on_startup: bool
+    grouping_mode: str
+    grouping_block_size: int
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "Settings":
+        """
+        Build settings from a parsed configuration dictionary.
+        """
+        # Database Configuration
+        db_config = config["database"]
+        sqlite_db_path = os.path.abspath(
+            os.environ.get(SQLITE_PATH_ENV) or db_config["sqlite_path"]
+        )
+
+        # LLM Service Configuration
+        llm_config = config.get("llm", {})
+        warmup_config = llm_config.get("warmup", {})
+        hedging_config = llm_config.get("hedging", {})
+        breaker_config = llm_config.get("circuit_breaker", {})
+        budget_config = dict(llm_config.get("input_budget", {}))
+        chars_per_token = budget_config.pop("chars_per_token", 4)
+        routing_config = dict(llm_config.get("routing", {}))
+        routing_enabled = routing_config.pop("enabled", False)
+
+        # HTTP Configuration
+        http_config = config.get("http", {})
+
+        # Profiling Configuration
+        profiling_config = config.get("profiling", {})
+
+        # LLM API Configuration
+        prompts_config = config.get("prompts", {})
+
+        # Write-back Configuration
+        writeback_config = config.get("writeback", {})
+
+        # Near-duplicate Detection Configuration
+        dedup_config = config.get("dedup", {})
+
+        # Embedding and Grouping Configuration
+        embedding_config = config.get("embedding", {})
+        grouping_config = config.get("grouping", {})
+
+        return cls(
+            config=config,
+            db_engine=db_config.get("engine", "sqlite"),
+            sqlite_db_path=sqlite_db_path,
+            sqlalchemy_database_url=f"sqlite:///{sqlite_db_path}",
+            sql_echo=db_config.get("echo", False),
+            llm_base_url=llm_config.get("base_url", "http://localhost:11434"),
+            llm_model=llm_config.get("model", "llama3.2"),
+            llm_timeout=llm_config.get("timeout", 60),
+            structured_output=llm_config.get("structured_output", False),
+            structured_retries=llm_config.get("structured_retries", 1),
+            structured_extra_tokens=llm_config.get("structured_extra_tokens", 64),
+            generation_presets=llm_config.get("generation", {}),
+            input_chars_per_token=chars_per_token,
+            input_budgets=budget_config,
+            routing_enabled=routing_enabled,
+            routing_rules=routing_config,
+            warmup_enabled=warmup_config.get("enabled", False),
+            warmup_keep_alive=warmup_config.get("keep_alive", "30m"),
+            warmup_refresh_interval=warmup_config.get("refresh_interval", 300),
+            warmup_retry_interval=warmup_config.get("retry_interval", 30),
+            warmup_timeout=warmup_config.get("timeout", 300),
+            hedging_enabled=hedging_config.get("enabled", False),
+            hedging_quantile=hedging_config.get("quantile", 0.95),
+            hedging_min_samples=hedging_config.get("min_samples", 20),
+            hedging_min_delay=hedging_config.get("min_delay", 1.0),
+            breaker_enabled=breaker_config.get("enabled", False),
+            breaker_failure_threshold=breaker_config.get("failure_threshold", 5),
+            breaker_reset_timeout=breaker_config.get("reset_timeout", 30),
+            breaker_max_pause=breaker_config.get("max_pause", 300),
+            gzip_minimum_size=http_config.get("gzip_minimum_size", 1024),
+            gzip_compress_level=http_config.get("gzip_compress_level", 6),
+            response_cache_enabled=http_config.get("response_cache_enabled", True),
+            response_cache_max_entries=http_config.get("response_cache_max_entries", 32),
+            profiling_header_enabled=profiling_config.get("header_enabled", False),
+            profiling_sample_interval=profiling_config.get("sample_interval", 0.005),
+            profiling_max_profiles=profiling_config.get("max_profiles", 20),
+            profiling_traceback_frames=profiling_config.get("traceback_frames", 10),
+            profiling_top_allocations=profiling_config.get("top_allocations", 30),
+            # Prompts for generating questions and answers
+            qa_system_prompt=prompts_config.get("qa_system", ""),
+            qa_prompt_template=prompts_config.get("qa_template", ""),
+            qa_text_format=prompts_config.get("qa_text_format", ""),
+            # Prompts for extracting knowledge points
+            knowledge_system_prompt=prompts_config.get("knowledge_system", ""),
+            knowledge_prompt_template=prompts_config.get("knowledge_template", ""),
+            knowledge_text_format=prompts_config.get("knowledge_text_format", ""),
+            # Prompts for generating single-choice questions
+            content_group_question_system_prompt=prompts_config.get(
+                "content_group_question_system", ""
+            ),
+            content_group_question_template=prompts_config.get(
+                "content_group_question_template", ""
+            ),
+            content_group_question_text_format=prompts_config.get(
+                "content_group_question_text_format", ""
+            ),
+            writeback_batch_size=writeback_config.get("batch_size", 50),
+            writeback_flush_interval=writeback_config.get("flush_interval", 5),
+            outcome_retention_days=writeback_config.get("outcome_retention_days", 7),
+            dedup_enabled=dedup_config.get("enabled", False),
+            dedup_similarity_threshold=dedup_config.get("similarity_threshold", 0.8),
+            dedup_shingle_size=dedup_config.get("shingle_size", 3),
+            dedup_num_permutations=dedup_config.get("num_permutations", 128),
+            embedding_model=embedding_config.get("model", "nomic-embed-text"),
+            embedding_batch_size=embedding_config.get("batch_size", 64),
+            embedding_timeout=embedding_config.get("timeout", 120),
+            embedding_index_path=embedding_config.get("index_path", "./data/embeddings"),
+            embedding_sync_on_startup=embedding_config.get("sync_on_startup", False),
+            grouping_mode=grouping_config.get("mode", "sequential"),
+            grouping_block_size=grouping_config.get("block_size", 256),
+        )
+
+
+def get_config_path() -> str:
+    """
+    Return the path of the configuration file, honouring KNOWPILOT_CONFIG.
+    """
+    return os.path.abspath(os.environ.get(CONFIG_PATH_ENV) or CONFIG_PATH)
+
+
+@lru_cache(maxsize=1)
+def _load_settings(config_path: str, mtime_ns: Optional[int]) -> Settings:
+    """
+    Load and parse the settings; cached per file path and modification time.
+    """
+    import yaml  # pylint: disable=import-outside-toplevel
+
+    with open(config_path, "r", encoding="utf-8") as f:
+        config: Dict[str, Any] = yaml.safe_load(f)
+    return Settings.from_config(config)
 
-# Load prompt templates from config
-PROMPTS_CONFIG = CONFIG.get("prompts", {})
 
-# Template for generating questions and answers
-QA_PROMPT_TEMPLATE = PROMPTS_CONFIG.get("qa_template", "")
+def get_settings() -> Settings:
+    """
+    Return the application settings, reloading them when the configuration
+    file has changed since it was last read.
+    """
+    config_path = get_config_path()
+    try:
+        mtime_ns = os.stat(config_path).st_mtime_ns
+    except OSError:
+        mtime_ns = None  # Let the load report the missing file
+    return _load_settings(config_path, mtime_ns)
 
-# Template for extracting knowledge points
-KNOWLEDGE_PROMPT_TEMPLATE = PROMPTS_CONFIG.get("knowledge_template", "")
 
-# Template for generating single-choice questions
-CONTENT_GROUP_QUESTION_TEMPLATE = PROMPTS_CONFIG.get("content_group_question_template", "")
+def __getattr__(name: str) -> Any:
+    """
+    Resolve the legacy upper-case constants (e.g. SQLITE_DB_PATH) lazily.
+    """
+    if name == "CONFIG":
+        return get_settings().config
+    if name.isupper() and name.lower() in Settings.__dataclass_fields__:
+        return getattr(get_settings(), name.lower())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,12 +2,187 @@
 crud.py - Contains database CRUD operations for Question objects.
 Functions include create, read, and list questions.
 """
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from backend.models import Question
+from sqlalchemy.sql import ColumnElement
+from backend.models import GenerationOutcome, Question, STATUS_PENDING, STATUS_DONE, STATUS_FAILED
 
 def get_all_questions(db: Session):
     return db.query(Question).all()
 
+def get_question_rows(db: Session, *columns):
+    """
+    Fetch the given Question columns for all rows as plain dicts,
+    without materializing ORM objects.
+    """
+    return [row._asdict() for row in db.query(*columns).all()]
+
+def question_filters(task: str,
+                     ids: Optional[List[int]] = None,
+                     sections: Optional[List[str]] = None,
+                     statuses: Optional[List[str]] = None,
+                     exclude_prompt_version: Optional[str] = None) -> List[ColumnElement]:
+    """
+    Build the WHERE conditions selecting questions for a generation task
+    ("knowledge" or "qa"). Filters left as None are not applied.
+
+    Args:
+        task: Generation task whose status and prompt version are filtered on
+        ids: Only these question ids
+        sections: Only questions in these sections
+        statuses: Only rows with one of these generation statuses
+        exclude_prompt_version: Only rows not generated with this prompt version
+    """
+    conditions = []
+    if ids is not None:
+        conditions.append(Question.id.in_(ids))
+    if sections is not None:
+        conditions.append(Question.section.in_(sections))
+    if statuses is not None:
+        conditions.append(getattr(Question, f"{task}_status").in_(statuses))
+    if exclude_prompt_version is not None:
+        prompt_version = getattr(Question, f"{task}_prompt_version")
+        conditions.append(prompt_version.is_(None) | (prompt_version != exclude_prompt_version))
+    return conditions
+
+def select_questions(db: Session,
+                     task: str,
+                     ids: Optional[List[int]] = None,
+                     sections: Optional[List[str]] = None,
+                     statuses: Optional[List[str]] = None,
+                     exclude_prompt_version: Optional[str] = None) -> List[Tuple[int, str]]:
+    """
+    Fetch (id, content) of the rows matching all given filters for a
+    generation task (see question_filters).
+
+    Returns:
+        List of (id, content) ordered by id
+    """
+    conditions = question_filters(task, ids, sections, statuses, exclude_prompt_version)
+    query = db.query(Question.id, Question.content).filter(*conditions)
+    return [(row.id, row.content) for row in query.order_by(Question.id).all()]
+
+def get_pending_questions(db: Session, task: str) -> List[Tuple[int, str]]:
+    """
+    Fetch (id, content) of the rows whose field for a generation task
+    ("knowledge" or "qa") is pending or failed.
+    The selection is served by the task's (status, section) index.
+    """
+    return select_questions(db, task, statuses=[STATUS_PENDING, STATUS_FAILED])
+
+def count_outdated(db: Session, task: str, prompt_version: str) -> int:
+    """
+    Count the done rows of a task that were not generated with the given prompt version.
+    """
+    version = getattr(Question, f"{task}_prompt_version")
+    return (
+        db.query(func.count(Question.id))
+        .filter(getattr(Question, f"{task}_status") == STATUS_DONE)
+        .filter(version.is_(None) | (version != prompt_version))
+        .scalar()
+    )
+
+def count_by_status(db: Session, task: str) -> Dict[str, Dict[str, int]]:
+    """
+    Count the rows per section and generation status of a task.
+
+    Returns:
+        Mapping of section to {status: count}
+    """
+    status = getattr(Question, f"{task}_status")
+    rows = (
+        db.query(Question.section, status, func.count())
+        .group_by(status, Question.section)
+        .all()
+    )
+    counts: Dict[str, Dict[str, int]] = {}
+    for section, row_status, count in rows:
+        counts.setdefault(section, {})[row_status] = count
+    return counts
+
+def outcome_entry(outcome) -> Dict[str, Any]:
+    """
+    Convert a generation outcome row into a processed-row entry:
+    successes carry the question, failures an error, skipped rows a reason.
+    """
+    entry = {"row_id": outcome.row_id, "status": outcome.status}
+    if outcome.status == "success":
+        entry.update(question=outcome.question, correct_answer=outcome.correct_answer)
+    elif outcome.status == "skipped":
+        entry["reason"] = outcome.error
+    else:
+        entry["error"] = outcome.error
+    return entry
+
+def get_generation_outcomes(db: Session,
+                            job_id: str,
+                            statuses: Optional[List[str]] = None,
+                            limit: Optional[int] = None,
+                            offset: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Fetch the processed-row entries of a generation job in row order.
+
+    Args:
+        db: Database session
+        job_id: Job whose outcomes are fetched
+        statuses: Only outcomes with these statuses
+        limit: Maximum number of entries (all if None)
+        offset: Number of entries to skip
+
+    Returns:
+        Tuple of (total number of matching outcomes, entries of the page)
+    """
+    query = db.query(GenerationOutcome).filter(GenerationOutcome.job_id == job_id)
+    if statuses is not None:
+        query = query.filter(GenerationOutcome.status.in_(statuses))
+    total = query.with_entities(func.count(GenerationOutcome.id)).scalar()
+    page = query.order_by(GenerationOutcome.id).offset(offset).limit(limit).all()
+    return total, [outcome_entry(outcome) for outcome in page]
+
+def count_generation_outcomes(db: Session, job_id: str) -> Dict[str, int]:
+    """
+    Count the outcomes of a generation job per status.
+    """
+    rows = (
+        db.query(GenerationOutcome.status, func.count(GenerationOutcome.id))
+        .filter(GenerationOutcome.job_id == job_id)
+        .group_by(GenerationOutcome.status)
+        .all()
+    )
+    return dict(rows)
+
+def delete_generation_outcomes(db: Session, job_id: str) -> int:
+    """
+    Delete the outcomes of a generation job.
+
+    Returns:
+        Number of deleted outcomes
+    """
+    deleted = (
+        db.query(GenerationOutcome)
+        .filter(GenerationOutcome.job_id == job_id)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+def prune_generation_outcomes(db: Session, older_than: datetime) -> int:
+    """
+    Delete the outcomes recorded before older_than, of any job.
+
+    Returns:
+        Number of deleted outcomes
+    """
+    deleted = (
+        db.query(GenerationOutcome)
+        .filter(GenerationOutcome.created_at < older_than)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
 def get_all_facts(db: Session):
     return db.query(Question).all()
 
@@ -1,23 +1,56 @@
 """
 database.py - Sets up the SQLAlchemy engine and session factory.
 Reads connection config from config.py.
+
+The engine is created on first use rather than at import time, so tools that
+only import models or schemas do not open the database.
 """
+from functools import lru_cache
+from typing import Any
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from backend.config import SQLALCHEMY_DATABASE_URL, SQL_ECHO
+from backend.config import get_settings
+
+
+class _LazySessionMaker(sessionmaker):
+    """
+    Session factory that binds itself to the engine on the first session.
+    """
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            get_engine()
+        return super().__call__(**local_kw)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    echo=SQL_ECHO
-)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = _LazySessionMaker(autocommit=False, autoflush=False)
 
 # Create Base class for models
 Base = declarative_base()
 
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    """
+    Create the SQLAlchemy engine on first use and bind the session factory to it.
+    """
+    settings = get_settings()
+    engine = create_engine(
+        settings.sqlalchemy_database_url,
+        connect_args={"check_same_thread": False},
+        echo=settings.sql_echo
+    )
+    SessionLocal.configure(bind=engine)
+    return engine
+
+def __getattr__(name: str) -> Any:
+    """
+    Keep `from backend.database import engine` working by creating the engine lazily.
+    """
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 def get_db():
     """
     Dependency to get the database session.
@@ -0,0 +1,256 @@
+"""
+generate_batch.py - Runs knowledge point, Q&A and content group generation
+from the command line, without the web server.
+
+Rows are handed out to the worker processes through leases in the database
+(see services/lease_services.py), so a run can also be split across machines
+sharing the database file: start the same command on each of them. Each task
+ends with a throughput report.
+
+Usage:
+    python -m backend.generate_batch --tasks knowledge qa --workers 4
+    python -m backend.generate_batch --tasks knowledge --sections "Chapter 1" --outdated
+    python -m backend.generate_batch --tasks content-group --k 4 5
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import MetaData, Table, func, inspect, select
+from sqlalchemy.orm import Session
+
+from backend.crud import question_filters, select_questions
+from backend.database import SessionLocal, get_engine
+from backend.migrations import run_migrations
+from backend.models import LLMCallStat, Question, STATUS_DONE, STATUS_FAILED, STATUS_PENDING
+from backend.services.bulk_services import (
+    generate_content_group_bulk,
+    generate_knowledge_bulk,
+    generate_qa_bulk
+)
+from backend.services.generation_services import get_prompt_version
+from backend.services.lease_services import claim_rows, keep_leases, release_leases
+from backend.services.llm_stats_services import LLM_STATS
+from backend.services.resilience_services import wait_for_llm
+
+TASK_CHOICES = ("knowledge", "qa", "content-group")
+
+
+@dataclass(frozen=True)
+class BatchJob:
+    """
+    One task of a batch run: what to generate, for which rows and in which portions.
+    """
+    task: str                       # "knowledge", "qa" or a content group table name
+    ids: Optional[List[int]] = None
+    sections: Optional[List[str]] = None
+    statuses: Optional[List[str]] = None
+    outdated: bool = False
+    all_rows: bool = False          # Content groups: also rows that have a question
+    job_id: Optional[str] = None    # Content groups: job the row outcomes are recorded under
+    batch_size: int = 20
+    lease_seconds: float = 600
+
+    @property
+    def llm_task(self) -> str:
+        """Task name used by the generation services and the LLM statistics."""
+        return self.task if self.task in ("knowledge", "qa") else "content_group"
+
+
+def _selection(job: BatchJob) -> Tuple[Table, list]:
+    """
+    Return the table and WHERE conditions selecting the rows a job generates.
+    """
+    if job.llm_task != "content_group":
+        statuses = job.statuses or (
+            [STATUS_DONE] if job.outdated else [STATUS_PENDING, STATUS_FAILED]
+        )
+        exclude_prompt_version = get_prompt_version(job.task) if job.outdated else None
+        conditions = question_filters(
+            job.task, job.ids, job.sections, statuses, exclude_prompt_version
+        )
+        return Question.__table__, conditions
+
+    table = Table(job.task, MetaData(), autoload_with=get_engine())
+    conditions = [] if job.all_rows else [table.c.question.is_(None)]
+    if job.ids is not None:
+        conditions.append(table.c.id.in_(job.ids))
+    return table, conditions
+
+
+def _generate(db: Session, job: BatchJob, table: Table, ids: List[int]) -> Dict[str, Any]:
+    """
+    Generate the claimed rows with the task's bulk pipeline.
+    """
+    if job.llm_task == "knowledge":
+        return generate_knowledge_bulk(db, select_questions(db, "knowledge", ids=ids))
+    if job.llm_task == "qa":
+        return generate_qa_bulk(db, select_questions(db, "qa", ids=ids))
+    rows = db.execute(
+        select(table).where(table.c.id.in_(ids)).order_by(table.c.id)
+    ).mappings().all()
+    return generate_content_group_bulk(db, job.task, rows, job_id=job.job_id)
+
+
+def run_worker(job: BatchJob, owner: str) -> Dict[str, int]:
+    """
+    Claim and generate batches of rows until none are left or the LLM stays down.
+    Runs in a worker process, with its own engine and session; its leases are
+    renewed in the background while it runs.
+
+    Returns:
+        Numbers of processed, generated and failed rows
+    """
+    totals = {"rows": 0, "success": 0, "failed": 0}
+    table, conditions = _selection(job)
+    with SessionLocal() as db, keep_leases(owner, job.lease_seconds):
+        while wait_for_llm():
+            ids = claim_rows(
+                db, job.task, table, conditions, owner, job.batch_size, job.lease_seconds
+            )
+            if not ids:
+                break
+            result = _generate(db, job, table, ids)
+            totals["rows"] += len(ids)
+            totals["success"] += result["success_count"]
+            totals["failed"] += result["failure_count"]
+            print(f"[{owner}] {job.task}: {totals['rows']} rows, "
+                  f"{totals['success']} generated, {totals['failed']} failed", flush=True)
+    LLM_STATS.flush()
+    return totals
+
+
+def _llm_totals(task: str, started_at: datetime) -> Dict[str, int]:
+    """
+    Sum the statistics of the LLM calls a task made since started_at, on any machine.
+    """
+    with SessionLocal() as db:
+        row = db.query(
+            func.count(LLMCallStat.id).label("calls"),
+            func.coalesce(func.sum(LLMCallStat.prompt_eval_count), 0).label("prompt_tokens"),
+            func.coalesce(func.sum(LLMCallStat.eval_count), 0).label("eval_tokens"),
+        ).filter(LLMCallStat.task == task, LLMCallStat.created_at >= started_at).one()
+    return row._asdict()
+
+
+def run_job(job: BatchJob, workers: int) -> Dict[str, Any]:
+    """
+    Run a job with the given number of worker processes and measure its throughput.
+    """
+    started_at = datetime.now()
+    started = time.perf_counter()
+    owners = [f"{socket.gethostname()}:{os.getpid()}:{index}" for index in range(workers)]
+    try:
+        if workers == 1:
+            results = [run_worker(job, owners[0])]
+        else:
+            # Spawned workers create their own engine instead of sharing the parent's
+            with multiprocessing.get_context("spawn").Pool(workers) as pool:
+                results = pool.starmap(run_worker, [(job, owner) for owner in owners])
+    finally:
+        with SessionLocal() as db:
+            release_leases(db, owners)
+    elapsed = time.perf_counter() - started
+
+    report = {"task": job.task, "workers": workers, "seconds": round(elapsed, 1)}
+    for key in ("rows", "success", "failed"):
+        report[key] = sum(result[key] for result in results)
+    report.update(_llm_totals(job.llm_task, started_at))
+    report["rows_per_minute"] = round(report["rows"] / elapsed * 60, 1) if elapsed else 0.0
+    report["eval_tokens_per_second"] = round(report["eval_tokens"] / elapsed, 1) if elapsed else 0.0
+    return report
+
+
+def print_report(reports: List[Dict[str, Any]]) -> None:
+    """
+    Print the throughput of every job as a table.
+    """
+    columns = ["task", "workers", "rows", "success", "failed", "seconds",
+               "rows_per_minute", "calls", "prompt_tokens", "eval_tokens",
+               "eval_tokens_per_second"]
+    widths = [max(len(column), *(len(str(report[column])) for report in reports))
+              for column in columns]
+    print()
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for report in reports:
+        print("  ".join(str(report[column]).ljust(width)
+                        for column, width in zip(columns, widths)))
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Generate knowledge points, Q&A pairs and content group questions in batch."
+    )
+    parser.add_argument("--tasks", nargs="+", choices=TASK_CHOICES, default=["knowledge", "qa"],
+                        help="Tasks to run, in this order (default: knowledge qa)")
+    parser.add_argument("--k", nargs="+", type=int, default=[],
+                        help="Content group sizes to generate questions for (content-group task)")
+    parser.add_argument("--ids", nargs="+", type=int,
+                        help="Only rows with these ids")
+    parser.add_argument("--sections", nargs="+",
+                        help="Only questions in these sections (knowledge, qa)")
+    parser.add_argument("--statuses", nargs="+",
+                        choices=(STATUS_PENDING, STATUS_DONE, STATUS_FAILED),
+                        help="Only questions with these statuses (default: pending failed)")
+    parser.add_argument("--outdated", action="store_true",
+                        help="Regenerate done questions produced by an older prompt (knowledge, qa)")
+    parser.add_argument("--all-rows", action="store_true",
+                        help="Also regenerate content group rows that have a question")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes on this machine (default: 1)")
+    parser.add_argument("--batch-size", type=int, default=20,
+                        help="Rows claimed per lease (default: 20)")
+    parser.add_argument("--lease-seconds", type=float, default=600,
+                        help="Seconds before rows of a crashed worker are handed out again "
+                             "(default: 600)")
+    args = parser.parse_args(argv)
+    if "content-group" in args.tasks and not args.k:
+        parser.error("the content-group task needs --k")
+    if args.workers < 1 or args.batch_size < 1:
+        parser.error("--workers and --batch-size must be positive")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    run_migrations(get_engine())
+
+    jobs = []
+    for task in args.tasks:
+        if task == "content-group":
+            table_names = [f"content_group_{k}" for k in args.k]
+            inspector = inspect(get_engine())
+            missing = [name for name in table_names if not inspector.has_table(name)]
+            if missing:
+                raise SystemExit(f"Content group tables do not exist: {', '.join(missing)}")
+        else:
+            table_names = [task]
+        jobs.extend(
+            BatchJob(
+                task=name,
+                ids=args.ids,
+                sections=args.sections,
+                statuses=args.statuses,
+                outdated=args.outdated,
+                all_rows=args.all_rows,
+                job_id=uuid.uuid4().hex if task == "content-group" else None,
+                batch_size=args.batch_size,
+                lease_seconds=args.lease_seconds
+            )
+            for name in table_names
+        )
+
+    print_report([run_job(job, args.workers) for job in jobs])
+    for job in jobs:
+        if job.job_id:
+            print(f"Row outcomes of {job.task}: GET /content-group/outcomes/{job.job_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,22 @@
 import_docx_to_db.py - Extracts structured data from a Word .docx file
 and stores it into the SQLite database using SQLAlchemy.
 """
-from docx import Document
 from sqlalchemy.exc import SQLAlchemyError
 import os
-from backend.database import engine, SessionLocal
+from backend.database import get_engine, SessionLocal
 from backend.models import Base, Question
-from backend.config import SQLITE_DB_PATH
+from backend.migrations import run_migrations
+from backend.config import get_settings
+from backend.services.docx_services import iter_docx_rows
 
 def init_db_if_needed():
     """
     Checks if the SQLite database exists and is not empty.
     """
-    print(f"Checking database at {SQLITE_DB_PATH}")
-    if not os.path.exists(SQLITE_DB_PATH) or not os.path.getsize(SQLITE_DB_PATH):
+    sqlite_db_path = get_settings().sqlite_db_path
+    engine = get_engine()
+    print(f"Checking database at {sqlite_db_path}")
+    if not os.path.exists(sqlite_db_path) or not os.path.getsize(sqlite_db_path):
         print("Creating database tables...")
         Base.metadata.create_all(bind=engine)
         print("Database tables created.")
@@ -22,6 +25,8 @@ def init_db_if_needed():
         print("Database already exists, ensuring tables...")
         # Ensure tables exist
         Base.metadata.create_all(bind=engine)
+    # Ensure the search index and its triggers exist before rows are inserted
+    run_migrations(engine)
 
 def load_questions_from_docx(docx_path):
     """
@@ -32,70 +37,40 @@ def load_questions_from_docx(docx_path):
 
     init_db_if_needed()
     
-    doc = Document(docx_path)
     session = SessionLocal()
-
-    section = "Unknown Section"
-    table_index = 0
-    total_tables = len(doc.tables)
     imported_count = 0
 
     print("Importing from:", docx_path)
 
-    for block in doc.element.body:
-        if block.tag.endswith('}p'):
-            text = ''.join(t.text for t in block.iter() if t.tag.endswith('}t')).strip()
-            if text.lower().startswith("section"):
-                section = text  
-                print(f"Found section: {section}")
-
-        elif block.tag.endswith('}tbl') and table_index < total_tables:
-            table = doc.tables[table_index]
-            table_index += 1
-
-            for i, row in enumerate(table.rows):
-                if i == 0:
-                    continue  # skip header
+    # Rows are streamed from the document; header and empty rows are already skipped
+    for row in iter_docx_rows(docx_path):
+        try:
+            q = Question(
+                section=row.section,
+                seq=row.seq,
+                page_name=row.page_name,
+                audio_file=row.audio_file,
+                content=row.content,
+                knowledge_point="To be added",  
+                question="To be added",        
+                answer="To be added"
+            )
+            session.add(q)
+            imported_count += 1
 
+            # Every 100 records, commit to the database
+            if imported_count % 100 == 0:
                 try:
-                    seq = row.cells[0].text.strip()
-                    page_name = row.cells[1].text.strip()
-                    audio_file = row.cells[2].text.strip()
-                    content = row.cells[3].text.strip()
-
-                    if not content:
-                        continue
-
-                    q = Question(
-                        section=section,
-                        seq=seq,
-                        page_name=page_name,
-                        audio_file=audio_file,
-                        content=content,
-                        knowledge_point="To be added",  
-                        question="To be added",        
-                        answer="To be added"
-                    )
-                    session.add(q)
-                    imported_count += 1
-                    
-                    # Every 100 records, commit to the database
-                    if imported_count % 100 == 0:
-                        try:
-                            session.commit()
-                            print(f"Committed {imported_count} records so far...")
-                        except SQLAlchemyError as e:
-                            print(f"Error in batch commit: {e}")
-                            session.rollback()
-                            
-                except IndexError as e:
-                    print(f"Error accessing table cells in row {i}, table {table_index}: {e}")
-                except AttributeError as e:
-                    print(f"Error reading cell content in row {i}, table {table_index}: {e}")
+                    session.commit()
+                    print(f"Committed {imported_count} records so far...")
                 except SQLAlchemyError as e:
-                    print(f"Database error while adding row {i} from table {table_index}: {e}")
+                    print(f"Error in batch commit: {e}")
                     session.rollback()
 
+        except SQLAlchemyError as e:
+            print(f"Database error while adding row {row.seq} of {row.section}: {e}")
+            session.rollback()
+
     try:
         session.commit()
         print(f"Successfully imported {imported_count} records in total.")
@@ -106,5 +81,15 @@ def load_questions_from_docx(docx_path):
         session.close()
         print("Import complete.")
 
+    # Embed the imported questions into the semantic search index. Imported here,
+    # as it loads FastAPI, NumPy and requests that the import itself does not need
+    from fastapi import HTTPException
+    from backend.services.vector_index_services import sync_embedding_index
+    try:
+        print(f"Embedding index synced: {sync_embedding_index()}")
+    except (HTTPException, SQLAlchemyError, OSError) as e:
+        print(f"Embedding index not synced, run POST /admin/embedding-index/sync later: "
+              f"{getattr(e, 'detail', e)}")
+
 if __name__ == "__main__":
     load_questions_from_docx("data/Thunderstorm Avoidance_Boeing 20250210.docx")
\ No newline at end of file
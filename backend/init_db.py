@@ -4,15 +4,18 @@ Should be run once before starting the application.
 """
 import os
 from backend.models import Base, Question
-from backend.database import engine, SessionLocal
-from backend.config import SQLITE_DB_PATH
+from backend.database import get_engine, SessionLocal
+from backend.migrations import run_migrations
+from backend.config import get_settings
 
 def init_db():
-    if os.path.exists(SQLITE_DB_PATH):
-        print("Database already exists at:", SQLITE_DB_PATH)
+    sqlite_db_path = get_settings().sqlite_db_path
+    if os.path.exists(sqlite_db_path):
+        print("Database already exists at:", sqlite_db_path)
     else:
-        print("Creating new database at:", SQLITE_DB_PATH)
-        Base.metadata.create_all(bind=engine)
+        print("Creating new database at:", sqlite_db_path)
+        Base.metadata.create_all(bind=get_engine())
+        run_migrations(get_engine())
 
         with SessionLocal() as db:
             print("Inserting sample question...")
@@ -1,14 +1,49 @@
 """
 FastAPI application for the KnowPilot API.
 """
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+
+from backend.database import get_engine
+from backend.migrations import run_migrations
+from backend.config import get_settings
+from backend.services.llm_stats_services import LLM_STATS
+from backend.services.profiling_services import ProfilingMiddleware
+from backend.services.vector_index_services import start_embedding_index
+from backend.services.warmup_services import (
+    MODEL_RESIDENCY,
+    models_ready,
+    start_model_residency
+)
 
 # Import routers
-from backend.routers import content, knowledge, qa, content_group
+from backend.routers import content, knowledge, qa, content_group, search, stats, admin
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+    Prepare the database schema (tables, search index) before serving requests,
+    and warm up the LLM models in the background while the application runs.
+    The semantic search index is mapped and brought up to date in the background.
+    Buffered LLM statistics are written on shutdown.
+    """
+    run_migrations(get_engine())
+    residency_task = start_model_residency()
+    index_task = start_embedding_index()
+    yield
+    LLM_STATS.flush()
+    for task in (residency_task, index_task):
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
 
 # Create FastAPI instance
-app = FastAPI(title="KnowPilot API")
+app = FastAPI(title="KnowPilot API", lifespan=lifespan)
 
 # CORS setup
 origins = [
@@ -24,17 +59,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (e.g. full content listings) for clients that accept gzip
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=get_settings().gzip_minimum_size,
+    compresslevel=get_settings().gzip_compress_level,
+)
+
+# Profile requests on demand (X-Profile header or /admin/profiling); added last so
+# that it wraps the whole stack. Requests that are not profiled pass straight through.
+app.add_middleware(ProfilingMiddleware)
+
 # Include routers
 app.include_router(content.router)
 app.include_router(knowledge.router)
 app.include_router(qa.router)
 app.include_router(content_group.router)
+app.include_router(search.router)
+app.include_router(stats.router)
+app.include_router(admin.router)
 
 # Health check endpoint
 @app.get("/")
 def read_root():
     """
     Health check endpoint.
-    Returns a simple message indicating that the API is running.
+    Reports healthy once the API is running and the configured LLM models are
+    loaded; answers 503 with status "warming" until then.
     """
-    return {"status": "healthy", "message": "KnowPilot API is running"}
+    if not models_ready():
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "warming",
+                "message": "KnowPilot API is running, LLM models are loading",
+                "models": MODEL_RESIDENCY.status()
+            }
+        )
+    return {
+        "status": "healthy",
+        "message": "KnowPilot API is running",
+        "models": MODEL_RESIDENCY.status()
+    }
@@ -0,0 +1,238 @@
+"""
+migrations.py - Applies schema objects that SQLAlchemy's create_all does not manage.
+Sets up the SQLite FTS5 full-text search index over the questions table, the
+per-table change counters used for HTTP caching, the generation status
+columns of questions, the per-section generation statistics and the indexes
+added to generation_outcomes after its creation.
+Every step is idempotent, so it is safe to run on each startup and import.
+"""
+from typing import List
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from backend.database import Base
+from backend import models
+
+# Name of the FTS5 table mirroring the searchable columns of questions
+SEARCH_TABLE = "questions_fts"
+
+# Columns of questions that are indexed for full-text search
+SEARCH_COLUMNS = ["content", "knowledge_point", "question", "answer"]
+
+# Aggregate table with the number of questions per section, task and status
+STATS_TABLE = "generation_stats"
+
+# Placeholder values that should not be searchable
+_PLACEHOLDER = "To be added"
+
+
+def _indexed_values(prefix: str) -> str:
+    """
+    Build the value list inserted into the search table for a trigger row,
+    replacing placeholder values with NULL.
+    """
+    return ", ".join(
+        f"NULLIF({prefix}.{col}, '{_PLACEHOLDER}')" for col in SEARCH_COLUMNS
+    )
+
+
+def ensure_search_index(engine: Engine) -> None:
+    """
+    Create the FTS5 search table and the triggers that keep it in sync with questions.
+    The index is populated from existing rows when it is first created.
+    """
+    columns = ", ".join(SEARCH_COLUMNS)
+    with engine.begin() as conn:
+        created = not inspect(conn).has_table(SEARCH_TABLE)
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+            f"USING fts5({columns}, tokenize='porter unicode61')"
+        ))
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON questions
+            BEGIN
+                INSERT INTO {SEARCH_TABLE} (rowid, {columns})
+                VALUES (new.id, {_indexed_values("new")});
+            END
+        """))
+        # Only changes of indexed columns re-index a row, so status and lease
+        # updates do not rewrite the index; recreated to replace the trigger of
+        # databases that re-indexed on every update
+        changed = " OR ".join(f"old.{col} IS NOT new.{col}" for col in SEARCH_COLUMNS)
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_au"))
+        conn.execute(text(f"""
+            CREATE TRIGGER {SEARCH_TABLE}_au
+            AFTER UPDATE OF {columns} ON questions
+            WHEN {changed}
+            BEGIN
+                DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+                INSERT INTO {SEARCH_TABLE} (rowid, {columns})
+                VALUES (new.id, {_indexed_values("new")});
+            END
+        """))
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON questions
+            BEGIN
+                DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+            END
+        """))
+        if created:
+            conn.execute(text(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, {columns}) "
+                f"SELECT id, {_indexed_values('questions')} FROM questions"
+            ))
+
+
+def ensure_version_triggers(conn: Connection, table_name: str) -> None:
+    """
+    Create the triggers that bump the change counter of a table in table_versions
+    on every insert, update and delete.
+    """
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS table_versions ("
+        "name TEXT PRIMARY KEY, "
+        "version INTEGER NOT NULL DEFAULT 0, "
+        "updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    for suffix, event in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE")):
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {table_name}_version_{suffix}
+            AFTER {event} ON {table_name}
+            BEGIN
+                INSERT INTO table_versions (name, version, updated_at)
+                VALUES ('{table_name}', 1, CURRENT_TIMESTAMP)
+                ON CONFLICT(name) DO UPDATE
+                SET version = version + 1, updated_at = CURRENT_TIMESTAMP;
+            END
+        """))
+
+
+def ensure_change_counters(engine: Engine) -> None:
+    """
+    Install change-counter triggers on questions and every content group table.
+    """
+    with engine.begin() as conn:
+        tables = inspect(conn).get_table_names()
+        for table_name in tables:
+            if table_name == "questions" or table_name.startswith("content_group_"):
+                ensure_version_triggers(conn, table_name)
+
+
+def _generated_condition(fields: List[str]) -> str:
+    """
+    SQL condition that holds when all given fields carry a generated value.
+    """
+    return " AND ".join(
+        f"{field} IS NOT NULL AND {field} NOT IN ('', '{_PLACEHOLDER}')" for field in fields
+    )
+
+
+def ensure_generation_status(engine: Engine) -> None:
+    """
+    Add the per-task status, timestamp and prompt version columns to an existing
+    questions table and create their indexes.
+    When a status column is added, it is backfilled from the placeholder values:
+    rows whose fields are all filled in are marked done, all others pending.
+    """
+    with engine.begin() as conn:
+        existing = {column["name"] for column in inspect(conn).get_columns("questions")}
+        for task, fields in models.GENERATED_FIELDS.items():
+            if f"{task}_generated_at" not in existing:
+                conn.execute(text(f"ALTER TABLE questions ADD COLUMN {task}_generated_at DATETIME"))
+            if f"{task}_prompt_version" not in existing:
+                conn.execute(text(
+                    f"ALTER TABLE questions ADD COLUMN {task}_prompt_version VARCHAR(64)"
+                ))
+            if f"{task}_status" not in existing:
+                conn.execute(text(
+                    f"ALTER TABLE questions ADD COLUMN {task}_status VARCHAR(20) "
+                    f"NOT NULL DEFAULT '{models.STATUS_PENDING}'"
+                ))
+                conn.execute(text(
+                    f"UPDATE questions SET {task}_status = '{models.STATUS_DONE}' "
+                    f"WHERE {_generated_condition(fields)}"
+                ))
+        for index in models.Question.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _stats_delta(row: str, task: str, delta: int) -> str:
+    """
+    Build the upsert adding delta to the statistics of a trigger row for a task.
+    """
+    return f"""
+        INSERT INTO {STATS_TABLE} (section, task, status, count)
+        VALUES (COALESCE({row}.section, ''), '{task}', {row}.{task}_status, {delta})
+        ON CONFLICT(section, task, status) DO UPDATE SET count = count + {delta};
+    """
+
+
+def ensure_generation_stats(engine: Engine) -> None:
+    """
+    Create the generation statistics table and the triggers on questions that
+    keep it up to date on every import, generation write and delete.
+    The table is populated from existing rows when it is first created.
+    """
+    tasks = list(models.GENERATED_FIELDS)
+    with engine.begin() as conn:
+        created = not inspect(conn).has_table(STATS_TABLE)
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {STATS_TABLE} ("
+            "section TEXT NOT NULL, "
+            "task TEXT NOT NULL, "
+            "status TEXT NOT NULL, "
+            "count INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (section, task, status))"
+        ))
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {STATS_TABLE}_ai AFTER INSERT ON questions
+            BEGIN
+                {"".join(_stats_delta("new", task, 1) for task in tasks)}
+            END
+        """))
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {STATS_TABLE}_ad AFTER DELETE ON questions
+            BEGIN
+                {"".join(_stats_delta("old", task, -1) for task in tasks)}
+            END
+        """))
+        for task in tasks:
+            # Only status or section changes move a row between counters
+            conn.execute(text(f"""
+                CREATE TRIGGER IF NOT EXISTS {STATS_TABLE}_{task}_au
+                AFTER UPDATE OF {task}_status, section ON questions
+                WHEN old.{task}_status IS NOT new.{task}_status
+                    OR old.section IS NOT new.section
+                BEGIN
+                    {_stats_delta("old", task, -1)}
+                    {_stats_delta("new", task, 1)}
+                END
+            """))
+        if created:
+            for task in tasks:
+                conn.execute(text(
+                    f"INSERT INTO {STATS_TABLE} (section, task, status, count) "
+                    f"SELECT COALESCE(section, ''), '{task}', {task}_status, COUNT(*) "
+                    f"FROM questions GROUP BY {task}_status, COALESCE(section, '')"
+                ))
+
+
+def ensure_outcome_indexes(engine: Engine) -> None:
+    """
+    Create the indexes of an existing generation_outcomes table.
+    """
+    with engine.begin() as conn:
+        for index in models.GenerationOutcome.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def run_migrations(engine: Engine) -> None:
+    """
+    Create missing tables and apply all schema additions.
+    """
+    Base.metadata.create_all(bind=engine)
+    ensure_generation_status(engine)
+    ensure_outcome_indexes(engine)
+    ensure_generation_stats(engine)
+    ensure_search_index(engine)
+    ensure_change_counters(engine)
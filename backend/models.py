@@ -3,10 +3,23 @@ models.py - Defines SQLAlchemy ORM models for database tables.
 Currently includes the Question and ContentGroup models.
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import (
+    Column, Integer, BigInteger, Boolean, String, Text, DateTime, Index, LargeBinary
+)
 from pydantic import BaseModel
 from backend.database import Base
 
+# Values of the per-task generation status columns
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# Generation tasks tracked on the questions table and the fields they fill
+GENERATED_FIELDS = {
+    "knowledge": ["knowledge_point"],
+    "qa": ["question", "answer"],
+}
+
 class Question(Base):
     """
     Question - SQLAlchemy model for the questions table.
@@ -24,6 +37,22 @@ class Question(Base):
     answer = Column(String(1000), default="To be added")
     created_at = Column(DateTime, default=datetime.now)
 
+    # Generation state of the knowledge point and of the Q&A pair
+    knowledge_status = Column(String(20), nullable=False,
+                              default=STATUS_PENDING, server_default=STATUS_PENDING)
+    knowledge_generated_at = Column(DateTime, nullable=True)
+    knowledge_prompt_version = Column(String(64), nullable=True)
+    qa_status = Column(String(20), nullable=False,
+                       default=STATUS_PENDING, server_default=STATUS_PENDING)
+    qa_generated_at = Column(DateTime, nullable=True)
+    qa_prompt_version = Column(String(64), nullable=True)
+
+    __table_args__ = (
+        # Pending-row selection and per-section progress filter on status first
+        Index("ix_questions_knowledge_status_section", "knowledge_status", "section"),
+        Index("ix_questions_qa_status_section", "qa_status", "section"),
+    )
+
 class ContentGroup(Base):
     """
     Model for content groups with question and answer.
@@ -47,6 +76,82 @@ class ContentGroup(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
+class LLMCallStat(Base):
+    """
+    Token and timing statistics of one LLM call, as reported by Ollama.
+    Durations are in nanoseconds.
+    """
+    __tablename__ = "llm_call_stats"
+
+    id = Column(Integer, primary_key=True)
+    task = Column(String(50), nullable=False)
+    model = Column(String(200), nullable=False)
+    prompt_version = Column(String(64), nullable=True)
+    row_id = Column(Integer, nullable=True)  # Row the call generated content for
+    done = Column(Boolean, nullable=False)  # False if the stream was stopped early
+    prompt_eval_count = Column(Integer, nullable=True)
+    prompt_eval_duration = Column(BigInteger, nullable=True)
+    eval_count = Column(Integer, nullable=True)
+    eval_duration = Column(BigInteger, nullable=True)
+    load_duration = Column(BigInteger, nullable=True)
+    total_duration = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        Index("ix_llm_call_stats_task_model", "task", "model", "prompt_version"),
+    )
+
+class QuestionEmbedding(Base):
+    """
+    Cached embedding of a question's content: float32 values of the normalized vector.
+    content_hash identifies the content it was computed from, so edited
+    contents are embedded again.
+    """
+    __tablename__ = "question_embeddings"
+
+    question_id = Column(Integer, primary_key=True)
+    model = Column(String(200), nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    dimensions = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+
+class GenerationLease(Base):
+    """
+    Lease of a row by a batch generation worker (see lease_services).
+    task is "knowledge", "qa" or the name of a content group table.
+    """
+    __tablename__ = "generation_leases"
+
+    task = Column(String(100), primary_key=True)
+    row_id = Column(Integer, primary_key=True)
+    owner = Column(String(200), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+class GenerationOutcome(Base):
+    """
+    Outcome of one row of a bulk content group generation job.
+    status is "success", "failed" or "skipped"; error holds the failure or skip reason.
+    """
+    __tablename__ = "generation_outcomes"
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(32), nullable=False)
+    table_name = Column(String(100), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False)
+    question = Column(Text, nullable=True)
+    correct_answer = Column(String(20), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        Index("ix_generation_outcomes_job", "job_id"),
+        Index("ix_generation_outcomes_job_status", "job_id", "status"),
+        # Retention deletes outcomes by age
+        Index("ix_generation_outcomes_created_at", "created_at"),
+    )
+
 class QuestionResponse(BaseModel):
     """
     QuestionResponse - Pydantic model for returning a question.
@@ -0,0 +1,21 @@
+"""
+responses.py - Response classes for large read endpoints.
+Serializes plain rows with orjson instead of validating every row through Pydantic.
+"""
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson.
+
+    Intended for endpoints returning plain dicts/lists built straight from
+    database rows, where per-row model validation adds nothing. Datetimes are
+    serialized in ISO 8601 format, matching FastAPI's default encoder.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
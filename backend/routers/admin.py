@@ -0,0 +1,98 @@
+"""
+@file admin.py
+Administrative endpoints: switching request profiling on and off,
+downloading the captured profiles and syncing the semantic search index.
+"""
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+from backend.config import get_settings
+from backend.database import get_db
+from backend.responses import FastJSONResponse
+from backend.schemas import ProfilingToggle
+from backend.services.profiling_services import PROFILES
+from backend.services.vector_index_services import EMBEDDING_INDEX
+from backend.exceptions import handle_sqlalchemy_error, resource_not_found
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+)
+
+def _profiling_state() -> dict:
+    return {
+        "enabled": PROFILES.enabled,
+        "path_prefix": PROFILES.path_prefix,
+        "header_enabled": get_settings().profiling_header_enabled,
+        "profiles": PROFILES.summaries()
+    }
+
+@router.get("/profiling")
+def get_profiling():
+    """
+    Get the profiling toggle and the captured profiles, newest first.
+    """
+    return _profiling_state()
+
+@router.put("/profiling")
+def set_profiling(toggle: ProfilingToggle):
+    """
+    Switch profiling of every request (or of the paths starting with
+    path_prefix) on or off.
+    """
+    PROFILES.path_prefix = toggle.path_prefix
+    PROFILES.enabled = toggle.enabled
+    return _profiling_state()
+
+@router.delete("/profiling")
+def clear_profiles():
+    """
+    Discard all captured profiles.
+    """
+    PROFILES.clear()
+    return _profiling_state()
+
+@router.get("/profiling/{profile_id}")
+def get_profile(profile_id: str):
+    """
+    Get a profile's summary and its top allocation sites.
+    """
+    profile = PROFILES.get(profile_id)
+    if profile is None:
+        raise resource_not_found("Profile", profile_id)
+    return {key: value for key, value in profile.items() if key != "speedscope"}
+
+@router.get("/profiling/{profile_id}/speedscope")
+def get_profile_speedscope(profile_id: str):
+    """
+    Download a profile's CPU samples in speedscope format (open it at https://www.speedscope.app).
+    """
+    profile = PROFILES.get(profile_id)
+    if profile is None:
+        raise resource_not_found("Profile", profile_id)
+    return FastJSONResponse(
+        profile["speedscope"],
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{profile_id}.speedscope.json"'
+        }
+    )
+
+@router.get("/embedding-index")
+def get_embedding_index():
+    """
+    Get the model, size and location of the semantic search index.
+    """
+    return EMBEDDING_INDEX.status()
+
+@router.post("/embedding-index/sync")
+def sync_embedding_index(rebuild: bool = False, db: Session = Depends(get_db)):
+    """
+    Embed new and edited questions into the semantic search index and drop
+    deleted ones. With rebuild the index files are rewritten without tombstones.
+    """
+    try:
+        result = EMBEDDING_INDEX.sync(db, rebuild=rebuild)
+    except SQLAlchemyError as e:
+        raise handle_sqlalchemy_error(e, db, "syncing the embedding index") from e
+    return {**result, "index": EMBEDDING_INDEX.status()}
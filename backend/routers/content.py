@@ -3,21 +3,40 @@
 FastAPI router for content-related endpoints.
 """
 from typing import List
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 
 from backend.database import get_db
-from backend.crud import get_all_questions
+from backend.models import Question
+from backend.crud import get_question_rows
 from backend.schemas import QuestionResponse
+from backend.services.cache_services import conditional_response, get_table_version
 
 router = APIRouter(
     tags=["content"],
 )
 
 @router.get("/all_contents", response_model=List[QuestionResponse])
-def get_all_contents(db: Session = Depends(get_db)):
+def get_all_contents(request: Request, db: Session = Depends(get_db)):
     """
     Fetch all contents from the database.
+
+    Rows are read as plain column tuples and serialized directly; the columns
+    already match QuestionResponse, so per-row validation is skipped.
+    Supports conditional GETs: an unchanged table is answered with 304.
     """
-    questions = get_all_questions(db)
-    return questions
+    return conditional_response(
+        request,
+        "all_contents",
+        get_table_version(db, "questions"),
+        lambda: get_question_rows(
+            db,
+            Question.id,
+            Question.section,
+            Question.page_name,
+            Question.content,
+            Question.question,
+            Question.answer,
+            Question.knowledge_point
+        )
+    )
@@ -3,26 +3,51 @@
 Router for content grouping operations.
 """
 from datetime import datetime
-import random
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import Column, Text, Integer, DateTime, inspect, text
 
-from backend.services.llm_services import call_llm
-from backend.database import get_db, engine, Base
+from backend.config import get_settings
+from backend.database import get_db, get_engine, Base
 from backend.models import Question
+from backend.migrations import ensure_version_triggers
+from backend.crud import (
+    count_generation_outcomes,
+    delete_generation_outcomes,
+    get_generation_outcomes
+)
+from backend.services.bulk_services import generate_content_group_bulk
+from backend.services.embedding_services import get_question_embeddings
+from backend.services.grouping_services import (
+    GROUPING_MODES,
+    GROUPING_SIMILARITY,
+    group_by_similarity,
+    group_sequential
+)
+from backend.services.cache_services import (
+    conditional_response,
+    get_schema_version,
+    get_table_version
+)
 from backend.exceptions import (
     bad_request,
+    resource_not_found,
     handle_processing_error,
     handle_db_operation_error
 )
-from backend.config import CONTENT_GROUP_QUESTION_TEMPLATE
 
 router = APIRouter(
     prefix="/content-group",
     tags=["content-group"],
 )
 
+# Levels of per-row detail in bulk generation responses
+DETAIL_SUMMARY = "summary"
+DETAIL_FAILURES = "failures"
+DETAIL_FULL = "full"
+DETAIL_LEVELS = (DETAIL_SUMMARY, DETAIL_FAILURES, DETAIL_FULL)
+
 @router.post("/create-table")
 def create_content_group_table(k: int, db: Session = Depends(get_db)):  # pylint: disable=unused-argument
     """
@@ -45,7 +70,7 @@ def create_content_group_table(k: int, db: Session = Depends(get_db)):  # pylint
 
     try:
         # Use inspector to check if table exists
-        inspector = inspect(engine)
+        inspector = inspect(get_engine())
         if inspector.has_table(table_name):
             # Get column information for the existing table
             columns = inspector.get_columns(table_name)
@@ -80,7 +105,11 @@ def create_content_group_table(k: int, db: Session = Depends(get_db)):  # pylint
         DynamicModel = type(f'ContentGroup{k}', (Base,), attrs)
 
         # Register the model with SQLAlchemy metadata
-        Base.metadata.create_all(engine, [DynamicModel.__table__], checkfirst=True)  # pylint: disable=no-member
+        Base.metadata.create_all(get_engine(), [DynamicModel.__table__], checkfirst=True)  # pylint: disable=no-member
+
+        # Track changes to the new table for conditional GETs
+        with get_engine().begin() as conn:
+            ensure_version_triggers(conn, table_name)
 
         # Prepare column list for return
         column_list = ["id"] 
@@ -101,13 +130,17 @@ def create_content_group_table(k: int, db: Session = Depends(get_db)):  # pylint
         raise handle_processing_error(e, "creating table") from e
 
 @router.post("/create-and-fill-table")
-def create_and_fill_table(k: int, db: Session = Depends(get_db)):
+def create_and_fill_table(k: int,
+                          grouping: Optional[Literal[GROUPING_MODES]] = None,
+                          db: Session = Depends(get_db)):
     """
     Create a table with k content columns and fill it with data from the questions table.
     If the table already exists, no action is taken.
     
     Args:
         k: Number of content columns to include
+        grouping: "sequential" (id order) or "similarity" (similar contents
+            together); defaults to grouping.mode from config.yaml
         
     Returns:
         Success message with details about the created/filled table
@@ -120,7 +153,7 @@ def create_and_fill_table(k: int, db: Session = Depends(get_db)):
 
     # Check if table already exists before proceeding
     table_name = f"content_group_{k}"
-    inspector = inspect(engine)
+    inspector = inspect(get_engine())
     if inspector.has_table(table_name):
         return {
             "status": "not_modified",
@@ -128,27 +161,26 @@ def create_and_fill_table(k: int, db: Session = Depends(get_db)):
             "table_name": table_name
         }
 
-    # First, create the table by calling the existing endpoint
-    create_content_group_table(k, db)
+    settings = get_settings()
+    grouping = grouping or settings.grouping_mode
 
-    # If the table was created, proceed to fill it with data
-    try:
-        # Get all questions from the database
-        questions = db.query(Question).all()
+    # Get all questions from the database
+    questions = db.query(Question.id, Question.content).order_by(Question.id).all()
 
-        # Group questions into sets of k
-        question_groups = []
-        current_group = []
+    # Group questions into sets of k before creating the table, so a failed
+    # embedding request does not leave an empty table behind
+    if grouping == GROUPING_SIMILARITY:
+        vectors = get_question_embeddings(db, questions)
+        index_groups = group_by_similarity(vectors, k, settings.grouping_block_size)
+    else:
+        index_groups = group_sequential(len(questions), k)
+    question_groups = [[questions[index] for index in group] for group in index_groups]
 
-        for question in questions:
-            current_group.append(question)
-            if len(current_group) == k:
-                question_groups.append(current_group)
-                current_group = []
+    # Create the table by calling the existing endpoint
+    create_content_group_table(k, db)
 
-        # Add any remaining questions as the last group
-        if current_group:
-            question_groups.append(current_group)
+    # If the table was created, proceed to fill it with data
+    try:
 
         # Current timestamp for created_at and updated_at
         current_time = datetime.now()
@@ -189,6 +221,7 @@ def create_and_fill_table(k: int, db: Session = Depends(get_db)):
             "status": "created",
             "table_name": table_name,
             "message": "Table created and filled with data from questions table",
+            "grouping": grouping,
             "groups_inserted": rows_inserted,
             "questions_used": min(len(questions), rows_inserted * k),
             "total_questions": len(questions)
@@ -199,119 +232,46 @@ def create_and_fill_table(k: int, db: Session = Depends(get_db)):
         raise handle_db_operation_error(e, db, "filling table with data") from e
 
 
+def _with_detail(db: Session, result: dict, detail: str) -> dict:
+    """
+    Add the processed-row entries a bulk result asks for: none for "summary",
+    the failed rows for "failures" and every row for "full".
+    """
+    result = {**result, "detail": detail}
+    if detail != DETAIL_SUMMARY:
+        statuses = ["failed"] if detail == DETAIL_FAILURES else None
+        _, result["processed_rows"] = get_generation_outcomes(db, result["job_id"], statuses)
+    return result
+
 @router.post("/generate-questions-for-all/{k}", response_model=dict)
-def generate_questions_for_all_rows(k: int, db: Session = Depends(get_db)):
+def generate_questions_for_all_rows(k: int,
+                                    detail: Literal[DETAIL_LEVELS] = DETAIL_SUMMARY,
+                                    db: Session = Depends(get_db)):
     """
     generate questions for all rows in the content group table.
+
+    Args:
+        k: Size of the content group table
+        detail: "summary" returns only the counts and the job id, "failures"
+            adds the failed rows and "full" every processed row. The outcome
+            of every row can be paged through with GET /content-group/outcomes/{job_id}.
     """
     try:
         # Check if the table exists
         table_name = f"content_group_{k}"
-        inspector = inspect(engine)
+        inspector = inspect(get_engine())
         if not inspector.has_table(table_name):
             raise HTTPException(status_code=404, detail=f"Table {table_name} does not exist")
 
-        # Get the table's columns
-        result_proxy = db.execute(text(f"PRAGMA table_info({table_name})"))
-        columns = [row[1] for row in result_proxy.fetchall()]
-        content_column_names = [col for col in columns if col.startswith('content')]
-
-        # Get all rows from the table
+        # Get all rows from the table as column-name mappings
         query = text(f"SELECT * FROM {table_name}")
-        results = db.execute(query).fetchall()
+        results = db.execute(query).mappings().all()
 
         if not results:
             raise HTTPException(status_code=404, detail=f"No data found in table {table_name}")
 
-        # Get the primary key index
-        pk_constraint = inspector.get_pk_constraint(table_name)
-        pk_columns = pk_constraint['constrained_columns']
-        pk_index = columns.index(pk_columns[0]) if pk_columns else 0
-
-        # Count success and failure
-        success_count = 0
-        failure_count = 0
-        processed_rows = []
-
-        # Generate questions for each row
-        for row in results:
-            try:
-                row_id = row[pk_index]
-
-                # Find content columns with data
-                content_columns = {}
-                for col in content_column_names:
-                    col_index = columns.index(col)
-                    if col_index < len(row) and row[col_index] is not None:
-                        content_columns[col] = row[col_index]
-
-                # make sure we have at least two content columns with data
-                if len(content_columns) < 2:
-                    processed_rows.append({
-                        "row_id": row_id,
-                        "status": "skipped",
-                        "reason": "Insufficient content columns with data"
-                    })
-                    continue
-
-                # randomly select one content column to be the correct answer
-                correct_column, correct_content = random.choice(list(content_columns.items()))
-                correct_number = correct_column.replace('content', '')
-
-                prompt = CONTENT_GROUP_QUESTION_TEMPLATE.format(content=correct_content)
-                response = call_llm(prompt, max_tokens=200)
-
-                # extract the question text from the response
-                if "Question:" in response:
-                    question_text = response.split("Question:")[1].strip()
-                    # if the response contains "A)" or "a)", split the question text
-                    if "A)" in question_text or "a)" in question_text:
-                        question_text = question_text.split("A)")[0].split("a)")[0].strip()
-                else:
-                    question_text = response.strip()
-                    if "A)" in question_text or "a)" in question_text:
-                        question_text = question_text.split("A)")[0].split("a)")[0].strip()
-
-                # update the row with the generated question and correct answer
-                update_query = text(f"""
-                    UPDATE {table_name}
-                    SET question = :question, correct_answer = :answer, updated_at = :updated_at
-                    WHERE id = :id
-                """)
-
-                db.execute(update_query, {
-                    "question": question_text,
-                    "answer": correct_number,
-                    "updated_at": datetime.now(),
-                    "id": row_id
-                })
-
-                success_count += 1
-                processed_rows.append({
-                    "row_id": row_id,
-                    "status": "success",
-                    "question": question_text,
-                    "correct_answer": correct_number
-                })
-
-            except ValueError as row_error:  # Adjust the exception type based on expected errors
-                failure_count += 1
-                processed_rows.append({
-                    "row_id": row_id if 'row_id' in locals() else "unknown",
-                    "status": "failed",
-                    "error": str(row_error)
-                })
-
-        db.commit()
-
-        return {
-            "status": "completed",
-            "table": table_name,
-            "total_rows": len(results),
-            "success_count": success_count,
-            "failure_count": failure_count,
-            "processed_rows": processed_rows
-        }
+        result = generate_content_group_bulk(db, table_name, results)
+        return _with_detail(db, {"status": "completed", "table": table_name, **result}, detail)
 
     except HTTPException as http_ex:
         raise http_ex
@@ -320,80 +280,84 @@ def generate_questions_for_all_rows(k: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error generating questions: {str(e)}") from e
 
 @router.get("/get-data/{k}", response_model=list)
-def get_content_group_data(k: int, db: Session = Depends(get_db)):
+def get_content_group_data(k: int, request: Request, db: Session = Depends(get_db)):
     """
     Get all data from the content group table.
+    Supports conditional GETs: an unchanged table is answered with 304.
     """
     try:
         # Check if the table exists
         table_name = f"content_group_{k}"
-        inspector = inspect(engine)
+        inspector = inspect(get_engine())
         if not inspector.has_table(table_name):
             raise HTTPException(status_code=404, detail=f"Table {table_name} does not exist")
 
-        # Get the table's columns
-        result_proxy = db.execute(text(f"PRAGMA table_info({table_name})"))
-        columns = [row[1] for row in result_proxy.fetchall()]
-
-        # Get all rows from the table
+        # Get all rows from the table as column-name mappings
         query = text(f"SELECT * FROM {table_name}")
-        result = db.execute(query).fetchall()
 
-        if not result:
-            return []
-
-        # Transform the result into a list of dictionaries
-        rows = []
-        for row in result:
-            row_dict = {}
-            for i, col_name in enumerate(columns):
-                if i < len(row):
-                    row_dict[col_name] = row[i]
-            rows.append(row_dict)
-
-        return rows
+        return conditional_response(
+            request,
+            f"content-group/get-data/{k}",
+            get_table_version(db, table_name),
+            lambda: [dict(row) for row in db.execute(query).mappings().all()]
+        )
 
     except HTTPException as http_ex:
         raise http_ex
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching data: {str(e)}") from e
 
+def _list_content_group_sizes():
+    """
+    List the k values of all content_group_{k} tables, sorted ascending.
+    """
+    # Get all tables from the database
+    inspector = inspect(get_engine())
+    all_tables = inspector.get_table_names()
+
+    # Filter for content_group tables and extract the k values
+    content_group_tables = [table for table in all_tables if table.startswith('content_group_')]
+    k_values = []
+
+    for table in content_group_tables:
+        try:
+            # Extract the k value from the table name
+            k = int(table.split('_')[-1])
+            k_values.append(k)
+        except ValueError:
+            # Skip if we can't parse the k value
+            continue
+
+    # Sort the k values
+    k_values.sort()
+
+    return k_values
+
 @router.get("/available-groups", response_model=list)
-def get_available_content_groups(db: Session = Depends(get_db)): # pylint: disable=unused-argument
+def get_available_content_groups(request: Request, db: Session = Depends(get_db)):
     """
     Get a list of available content group values (k) from the database.
+    The ETag follows SQLite's schema version, so it only changes when tables do.
     
     Returns:
         List of integers representing the available content group sizes
     """
     try:
-        # Get all tables from the database
-        inspector = inspect(engine)
-        all_tables = inspector.get_table_names()
-
-        # Filter for content_group tables and extract the k values
-        content_group_tables = [table for table in all_tables if table.startswith('content_group_')]
-        k_values = []
-
-        for table in content_group_tables:
-            try:
-                # Extract the k value from the table name
-                k = int(table.split('_')[-1])
-                k_values.append(k)
-            except ValueError:
-                # Skip if we can't parse the k value
-                continue
-
-        # Sort the k values
-        k_values.sort()
-
-        return k_values
+        return conditional_response(
+            request,
+            "content-group/available-groups",
+            get_schema_version(db),
+            _list_content_group_sizes
+        )
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}") from e
 
 @router.post("/create-and-generate/{k}", response_model=dict)
-def create_table_and_generate_questions(k: int, db: Session = Depends(get_db)):
+def create_table_and_generate_questions(k: int,
+                                        grouping: Optional[Literal[GROUPING_MODES]] = None,
+                                        detail: Literal[DETAIL_LEVELS] = DETAIL_SUMMARY,
+                                        db: Session = Depends(get_db)):
     """
     Create a content group table with the specified k value if it doesn't exist,
     then generate questions for all rows.
@@ -402,6 +366,9 @@ def create_table_and_generate_questions(k: int, db: Session = Depends(get_db)):
     
     Args:
         k: Number of content columns to include
+        grouping: How questions are grouped if the table is created
+            (see create_and_fill_table)
+        detail: Processed rows to include (see generate_questions_for_all_rows)
         
     Returns:
         Dict with operation results
@@ -409,13 +376,13 @@ def create_table_and_generate_questions(k: int, db: Session = Depends(get_db)):
     try:
         # Check if the table exists
         table_name = f"content_group_{k}"
-        inspector = inspect(engine)
+        inspector = inspect(get_engine())
         table_exists = inspector.has_table(table_name)
 
         # If table doesn't exist, create it and fill with data
         if not table_exists:
             # Call the existing create_and_fill_table function
-            create_result = create_and_fill_table(k, db)
+            create_result = create_and_fill_table(k, grouping, db)
             table_created = True
         else:
             create_result = {
@@ -425,7 +392,7 @@ def create_table_and_generate_questions(k: int, db: Session = Depends(get_db)):
             table_created = False
 
         # Now generate questions for all rows
-        generate_result = generate_questions_for_all_rows(k, db)
+        generate_result = generate_questions_for_all_rows(k, detail, db)
 
         # Combine the results
         return {
@@ -445,3 +412,46 @@ def create_table_and_generate_questions(k: int, db: Session = Depends(get_db)):
             status_code=500, 
             detail=f"Error creating table and generating questions: {str(e)}"
         ) from e
+
+@router.get("/outcomes/{job_id}", response_model=dict)
+def get_job_outcomes(job_id: str,
+                     status: Optional[Literal["success", "failed", "skipped"]] = None,
+                     limit: int = Query(100, ge=1, le=1000),
+                     offset: int = Query(0, ge=0),
+                     db: Session = Depends(get_db)):
+    """
+    Page through the per-row outcomes of a bulk generation job, in row order.
+
+    Args:
+        job_id: Job id returned by the bulk generation endpoints
+        status: Only outcomes with this status
+        limit: Page size
+        offset: Number of outcomes to skip
+    """
+    counts = count_generation_outcomes(db, job_id)
+    if not counts:
+        raise resource_not_found("Job", job_id)
+    total, entries = get_generation_outcomes(
+        db, job_id, [status] if status else None, limit, offset
+    )
+    return {
+        "job_id": job_id,
+        "counts": counts,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "results": entries
+    }
+
+@router.delete("/outcomes/{job_id}", response_model=dict)
+def delete_job_outcomes(job_id: str, db: Session = Depends(get_db)):
+    """
+    Delete the stored per-row outcomes of a bulk generation job.
+    """
+    try:
+        deleted = delete_generation_outcomes(db, job_id)
+    except Exception as e:
+        raise handle_db_operation_error(e, db, "deleting job outcomes") from e
+    if not deleted:
+        raise resource_not_found("Job", job_id)
+    return {"job_id": job_id, "deleted": deleted}
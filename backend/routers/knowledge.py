@@ -2,22 +2,23 @@
 @file knowledge.py
 Handles knowledge point generation routes.
 """
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import update
-import requests
 
 from backend.database import get_db
-from backend.models import Question
-from backend.crud import get_all_questions
-from backend.services.llm_services import call_llm
-from backend.config import KNOWLEDGE_PROMPT_TEMPLATE
-from backend.schemas import QuestionResponse
+from backend.models import Question, STATUS_PENDING, STATUS_DONE
+from backend.crud import get_pending_questions, get_question_rows
+from backend.services.generation_services import generate
+from backend.services.bulk_services import generate_knowledge_bulk, select_for_regeneration
+from backend.schemas import QuestionResponse, RegenerationRequest
+from backend.services.cache_services import conditional_response, get_table_version
 from backend.exceptions import (
     resource_not_found,
     handle_sqlalchemy_error,
-    format_bulk_operation_result
+    handle_value_error
 )
 
 
@@ -29,7 +30,7 @@ router = APIRouter(
 @router.post("/clear-all")
 def clear_all_knowledge_points(db: Session = Depends(get_db)):
     """
-    Clear all knowledge points by resetting them to 'To be added'.
+    Clear all knowledge points by resetting them to 'To be added' and pending.
     
     Returns:
         dict: A dictionary containing status and count of updated records.
@@ -38,7 +39,12 @@ def clear_all_knowledge_points(db: Session = Depends(get_db)):
         # Create a statement to update all knowledge_point fields to "To be added"
         stmt = (
             update(Question)
-            .values(knowledge_point="To be added")
+            .values(
+                knowledge_point="To be added",
+                knowledge_status=STATUS_PENDING,
+                knowledge_generated_at=None,
+                knowledge_prompt_version=None
+            )
         )
 
         # Execute the statement
@@ -69,36 +75,23 @@ def generate_knowledge_single(question_id: int, db: Session = Depends(get_db)):
     if not question:
         raise resource_not_found("Question", question_id)
 
-    prompt = KNOWLEDGE_PROMPT_TEMPLATE.format(content=question.content)
-
-    response = call_llm(prompt, max_tokens=100)
-
-    # Clean the response
-    knowledge_point = response.strip()
-    prefixes_to_remove = [
-        "the key knowledge point is ", 
-        "the key knowledge is ", 
-        "key knowledge: ", 
-        "knowledge point: ",
-        "the main concept is ",
-        "the core concept is "
-    ]
-
-    # Remove possible prefixes (case insensitive)
-    for prefix in prefixes_to_remove:
-        if knowledge_point.lower().startswith(prefix):
-            knowledge_point = knowledge_point[len(prefix):].strip()
-            break
-
-    # Make sure the first letter is capitalized
-    if knowledge_point:
-        knowledge_point = knowledge_point[0].upper() + knowledge_point[1:]
+    # Generate the (cleaned) knowledge point
+    try:
+        generated = generate("knowledge", question.content, row_id=question_id)
+        knowledge_point = generated.output.knowledge_point
+    except ValueError as e:
+        raise handle_value_error(e) from e
 
     # Update the database
     stmt = (
         update(Question)
         .where(Question.id == question_id)
-        .values(knowledge_point=knowledge_point)
+        .values(
+            knowledge_point=knowledge_point,
+            knowledge_status=STATUS_DONE,
+            knowledge_generated_at=datetime.now(),
+            knowledge_prompt_version=generated.prompt_version
+        )
     )
     db.execute(stmt)
     db.commit()
@@ -117,80 +110,21 @@ def generate_knowledge_single(question_id: int, db: Session = Depends(get_db)):
 def generate_knowledge_all(db: Session = Depends(get_db)):
     """
     Generate knowledge points for all questions and update the database.
+    Questions whose knowledge point is already done are skipped; failed ones are retried.
+    Near-duplicate contents are generated once and share the representative's result.
     """
-    all_questions = get_all_questions(db)
-    updated_count = 0
-    failures = []
-
-    for question in all_questions:
-        try:
-            prompt = KNOWLEDGE_PROMPT_TEMPLATE.format(content=question.content)
-            response = call_llm(prompt, max_tokens=100)
-
-            knowledge_point = response.strip()
-            prefixes_to_remove = [
-                "the key knowledge point is ", 
-                "the key knowledge is ", 
-                "key knowledge: ", 
-                "knowledge point: ",
-                "the main concept is ",
-                "the core concept is "
-            ]
-
-            for prefix in prefixes_to_remove:
-                if knowledge_point.lower().startswith(prefix):
-                    knowledge_point = knowledge_point[len(prefix):].strip()
-                    break
-
-            if knowledge_point:
-                knowledge_point = knowledge_point[0].upper() + knowledge_point[1:]
-
-            if knowledge_point:
-                stmt = (
-                    update(Question)
-                    .where(Question.id == question.id)
-                    .values(knowledge_point=knowledge_point)
-                )
-                db.execute(stmt)
-                updated_count += 1
-            else:
-                failures.append({
-                    "id": question.id, 
-                    "error": "Failed to generate knowledge point", 
-                    "response": response
-                })
-
-        except SQLAlchemyError as e:
-            failures.append({
-                "id": question.id, 
-                "error": f"Database error: {str(e)}"
-            })
-        except requests.RequestException as e:
-            failures.append({
-                "id": question.id, 
-                "error": f"LLM service request error: {str(e)}"
-            })
-        except ValueError as e:
-            failures.append({
-                "id": question.id, 
-                "error": f"Value error: {str(e)}"
-            })
-        except TypeError as e:
-            failures.append({
-                "id": question.id, 
-                "error": f"Type error: {str(e)}"
-            })
+    return generate_knowledge_bulk(db, get_pending_questions(db, "knowledge"))
 
-    db.commit()
-
-    return format_bulk_operation_result(
-        total_items=len(all_questions),
-        updated_count=updated_count,
-        failures=failures
-    )
+@router.post("/regenerate")
+def regenerate_knowledge(selection: RegenerationRequest, db: Session = Depends(get_db)):
+    """
+    Regenerate knowledge points for the selected questions only, e.g. one edited
+    section, explicit ids or the rows whose generation failed.
+    """
+    return generate_knowledge_bulk(db, select_for_regeneration(db, "knowledge", selection))
 
 @router.get("/get-all")
-def get_all_knowledge(db: Session = Depends(get_db)):
+def get_all_knowledge(request: Request, db: Session = Depends(get_db)):
     """
     Get all questions with their knowledge points.
     
@@ -198,17 +132,17 @@ def get_all_knowledge(db: Session = Depends(get_db)):
         list: A list of questions with section, content and knowledge point fields.
     """
     try:
-        questions = db.query(Question).all()
-
-        result = []
-        for question in questions:
-            result.append({
-                "id": question.id,
-                "section": question.section,
-                "content": question.content,
-                "knowledge_point": question.knowledge_point
-            })
-
-        return result
+        return conditional_response(
+            request,
+            "knowledge/get-all",
+            get_table_version(db, "questions"),
+            lambda: get_question_rows(
+                db,
+                Question.id,
+                Question.section,
+                Question.content,
+                Question.knowledge_point
+            )
+        )
     except SQLAlchemyError as e:
         raise handle_sqlalchemy_error(e, db, "fetching knowledge data") from e
@@ -2,24 +2,23 @@
 @file qa.py
 Handles Q&A generation routes.
 """
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import update
 from sqlalchemy.exc import SQLAlchemyError
-import requests
 
 from backend.database import get_db
-from backend.models import Question
-from backend.crud import get_all_questions
-from backend.schemas import QuestionResponse
-from backend.services.llm_services import call_llm
-from backend.config import QA_PROMPT_TEMPLATE
+from backend.models import Question, STATUS_DONE
+from backend.crud import get_pending_questions
+from backend.schemas import QuestionResponse, RegenerationRequest
+from backend.services.generation_services import generate
+from backend.services.bulk_services import generate_qa_bulk, select_for_regeneration
 from backend.exceptions import (
     resource_not_found,
     handle_sqlalchemy_error,
     handle_value_error,
-    handle_type_error,
-    format_bulk_operation_result
+    handle_type_error
 )
 
 router = APIRouter(
@@ -36,32 +35,24 @@ def generate_qa_single(question_id: int, db: Session = Depends(get_db)):
     if not question:
         raise resource_not_found("Question", question_id)
 
-    # Generate prompt
-    prompt = QA_PROMPT_TEMPLATE.format(content=question.content)
-
-    # Use LLM API to generate question and answer
-    response = call_llm(prompt, max_tokens=200)
-
     # Update the question and answer in the database
     try:
-        # Use string splitting to extract question and answer
-        if "Question:" in response and "Answer:" in response:
-            question_part = response.split("Question:")[1].split("Answer:")[0].strip()
-            answer_part = response.split("Answer:")[1].strip()
-        else:
-            # If the format is not as expected, use a fallback method
-            parts = response.split("\n")
-            question_part = next((p.replace("Question:", "").strip() 
-                                for p in parts if p.startswith("Question:")), "")
-            answer_part = next((p.replace("Answer:", "").strip() 
-                                for p in parts if p.startswith("Answer:")), "")
+        # Use LLM API to generate and parse the question and answer
+        generated = generate("qa", question.content, row_id=question_id)
+        question_part, answer_part = generated.output.question, generated.output.answer
 
         # Update the database record
         if question_part and answer_part:
             stmt = (
                 update(Question)
                 .where(Question.id == question_id)
-                .values(question=question_part, answer=answer_part)
+                .values(
+                    question=question_part,
+                    answer=answer_part,
+                    qa_status=STATUS_DONE,
+                    qa_generated_at=datetime.now(),
+                    qa_prompt_version=generated.prompt_version
+                )
             )
             db.execute(stmt)
             db.commit()
@@ -95,83 +86,15 @@ def generate_qa_single(question_id: int, db: Session = Depends(get_db)):
 def generate_qa_all(db: Session = Depends(get_db)):
     """
     Generate questions and answers for all questions in the database and update them.
+    Questions whose Q&A pair is already done are skipped; failed ones are retried.
     """
-    # Get all questions from the database
-    all_questions = get_all_questions(db)
-
-    # Set the count of updated records
-    updated_count = 0
-
-    # List to store failures
-    failures = []
-
-    for question in all_questions:
-        try:
-            # Skip if question already has a question and answer
-            if (question.question and question.answer and 
-                question.question != "To be added" and 
-                question.answer != "To be added"):
-                continue
-
-            # Generate prompt
-            prompt = QA_PROMPT_TEMPLATE.format(content=question.content)
+    return generate_qa_bulk(db, get_pending_questions(db, "qa"))
 
-            response = call_llm(prompt, max_tokens=200)
 
-            try:
-                if "Question:" in response and "Answer:" in response:
-                    question_part = response.split("Question:")[1].split("Answer:")[0].strip()
-                    answer_part = response.split("Answer:")[1].strip()
-                else:
-                    parts = response.split("\n")
-                    question_part = next((p.replace("Question:", "").strip()
-                                        for p in parts if p.startswith("Question:")), "")
-                    answer_part = next((p.replace("Answer:", "").strip()
-                                        for p in parts if p.startswith("Answer:")), "")
-
-                if question_part and answer_part:
-                    stmt = (
-                        update(Question)
-                        .where(Question.id == question.id)
-                        .values(question=question_part, answer=answer_part)
-                    )
-                    db.execute(stmt)
-                    updated_count += 1
-                else:
-                    failures.append({
-                        "id": question.id, 
-                        "error": "Failed to parse LLM response", 
-                        "response": response
-                    })
-
-            except (ValueError, TypeError) as e:
-                failures.append({
-                    "id": question.id, 
-                    "error": f"Value or type error: {str(e)}", 
-                    "response": response
-                })
-            except (KeyError, IndexError) as e:
-                failures.append({
-                    "id": question.id, 
-                    "error": f"Key or index error: {str(e)}", 
-                    "response": response
-                })
-
-        except SQLAlchemyError as e:
-            failures.append({
-                "id": question.id, 
-                "error": f"Database error: {str(e)}"
-            })
-        except requests.RequestException as e:
-            failures.append({
-                "id": question.id, 
-                "error": f"LLM service request error: {str(e)}"
-            })
-
-    db.commit()
-
-    return format_bulk_operation_result(
-        total_items=len(all_questions),
-        updated_count=updated_count,
-        failures=failures
-    )
+@router.post("/regenerate-qa")
+def regenerate_qa(selection: RegenerationRequest, db: Session = Depends(get_db)):
+    """
+    Regenerate questions and answers for the selected questions only, whether
+    or not they are already done.
+    """
+    return generate_qa_bulk(db, select_for_regeneration(db, "qa", selection))
@@ -0,0 +1,157 @@
+"""
+@file search.py
+Full-text search over question contents, knowledge points and generated Q&A,
+and semantic search over question contents.
+"""
+import html
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+
+from backend.config import get_settings
+from backend.database import get_db
+from backend.migrations import SEARCH_TABLE, SEARCH_COLUMNS
+from backend.models import Question
+from backend.schemas import SearchResponse, SemanticSearchResponse
+from backend.services.embedding_services import embed_texts
+from backend.services.vector_index_services import EMBEDDING_INDEX
+from backend.exceptions import bad_request, handle_sqlalchemy_error
+
+router = APIRouter(
+    tags=["search"],
+)
+
+# Control characters marking the matched terms in FTS5 snippets; they are
+# replaced with <mark> tags after the snippet text has been HTML-escaped
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+
+def highlight_snippet(snippet: str) -> str:
+    """
+    Turn an FTS5 snippet into HTML: the question text is escaped so stored
+    markup is shown literally, and only the matched terms are wrapped in <mark>.
+    """
+    return (html.escape(snippet)
+            .replace(_MARK_START, "<mark>")
+            .replace(_MARK_END, "</mark>"))
+
+def build_match_query(query: str, fields: Optional[List[str]] = None) -> str:
+    """
+    Convert free text into a safe FTS5 MATCH expression.
+
+    Every term is quoted so user input cannot inject FTS5 syntax, terms are
+    combined with AND, and the last term is matched as a prefix.
+
+    Args:
+        query: Free text entered by the user
+        fields: Optional subset of indexed columns to restrict the search to
+
+    Returns:
+        FTS5 MATCH expression
+    """
+    terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+    if not terms:
+        raise bad_request("Search query must not be empty")
+    terms[-1] += "*"
+    expression = " ".join(terms)
+
+    if fields:
+        unknown = [field for field in fields if field not in SEARCH_COLUMNS]
+        if unknown:
+            raise bad_request(f"Unknown search fields: {', '.join(unknown)}")
+        expression = "{" + " ".join(fields) + "} : (" + expression + ")"
+    return expression
+
+@router.get("/search", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=1, description="Text to search for"),
+    fields: Optional[List[str]] = Query(None, description="Restrict the search to these fields"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """
+    Search questions by content, knowledge point, question and answer.
+    Results are ranked by BM25 and include a highlighted snippet.
+    """
+    match = build_match_query(q, fields)
+
+    try:
+        total = db.execute(
+            text(f"SELECT count(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match"),
+            {"match": match}
+        ).scalar()
+
+        rows = db.execute(text(f"""
+            SELECT q.id, q.section, q.page_name,
+                   snippet({SEARCH_TABLE}, -1, :mark_start, :mark_end, '...', 16) AS snippet,
+                   bm25({SEARCH_TABLE}) AS rank
+            FROM {SEARCH_TABLE}
+            JOIN questions q ON q.id = {SEARCH_TABLE}.rowid
+            WHERE {SEARCH_TABLE} MATCH :match
+            ORDER BY rank
+            LIMIT :limit OFFSET :offset
+        """), {"match": match, "limit": limit, "offset": offset,
+               "mark_start": _MARK_START, "mark_end": _MARK_END}).mappings().all()
+
+        return {
+            "query": q,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "results": [
+                {**row, "snippet": highlight_snippet(row["snippet"])} for row in rows
+            ]
+        }
+    except OperationalError as e:
+        # Raised by SQLite for malformed MATCH expressions
+        raise bad_request(f"Invalid search query: {str(e.orig)}") from e
+    except SQLAlchemyError as e:
+        raise handle_sqlalchemy_error(e, db, "searching questions") from e
+
+@router.get("/semantic-search", response_model=SemanticSearchResponse)
+def semantic_search(
+    q: str = Query(..., min_length=1, description="Text to search for by meaning"),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Find the questions whose content is closest in meaning to the query,
+    ranked by cosine similarity of their embeddings.
+    """
+    try:
+        matches = EMBEDDING_INDEX.search(embed_texts([q]), limit)[0]
+    except ValueError as e:
+        # The embedding model returns another dimension than the index was built with
+        raise HTTPException(
+            status_code=503,
+            detail=f"{e}, rebuild it with POST /admin/embedding-index/sync?rebuild=true"
+        ) from e
+    if not matches and EMBEDDING_INDEX.snapshot.vectors is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Embedding index is empty, sync it with POST /admin/embedding-index/sync"
+        )
+
+    try:
+        rows = (
+            db.query(Question.id, Question.section, Question.page_name, Question.content,
+                     Question.knowledge_point, Question.question, Question.answer)
+            .filter(Question.id.in_([question_id for question_id, _ in matches]))
+            .all()
+        )
+    except SQLAlchemyError as e:
+        raise handle_sqlalchemy_error(e, db, "fetching semantic search results") from e
+
+    # Questions deleted since the last sync are skipped
+    rows_by_id = {row.id: row for row in rows}
+    return {
+        "query": q,
+        "model": get_settings().embedding_model,
+        "results": [
+            {**rows_by_id[question_id]._asdict(), "score": score}
+            for question_id, score in matches if question_id in rows_by_id
+        ]
+    }
@@ -0,0 +1,83 @@
+"""
+@file stats.py
+Generation progress per section, read from the incrementally maintained
+generation_stats table instead of counting the questions table, and the
+current prompt versions with the number of rows generated by older ones, and
+the token and timing statistics of the LLM calls.
+"""
+from typing import Dict
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from backend.database import get_db
+from backend.crud import count_outdated
+from backend.migrations import STATS_TABLE
+from backend.models import GENERATED_FIELDS
+from backend.schemas import StatsResponse
+from backend.services.generation_services import get_prompt_version
+from backend.services.llm_stats_services import get_llm_stats_rollup
+from backend.exceptions import handle_sqlalchemy_error
+
+router = APIRouter(
+    tags=["statistics"],
+)
+
+@router.get("/stats", response_model=StatsResponse)
+def get_stats(db: Session = Depends(get_db)):
+    """
+    Get the number of pending, done and failed rows per section and task.
+    The cost depends on the number of sections, not on the number of rows.
+    """
+    try:
+        rows = db.execute(text(
+            f"SELECT section, task, status, count FROM {STATS_TABLE} "
+            "WHERE count > 0 ORDER BY section"
+        )).all()
+    except SQLAlchemyError as e:
+        raise handle_sqlalchemy_error(e, db, "fetching generation statistics") from e
+
+    def empty() -> Dict[str, Dict[str, int]]:
+        return {task: {} for task in GENERATED_FIELDS}
+
+    sections: Dict[str, Dict[str, Dict[str, int]]] = {}
+    totals = empty()
+    for section, task, status, count in rows:
+        sections.setdefault(section, empty())[task][status] = count
+        totals[task][status] = totals[task].get(status, 0) + count
+
+    return {
+        "sections": [{"section": section, **counts} for section, counts in sections.items()],
+        "totals": totals
+    }
+
+@router.get("/prompt-versions")
+def get_prompt_versions(db: Session = Depends(get_db)):
+    """
+    Get the current prompt version of each task and how many generated rows
+    are outdated, i.e. were produced by another version.
+    Outdated rows can be regenerated with {"outdated": true} on the regenerate endpoints.
+    """
+    try:
+        versions = {}
+        for task in GENERATED_FIELDS:
+            version = get_prompt_version(task)
+            versions[task] = {
+                "version": version,
+                "outdated_count": count_outdated(db, task, version)
+            }
+        return versions
+    except SQLAlchemyError as e:
+        raise handle_sqlalchemy_error(e, db, "counting outdated rows") from e
+
+@router.get("/stats/llm")
+def get_llm_stats(db: Session = Depends(get_db)):
+    """
+    Get LLM call statistics per task, model and prompt version: call and token
+    counts, time spent and prompt evaluation and generation speed in tokens/s.
+    """
+    try:
+        return get_llm_stats_rollup(db)
+    except SQLAlchemyError as e:
+        raise handle_sqlalchemy_error(e, db, "fetching LLM statistics") from e
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 
 class QuestionBase(BaseModel):
     content: str
@@ -16,4 +16,75 @@ class QuestionResponse(QuestionBase):
     knowledge_point: Optional[str] = None
     
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class SearchResult(BaseModel):
+    id: int
+    section: Optional[str] = None
+    page_name: Optional[str] = None
+    snippet: str
+    rank: float
+
+class SearchResponse(BaseModel):
+    query: str
+    total: int
+    limit: int
+    offset: int
+    results: List[SearchResult]
+
+class SemanticSearchResult(BaseModel):
+    id: int
+    section: Optional[str] = None
+    page_name: Optional[str] = None
+    content: str
+    knowledge_point: Optional[str] = None
+    question: Optional[str] = None
+    answer: Optional[str] = None
+    score: float
+
+class SemanticSearchResponse(BaseModel):
+    query: str
+    model: str
+    results: List[SemanticSearchResult]
+
+class StatusCounts(BaseModel):
+    pending: int = 0
+    done: int = 0
+    failed: int = 0
+
+class TaskStats(BaseModel):
+    knowledge: StatusCounts
+    qa: StatusCounts
+
+class SectionStats(TaskStats):
+    section: str
+
+class StatsResponse(BaseModel):
+    sections: List[SectionStats]
+    totals: TaskStats
+
+class RegenerationRequest(BaseModel):
+    """Selection of questions to regenerate; all given filters must match."""
+    ids: Optional[List[int]] = None
+    sections: Optional[List[str]] = None
+    statuses: Optional[List[Literal["pending", "done", "failed"]]] = None
+    exclude_prompt_version: Optional[str] = None
+    outdated: Optional[bool] = None
+
+class ProfilingToggle(BaseModel):
+    """Switch profiling of every request on or off, optionally for one path prefix."""
+    enabled: bool
+    path_prefix: str = ""
+
+class KnowledgeOutput(BaseModel):
+    """Structured LLM output for knowledge point extraction."""
+    knowledge_point: str = Field(min_length=1)
+
+class QAOutput(BaseModel):
+    """Structured LLM output for question and answer generation."""
+    question: str = Field(min_length=1)
+    answer: str = Field(min_length=1)
+
+class ContentGroupQuestionOutput(BaseModel):
+    """Structured LLM output for single-choice question generation."""
+    question: str = Field(min_length=1)
@@ -0,0 +1,125 @@
+"""
+budget_services.py
+This module keeps the content put into a prompt within a per-task input budget.
+
+Token counts are estimated from the text length (llm.input_budget.chars_per_token),
+which is cheap and close enough for budgeting without loading a tokenizer. Content
+over budget is split at paragraph, then sentence, then word boundaries into parts
+that each fit the budget; a word still over budget (e.g. a run of CJK text without
+spaces) is split into slices. Depending on the task's strategy the parts are generated
+separately and merged ("chunk"), or only the first part is used ("truncate").
+Either way every LLM call gets a bounded prompt, so its latency is predictable and
+the prompt cannot overflow the model context.
+"""
+import math
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from backend.config import get_settings
+
+# Budgeting strategies for content over budget
+STRATEGY_TRUNCATE = "truncate"
+STRATEGY_CHUNK = "chunk"
+
+# Smallest budget ever used for the content, however large the rest of the prompt is
+MIN_CONTENT_TOKENS = 64
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+# CJK sentence ends are not followed by a space
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|(?<=[。！？])")
+
+
+@dataclass(frozen=True)
+class InputBudget:
+    """
+    Maximum estimated content tokens per LLM call and what to do with content above it.
+    """
+    max_tokens: int
+    strategy: str = STRATEGY_TRUNCATE
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text.
+    """
+    return math.ceil(len(text) / get_settings().input_chars_per_token)
+
+
+def get_input_budget(task: str,
+                     reserved_tokens: int = 0,
+                     num_ctx: Optional[int] = None) -> InputBudget:
+    """
+    Get a task's input budget from config.yaml, merged over the "default" budget.
+
+    Args:
+        task: Task name
+        reserved_tokens: Tokens needed by the rest of the call (system prompt,
+            template and output); with num_ctx the budget is capped so that
+            everything fits in the context window
+        num_ctx: Context window size of the call, if known
+    """
+    budgets = get_settings().input_budgets
+    values = {**budgets.get("default", {}), **budgets.get(task, {})}
+    max_tokens = values.get("max_tokens", 768)
+    if num_ctx:
+        max_tokens = min(max_tokens, num_ctx - reserved_tokens)
+    return InputBudget(
+        max_tokens=max(max_tokens, MIN_CONTENT_TOKENS),
+        strategy=values.get("strategy", STRATEGY_TRUNCATE)
+    )
+
+
+def _split_units(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text into paragraphs, sentences or words, going finer only for
+    the pieces that are still over budget.
+    """
+    units = []
+    for paragraph in _PARAGRAPH_SPLIT.split(text):
+        if estimate_tokens(paragraph) <= max_tokens:
+            units.append(paragraph)
+            continue
+        for sentence in _SENTENCE_SPLIT.split(paragraph):
+            if estimate_tokens(sentence) <= max_tokens:
+                units.append(sentence)
+            else:
+                units.extend(sentence.split())
+    return [unit.strip() for unit in units if unit.strip()]
+
+
+def split_to_budget(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text into consecutive parts whose estimated size fits max_tokens.
+    Parts are packed greedily from whole paragraphs, sentences or words; a
+    single word over budget is split into consecutive slices, so no text is lost.
+
+    Returns:
+        The parts in order; a text within budget is returned as the only part
+    """
+    text = text.strip()
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    max_chars = max(int(max_tokens * get_settings().input_chars_per_token), 1)
+    parts: List[str] = []
+    current = ""
+    for unit in _split_units(text, max_tokens):
+        for start in range(0, len(unit), max_chars):
+            piece = unit[start:start + max_chars]
+            candidate = f"{current} {piece}" if current else piece
+            if current and estimate_tokens(candidate) > max_tokens:
+                parts.append(current)
+                current = piece
+            else:
+                current = candidate
+    if current:
+        parts.append(current)
+    return parts
+
+
+def truncate_to_budget(text: str, max_tokens: int) -> str:
+    """
+    Keep the leading whole paragraphs, sentences or words of text that fit max_tokens.
+    """
+    return split_to_budget(text, max_tokens)[0]
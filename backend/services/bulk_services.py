@@ -0,0 +1,359 @@
+"""
+bulk_services.py
+This module runs knowledge point, Q&A and single-choice question generation
+over a selection of rows and writes the results back in batches.
+
+All bulk endpoints (generate-all and the targeted regeneration endpoints) and
+the batch CLI (generate_batch.py) share these pipelines and only differ in how
+they select the rows, so the cost of a run is proportional to the number of
+selected rows.
+
+While the LLM circuit breaker is open, a pipeline pauses before its next row;
+if the backend does not recover in time, the remaining rows are reported as
+failed without calling the LLM.
+"""
+from datetime import datetime, timedelta
+import logging
+import random
+import uuid
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import bindparam, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from backend.config import get_settings
+from backend.crud import prune_generation_outcomes, select_questions
+from backend.models import GenerationOutcome, STATUS_DONE, STATUS_FAILED
+from backend.schemas import RegenerationRequest
+from backend.services.dedup_services import cluster_near_duplicates
+from backend.services.generation_services import generate, get_prompt_version
+from backend.services.parser_services import StructuredOutputError
+from backend.services.resilience_services import wait_for_llm
+from backend.services.writeback_services import (
+    content_group_writer,
+    outcome_writer,
+    question_writer
+)
+from backend.exceptions import bad_request, format_bulk_operation_result
+
+logger = logging.getLogger(__name__)
+
+
+def select_for_regeneration(db: Session,
+                            task: str,
+                            selection: RegenerationRequest) -> List[Tuple[int, str]]:
+    """
+    Fetch (id, content) of the questions selected for a targeted regeneration.
+    At least one filter is required, so an empty request cannot regenerate everything.
+
+    "outdated" selects the done rows that were not generated with the task's
+    current prompt version (including rows from before prompts were versioned).
+    """
+    filters = selection.model_dump(exclude_none=True)
+    if filters.pop("outdated", False):
+        filters["exclude_prompt_version"] = get_prompt_version(task)
+        filters.setdefault("statuses", [STATUS_DONE])
+    if not filters:
+        raise bad_request(
+            "Select questions by ids, sections, statuses, outdated or exclude_prompt_version"
+        )
+    return select_questions(db, task, **filters)
+
+
+def unavailable_failures(ids: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Failure entries for rows skipped because the LLM backend did not recover.
+    """
+    return [{"id": row_id, "error": "LLM service unavailable, row skipped"} for row_id in ids]
+
+
+def generate_knowledge_bulk(db: Session, rows: List[Tuple[int, str]]) -> Dict[str, Any]:
+    """
+    Generate knowledge points for the given questions and update the database.
+    Near-duplicate contents are generated once and share the representative's result.
+
+    Args:
+        db: Database session
+        rows: (id, content) pairs of the questions to process
+
+    Returns:
+        Bulk operation result with an additional reused_count
+    """
+    settings = get_settings()
+    reused_count = 0
+    failures = []
+
+    if settings.dedup_enabled:
+        clusters = cluster_near_duplicates(
+            [content for _, content in rows],
+            threshold=settings.dedup_similarity_threshold,
+            num_permutations=settings.dedup_num_permutations,
+            shingle_size=settings.dedup_shingle_size
+        )
+    else:
+        clusters = [[i] for i in range(len(rows))]
+
+    with question_writer(db) as writer, question_writer(db) as failed_writer:
+        for index, cluster in enumerate(clusters):
+            if not wait_for_llm():
+                skipped_ids = [rows[i][0] for pending in clusters[index:] for i in pending]
+                failures.extend(unavailable_failures(skipped_ids))
+                for skipped_id in skipped_ids:
+                    failed_writer.add({"id": skipped_id, "knowledge_status": STATUS_FAILED})
+                break
+
+            question_id, content = rows[cluster[0]]
+            duplicate_ids = [rows[i][0] for i in cluster[1:]]
+            try:
+                generated = generate("knowledge", content, row_id=question_id)
+                knowledge_point = generated.output.knowledge_point
+
+                if knowledge_point:
+                    # Reuse the representative's knowledge point for its near-duplicates
+                    generated_at = datetime.now()
+                    for target_id in [question_id] + duplicate_ids:
+                        writer.add({
+                            "id": target_id,
+                            "knowledge_point": knowledge_point,
+                            "knowledge_status": STATUS_DONE,
+                            "knowledge_generated_at": generated_at,
+                            "knowledge_prompt_version": generated.prompt_version
+                        })
+                    reused_count += len(duplicate_ids)
+                    continue
+
+                failure = {
+                    "error": "Failed to generate knowledge point",
+                    "response": generated.response
+                }
+            except HTTPException as e:
+                failure = {"error": f"LLM service error: {e.detail}"}
+            except ValueError as e:
+                failure = {"error": f"Value error: {str(e)}"}
+            except TypeError as e:
+                failure = {"error": f"Type error: {str(e)}"}
+
+            # Only reached when the cluster failed: report and mark all of its rows for a retry
+            failures.append({"id": question_id, **failure})
+            failures.extend({
+                "id": duplicate_id,
+                "error": f"Near-duplicate of question {question_id}, which failed"
+            } for duplicate_id in duplicate_ids)
+            for target_id in [question_id] + duplicate_ids:
+                failed_writer.add({"id": target_id, "knowledge_status": STATUS_FAILED})
+
+        # Rows whose batch could not be written are retried like failed generations
+        writer.flush()
+        failures.extend(writer.failures)
+        for failure in writer.failures:
+            failed_writer.add({"id": failure["id"], "knowledge_status": STATUS_FAILED})
+    # Rows whose failed status could not be written are already reported above
+
+    result = format_bulk_operation_result(
+        total_items=len(rows),
+        updated_count=writer.written,
+        failures=failures
+    )
+    result["reused_count"] = reused_count
+    return result
+
+
+def generate_qa_bulk(db: Session, rows: List[Tuple[int, str]]) -> Dict[str, Any]:
+    """
+    Generate question and answer pairs for the given questions and update the database.
+
+    Args:
+        db: Database session
+        rows: (id, content) pairs of the questions to process
+
+    Returns:
+        Bulk operation result
+    """
+    failures = []
+
+    with question_writer(db) as writer:
+        for index, (question_id, content) in enumerate(rows):
+            if not wait_for_llm():
+                failures.extend(unavailable_failures([row[0] for row in rows[index:]]))
+                break
+
+            try:
+                generated = generate("qa", content, row_id=question_id)
+                question_part = generated.output.question
+                answer_part = generated.output.answer
+
+                if question_part and answer_part:
+                    writer.add({
+                        "id": question_id,
+                        "question": question_part,
+                        "answer": answer_part,
+                        "qa_status": STATUS_DONE,
+                        "qa_generated_at": datetime.now(),
+                        "qa_prompt_version": generated.prompt_version
+                    })
+                else:
+                    failures.append({
+                        "id": question_id,
+                        "error": "Failed to parse LLM response",
+                        "response": generated.response
+                    })
+
+            except StructuredOutputError as e:
+                failures.append({
+                    "id": question_id,
+                    "error": f"Failed to parse LLM response: {str(e)}",
+                    "response": e.response
+                })
+            except (ValueError, TypeError) as e:
+                failures.append({
+                    "id": question_id,
+                    "error": f"Value or type error: {str(e)}"
+                })
+            except (KeyError, IndexError) as e:
+                failures.append({
+                    "id": question_id,
+                    "error": f"Key or index error: {str(e)}"
+                })
+            except HTTPException as e:
+                failures.append({
+                    "id": question_id,
+                    "error": f"LLM service error: {e.detail}"
+                })
+
+    # Mark the rows that could not be generated or written, so they are picked up
+    # again; rows whose failed status could not be written are already reported
+    failures.extend(writer.failures)
+    with question_writer(db) as failed_writer:
+        for failure in failures:
+            failed_writer.add({"id": failure["id"], "qa_status": STATUS_FAILED})
+
+    return format_bulk_operation_result(
+        total_items=len(rows),
+        updated_count=writer.written,
+        failures=failures
+    )
+
+
+def generate_content_group_bulk(db: Session,
+                                table_name: str,
+                                rows: List[Mapping[str, Any]],
+                                job_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Generate a single-choice question for each row of a content group table.
+    One of the row's filled content columns is picked at random as the correct
+    answer; the others are the wrong options.
+
+    The outcome of every row is written to generation_outcomes in batches
+    instead of being collected in memory, so the result stays the same size
+    however many rows are processed (see crud.get_generation_outcomes).
+    Outcomes older than writeback.outcome_retention_days are deleted first.
+
+    Args:
+        db: Database session
+        table_name: Content group table of the rows
+        rows: Rows of the table as column mappings
+        job_id: Job the outcomes are recorded under (default: a new id)
+
+    Returns:
+        The job id and the numbers of successful, failed and skipped rows
+    """
+    job_id = job_id or uuid.uuid4().hex
+    counts = {"success": 0, "failed": 0, "skipped": 0}
+
+    retention_days = get_settings().outcome_retention_days
+    if retention_days > 0:
+        try:
+            prune_generation_outcomes(db, datetime.now() - timedelta(days=retention_days))
+        except SQLAlchemyError as e:
+            # Old outcomes are pruned again by the next job
+            db.rollback()
+            logger.warning("Failed to prune generation outcomes: %s", e)
+
+    with content_group_writer(db, table_name) as writer, outcome_writer(db) as outcomes:
+        def record(row_id: Any, status: str, **fields) -> None:
+            counts[status] += 1
+            outcomes.add({
+                "job_id": job_id,
+                "table_name": table_name,
+                "row_id": row_id,
+                "status": status,
+                "question": fields.get("question"),
+                "correct_answer": fields.get("correct_answer"),
+                "error": fields.get("error"),
+                "created_at": datetime.now()
+            })
+
+        # Generate questions for each row; results are written back in batches
+        for index, row in enumerate(rows):
+            # Pause while the LLM service is down; give up on the rest if it stays down
+            if not wait_for_llm():
+                skipped_ids = [pending["id"] for pending in rows[index:]]
+                for failure in unavailable_failures(skipped_ids):
+                    record(failure["id"], "failed", error=failure["error"])
+                break
+
+            row_id = row["id"]
+            # Find content columns with data
+            content_columns = {
+                column: value for column, value in row.items()
+                if column.startswith("content") and value is not None
+            }
+
+            # make sure we have at least two content columns with data
+            if len(content_columns) < 2:
+                record(row_id, "skipped", error="Insufficient content columns with data")
+                continue
+
+            try:
+                # randomly select one content column to be the correct answer
+                correct_column, correct_content = random.choice(list(content_columns.items()))
+                correct_number = correct_column.replace("content", "")
+
+                # generate the question text, without answer options
+                question_text = generate(
+                    "content_group", correct_content, row_id=row_id
+                ).output.question
+
+                # queue the generated question and correct answer for write-back
+                writer.add({
+                    "question": question_text,
+                    "answer": correct_number,
+                    "updated_at": datetime.now(),
+                    "id": row_id
+                })
+                record(row_id, "success", question=question_text, correct_answer=correct_number)
+
+            except ValueError as row_error:
+                record(row_id, "failed", error=str(row_error))
+            except HTTPException as llm_error:
+                record(row_id, "failed", error=f"LLM service error: {llm_error.detail}")
+
+        # Flush the questions first, so rows whose batch could not be written are known
+        writer.flush()
+        counts["success"] -= len(writer.failures)
+        counts["failed"] += len(writer.failures)
+        outcomes.flush()
+        if writer.failures:
+            outcome_table = GenerationOutcome.__table__
+            db.execute(
+                update(outcome_table)
+                .where(outcome_table.c.job_id == job_id,
+                       outcome_table.c.row_id == bindparam("failed_row_id"))
+                .values(status="failed", question=None, correct_answer=None,
+                        error=bindparam("failed_error")),
+                [{"failed_row_id": failure["id"], "failed_error": failure["error"]}
+                 for failure in writer.failures]
+            )
+            db.commit()
+
+    if outcomes.failures:
+        logger.warning("Failed to record %d outcomes of job %s", len(outcomes.failures), job_id)
+
+    return {
+        "job_id": job_id,
+        "total_rows": len(rows),
+        "success_count": counts["success"],
+        "failure_count": counts["failed"],
+        "skipped_count": counts["skipped"]
+    }
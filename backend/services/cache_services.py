@@ -0,0 +1,149 @@
+"""
+cache_services.py
+This module implements HTTP conditional GETs for read endpoints.
+
+Each cacheable resource has a cheap version stamp: a change counter maintained by
+database triggers (see migrations.py) or SQLite's schema version. The stamp becomes
+the ETag, so a matching If-None-Match is answered with 304 without reading any rows.
+Rendered bodies can also be kept in a small in-process cache keyed by the same
+stamp; any write bumps the counter and thereby invalidates the cached body, even
+when the write happens in another process.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from functools import lru_cache
+from threading import Lock
+from typing import Any, Callable, Optional
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from backend.responses import FastJSONResponse
+from backend.config import get_settings
+
+
+@dataclass(frozen=True)
+class ResourceVersion:
+    """
+    Version stamp of a readable resource.
+    """
+    tag: str
+    last_modified: Optional[datetime] = None
+
+    @property
+    def etag(self) -> str:
+        """Weak ETag, since compression may change the representation bytes."""
+        return f'W/"{self.tag}"'
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of rendered response bodies keyed by resource name.
+    Only the body for the most recent version of each resource is kept.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str, etag: str) -> Optional[bytes]:
+        """Return the cached body for key if it was rendered for this ETag."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, etag: str, body: bytes) -> None:
+        """Store a rendered body, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+@lru_cache(maxsize=None)
+def get_response_cache() -> ResponseCache:
+    """
+    Return the process-wide response cache, created on first use.
+    """
+    return ResponseCache(get_settings().response_cache_max_entries)
+
+
+def get_table_version(db: Session, table_name: str) -> ResourceVersion:
+    """
+    Read the change counter of a table from table_versions.
+    """
+    row = db.execute(
+        text("SELECT version, updated_at FROM table_versions WHERE name = :name"),
+        {"name": table_name}
+    ).first()
+    if row is None:
+        return ResourceVersion(tag=f"{table_name}-0")
+
+    last_modified = datetime.strptime(row.updated_at, "%Y-%m-%d %H:%M:%S")
+    last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # The timestamp distinguishes counters of a recreated database
+    return ResourceVersion(
+        tag=f"{table_name}-{row.version}-{int(last_modified.timestamp())}",
+        last_modified=last_modified
+    )
+
+
+def get_schema_version(db: Session) -> ResourceVersion:
+    """
+    Read SQLite's schema version, which changes whenever a table is created or dropped.
+    """
+    version = db.execute(text("PRAGMA schema_version")).scalar()
+    return ResourceVersion(tag=f"schema-{version}")
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """
+    Check whether the request's If-None-Match header matches the ETag.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    # Weak comparison: W/"x" and "x" are equivalent
+    bare = etag.removeprefix("W/")
+    return "*" in candidates or any(c.removeprefix("W/") == bare for c in candidates)
+
+
+def conditional_response(request: Request,
+                         cache_key: str,
+                         version: ResourceVersion,
+                         load_content: Callable[[], Any]) -> Response:
+    """
+    Build a JSON response that honours If-None-Match and the in-process cache.
+
+    Args:
+        request: The incoming request
+        cache_key: Unique name of the resource (e.g. the endpoint path)
+        version: Current version stamp of the resource
+        load_content: Callable returning the JSON-serializable content; only
+            invoked when neither the client nor the cache holds this version
+
+    Returns:
+        304 response, cached response, or freshly rendered response
+    """
+    headers = {"ETag": version.etag, "Cache-Control": "no-cache"}
+    if version.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(version.last_modified, usegmt=True)
+
+    if _etag_matches(request, version.etag):
+        return Response(status_code=304, headers=headers)
+
+    cache = get_response_cache() if get_settings().response_cache_enabled else None
+    body = cache.get(cache_key, version.etag) if cache else None
+    if body is None:
+        body = FastJSONResponse(load_content()).body
+        if cache:
+            cache.put(cache_key, version.etag, body)
+
+    return Response(content=body, media_type="application/json", headers=headers)
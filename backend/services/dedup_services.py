@@ -0,0 +1,164 @@
+"""
+dedup_services.py
+This module detects near-duplicate content so that bulk generation can send one
+representative per cluster to the LLM and reuse its result for the others.
+
+Similarity is estimated with MinHash signatures over word shingles, and candidate
+pairs are found with locality-sensitive hashing (LSH) banding, so the pre-pass
+stays close to linear in the number of rows.
+"""
+import re
+import zlib
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+
+# Mersenne prime used for the universal hash family (a * x + b) mod p
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Signature of a text without shingles; never equal to a real MinHash value
+_EMPTY_SIGNATURE = np.iinfo(np.uint64).max
+
+# Chinese and Japanese are written without spaces, so each ideograph or kana is
+# a token of its own; any other run of letters or digits (in any script) is a word
+_CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TOKEN_PATTERN = re.compile(rf"[{_CJK_CHARS}]|[^\W_{_CJK_CHARS}]+")
+
+
+def _shingles(text: str, shingle_size: int) -> set:
+    """
+    Split normalized text into a set of word shingles.
+    Texts shorter than the shingle size are kept as a single shingle;
+    texts without any word give an empty set.
+    """
+    tokens = _TOKEN_PATTERN.findall((text or "").lower())
+    if not tokens:
+        return set()
+    if len(tokens) <= shingle_size:
+        return {" ".join(tokens)}
+    return {
+        " ".join(tokens[i:i + shingle_size])
+        for i in range(len(tokens) - shingle_size + 1)
+    }
+
+
+def _lsh_bands(num_permutations: int, threshold: float) -> Tuple[int, int]:
+    """
+    Choose the number of bands and rows per band whose LSH threshold
+    (1/bands)^(1/rows) is closest to the requested similarity threshold.
+    """
+    best = (num_permutations, 1)
+    best_error = float("inf")
+    for rows in range(1, num_permutations + 1):
+        if num_permutations % rows:
+            continue
+        bands = num_permutations // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class _UnionFind:
+    """
+    Minimal union-find used to merge matching pairs into clusters.
+    """
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        """Return the root of the item, compressing the path on the way."""
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, first: int, second: int) -> None:
+        """Merge two sets, keeping the smaller index as the root."""
+        root_a, root_b = self.find(first), self.find(second)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def minhash_signatures(texts: Sequence[str],
+                       num_permutations: int = 128,
+                       shingle_size: int = 3,
+                       seed: int = 1) -> np.ndarray:
+    """
+    Compute MinHash signatures for a list of texts.
+
+    Args:
+        texts: The texts to sign
+        num_permutations: Number of hash permutations (signature length)
+        shingle_size: Number of words per shingle
+        seed: Seed for the permutation coefficients
+
+    Returns:
+        Array of shape (len(texts), num_permutations) with uint64 signatures;
+        texts without words get a row of _EMPTY_SIGNATURE
+    """
+    rng = np.random.default_rng(seed)
+    coef_a = rng.integers(1, _MAX_HASH, size=num_permutations, dtype=np.uint64)
+    coef_b = rng.integers(0, _MAX_HASH, size=num_permutations, dtype=np.uint64)
+
+    signatures = np.empty((len(texts), num_permutations), dtype=np.uint64)
+    for i, text in enumerate(texts):
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in _shingles(text, shingle_size)),
+            dtype=np.uint64
+        )
+        if not hashes.size:
+            signatures[i] = _EMPTY_SIGNATURE
+            continue
+        permuted = (np.outer(coef_a, hashes) + coef_b[:, None]) % _MERSENNE_PRIME
+        signatures[i] = (permuted & _MAX_HASH).min(axis=1)
+    return signatures
+
+
+def cluster_near_duplicates(texts: Sequence[str],
+                            threshold: float = 0.8,
+                            num_permutations: int = 128,
+                            shingle_size: int = 3) -> List[List[int]]:
+    """
+    Group texts whose estimated Jaccard similarity reaches the threshold.
+
+    Args:
+        texts: The texts to cluster
+        threshold: Minimum estimated similarity (0-1) for two texts to be merged
+        num_permutations: Number of MinHash permutations
+        shingle_size: Number of words per shingle
+
+    Returns:
+        List of clusters, each a sorted list of indexes into texts. The first index
+        of every cluster is its representative. Singletons are included; texts
+        without any word are always singletons.
+    """
+    if not texts:
+        return []
+
+    signatures = minhash_signatures(texts, num_permutations, shingle_size)
+    bands, rows = _lsh_bands(num_permutations, threshold)
+    union_find = _UnionFind(len(texts))
+    # Texts without words carry no evidence of similarity and are never merged
+    candidates = np.flatnonzero(signatures[:, 0] != _EMPTY_SIGNATURE)
+
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = {}
+        band_slice = signatures[:, band * rows:(band + 1) * rows]
+        for i in candidates:
+            buckets.setdefault(band_slice[i].tobytes(), []).append(int(i))
+
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            # Verify candidates against the full signature before merging
+            anchor = members[0]
+            similarity = (signatures[members[1:]] == signatures[anchor]).mean(axis=1)
+            for member, score in zip(members[1:], similarity):
+                if score >= threshold:
+                    union_find.union(anchor, member)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(texts)):
+        clusters.setdefault(union_find.find(i), []).append(i)
+    return sorted(clusters.values(), key=lambda cluster: cluster[0])
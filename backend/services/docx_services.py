@@ -0,0 +1,171 @@
+"""
+docx_services.py
+This module reads the content tables of a Word .docx file without building the
+python-docx object model.
+
+word/document.xml is streamed from the zip archive with lxml's iterparse, one
+table row at a time. Rows are converted to plain tuples and cleared as soon as
+they have been read, so memory use stays flat however long the document is.
+Merged cells are resolved the way python-docx does: a cell spanning several
+grid columns (gridSpan) is repeated for each of them, and a vertically merged
+continuation cell (vMerge) repeats the text of the cell it continues.
+"""
+import zipfile
+from typing import Dict, Iterator, List, NamedTuple
+from lxml import etree
+
+# WordprocessingML namespace
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+_BODY = f"{_W}body"
+_PARAGRAPH = f"{_W}p"
+_TABLE = f"{_W}tbl"
+_ROW = f"{_W}tr"
+_CELL = f"{_W}tc"
+_TEXT = f"{_W}t"
+_VAL = f"{_W}val"
+
+# Run content that python-docx renders as whitespace in cell text
+_RUN_WHITESPACE = {f"{_W}tab": "\t", f"{_W}br": "\n", f"{_W}cr": "\n"}
+
+# Number of leading cells read from each table row
+_ROW_CELLS = 4
+
+
+class DocxRow(NamedTuple):
+    """
+    One content row of a document table together with the section it is in.
+    """
+    section: str
+    seq: str
+    page_name: str
+    audio_file: str
+    content: str
+
+
+def _paragraph_text(paragraph: etree._Element) -> str:
+    """
+    Text of a paragraph inside a table cell, as python-docx's Paragraph.text renders it.
+    """
+    parts = []
+    for element in paragraph.iter(_TEXT, *_RUN_WHITESPACE):
+        if element.tag == _TEXT:
+            parts.append(element.text or "")
+        else:
+            parts.append(_RUN_WHITESPACE[element.tag])
+    return "".join(parts)
+
+
+def _cell_text(cell: etree._Element) -> str:
+    """
+    Text of a table cell: its paragraphs joined by newlines.
+    """
+    return "\n".join(_paragraph_text(p) for p in cell.iterchildren(_PARAGRAPH))
+
+
+def _int_property(properties: etree._Element, tag: str, default: int) -> int:
+    """
+    Read an integer w:val property such as gridSpan, falling back to default.
+    """
+    element = properties.find(f"{_W}{tag}") if properties is not None else None
+    if element is None:
+        return default
+    try:
+        return int(element.get(_VAL, default))
+    except ValueError:
+        return default
+
+
+def _row_texts(row: etree._Element, merged: Dict[int, str]) -> List[str]:
+    """
+    Texts of a table row per grid column.
+
+    Args:
+        row: w:tr element
+        merged: Text last seen per grid column of the table, used to resolve
+            vertically merged cells; updated with this row's cells
+
+    Returns:
+        One text per grid column occupied by the row
+    """
+    texts = [""] * _int_property(row.find(f"{_W}trPr"), "gridBefore", 0)
+    for cell in row.iterchildren(_CELL):
+        properties = cell.find(f"{_W}tcPr")
+        span = max(_int_property(properties, "gridSpan", 1), 1)
+        v_merge = properties.find(f"{_W}vMerge") if properties is not None else None
+        column = len(texts)
+
+        if v_merge is not None and v_merge.get(_VAL, "continue") == "continue":
+            text = merged.get(column, "")
+        else:
+            text = _cell_text(cell)
+
+        for offset in range(span):
+            merged[column + offset] = text
+        texts.extend([text] * span)
+    return texts
+
+
+def _release(element: etree._Element) -> None:
+    """
+    Free a processed element and the siblings parsed before it.
+    """
+    element.clear()
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def iter_docx_rows(docx_path: str) -> Iterator[DocxRow]:
+    """
+    Stream the content rows of every top-level table in a .docx file.
+
+    Top-level paragraphs starting with "section" set the section of the
+    following rows. The first row of every table is a header and is skipped,
+    as are rows without content.
+
+    Args:
+        docx_path: Path to the .docx file
+
+    Yields:
+        DocxRow with stripped (section, seq, page_name, audio_file, content)
+    """
+    section = "Unknown Section"
+    current_table = None
+    row_index = 0
+    merged: Dict[int, str] = {}
+
+    with zipfile.ZipFile(docx_path) as archive, archive.open("word/document.xml") as xml:
+        for _, element in etree.iterparse(xml, events=("end",),
+                                          tag=(_PARAGRAPH, _ROW, _TABLE)):
+            parent = element.getparent()
+
+            if element.tag == _PARAGRAPH:
+                if parent is None or parent.tag != _BODY:
+                    continue  # Cell paragraphs are read with their row
+                text = "".join(t.text or "" for t in element.iter(_TEXT)).strip()
+                if text.lower().startswith("section"):
+                    section = text
+                _release(element)
+
+            elif element.tag == _ROW:
+                table_parent = parent.getparent() if parent is not None else None
+                if table_parent is None or table_parent.tag != _BODY:
+                    continue  # Rows of nested tables belong to their outer cell
+                if parent is not current_table:
+                    current_table, row_index, merged = parent, 0, {}
+                texts = _row_texts(element, merged)
+                row_index += 1
+                _release(element)
+
+                if row_index == 1:
+                    continue  # Skip header
+                texts = [text.strip() for text in texts[:_ROW_CELLS]]
+                texts += [""] * (_ROW_CELLS - len(texts))
+                if texts[3]:
+                    yield DocxRow(section, *texts)
+
+            elif parent is not None and parent.tag == _BODY:
+                current_table = None
+                _release(element)
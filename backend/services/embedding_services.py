@@ -0,0 +1,128 @@
+"""
+embedding_services.py
+This module computes embeddings of question contents with Ollama and caches
+them in the question_embeddings table.
+
+Vectors are normalized to unit length before they are stored, so the cosine
+similarity of two contents is the dot product of their vectors. A cached vector
+is reused as long as the content hash and the embedding model are unchanged;
+only new or edited contents are sent to Ollama, in batches of
+embedding.batch_size.
+"""
+import hashlib
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import requests
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from backend.config import get_settings
+from backend.models import QuestionEmbedding
+
+
+def content_hash(content: str) -> str:
+    """
+    Hash identifying the content an embedding was computed from.
+    """
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale every row to unit length; all-zero rows are left as they are.
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def embed_texts(texts: Sequence[str]) -> np.ndarray:
+    """
+    Embed texts with the configured embedding model.
+
+    Returns:
+        float32 array of shape (len(texts), dimensions) with normalized rows
+
+    Raises:
+        HTTPException: If the embedding API cannot be reached or fails
+    """
+    settings = get_settings()
+    url = f"{settings.llm_base_url}/api/embed"
+    batches = []
+    for start in range(0, len(texts), settings.embedding_batch_size):
+        batch = [text or "" for text in texts[start:start + settings.embedding_batch_size]]
+        try:
+            response = requests.post(
+                url,
+                json={"model": settings.embedding_model, "input": batch},
+                timeout=settings.embedding_timeout
+            )
+            response.raise_for_status()
+            batches.append(np.asarray(response.json()["embeddings"], dtype=np.float32))
+        except requests.HTTPError as e:
+            raise HTTPException(status_code=500, detail="Failed to call embedding API") from e
+        except requests.RequestException as e:
+            raise HTTPException(status_code=500, detail=f"Embedding API error: {str(e)}") from e
+    if not batches:
+        return np.zeros((0, 0), dtype=np.float32)
+    return normalize_rows(np.concatenate(batches))
+
+
+def _load_cached(db: Session, model: str) -> Dict[int, Tuple[str, bytes]]:
+    """
+    Return {question_id: (content_hash, vector bytes)} of the cached embeddings of a model.
+    """
+    rows = (
+        db.query(QuestionEmbedding.question_id,
+                 QuestionEmbedding.content_hash,
+                 QuestionEmbedding.vector)
+        .filter(QuestionEmbedding.model == model)
+        .all()
+    )
+    return {row.question_id: (row.content_hash, row.vector) for row in rows}
+
+
+def get_question_embeddings(db: Session, rows: Sequence[Tuple[int, str]]) -> np.ndarray:
+    """
+    Return the normalized embeddings of questions, computing and caching the missing ones.
+
+    Args:
+        db: Database session
+        rows: (id, content) pairs of the questions
+
+    Returns:
+        float32 array with one row per question, in the order of rows
+    """
+    model = get_settings().embedding_model
+    cached = _load_cached(db, model)
+    hashes = [content_hash(content) for _, content in rows]
+
+    vectors: List[Optional[np.ndarray]] = [None] * len(rows)
+    missing = []
+    for index, ((question_id, _), digest) in enumerate(zip(rows, hashes)):
+        entry = cached.get(question_id)
+        if entry is not None and entry[0] == digest:
+            vectors[index] = np.frombuffer(entry[1], dtype=np.float32)
+        else:
+            missing.append(index)
+
+    if missing:
+        computed = embed_texts([rows[index][1] for index in missing])
+        records = []
+        for index, vector in zip(missing, computed):
+            vectors[index] = vector
+            records.append({
+                "question_id": rows[index][0],
+                "model": model,
+                "content_hash": hashes[index],
+                "dimensions": int(vector.shape[0]),
+                "vector": vector.tobytes()
+            })
+        # One executemany; entries of edited contents or another model are replaced
+        db.execute(insert(QuestionEmbedding).prefix_with("OR REPLACE"), records)
+        db.commit()
+
+    if not vectors:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack(vectors)
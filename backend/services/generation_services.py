@@ -0,0 +1,330 @@
+"""
+generation_services.py
+This module runs one generation task (knowledge point, Q&A pair or single-choice
+question) for a piece of content: it renders the prompt, calls the LLM with the
+task's options and returns the parsed output.
+
+Prompts are split into a static system prompt, identical for every row, and a
+short per-row template holding {content}. Ollama keeps the evaluated system
+prefix cached between calls, so each row only pays for evaluating its content.
+
+System prompts do not prescribe a response format. In free-text mode the task's
+text format ("Question: ... Answer: ...") is appended to them, in structured mode
+an instruction naming the JSON fields, so a prompt never asks for both.
+
+Every pair of system prompt and template has a prompt version, a short hash of
+the text actually sent, including the appended format. It is returned with each
+generation and stored next to the generated field, so rows produced by an outdated
+prompt or in the other output mode can be found and regenerated.
+
+Content is first fitted into the task's input budget (see budget_services):
+oversized content is truncated or, for tasks with a merge function, split into
+parts that are generated separately and merged into one output.
+
+Each part is sent to the model picked by the task's routing rule
+(llm_services.route_model). When a small model's output cannot be parsed or
+fails validation, the part is generated again by the larger model.
+
+With llm.structured_output enabled the model is constrained to the task's JSON
+schema (see schemas.py) and the response goes through the shared structured
+decoder. Its output budget includes llm.structured_extra_tokens for the JSON
+wrapper; only schema violations are retried, each with twice the output budget,
+since a response cut off before its closing brace is the common violation.
+Otherwise the free-text response is parsed with the task's text parser.
+"""
+import hashlib
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel
+
+from backend.config import Settings, get_settings
+from backend.schemas import KnowledgeOutput, QAOutput, ContentGroupQuestionOutput
+from backend.services.budget_services import (
+    STRATEGY_CHUNK,
+    estimate_tokens,
+    get_input_budget,
+    split_to_budget
+)
+from backend.services.llm_services import (
+    GenerationOptions,
+    ModelRoute,
+    call_llm,
+    get_generation_options,
+    route_model
+)
+from backend.services.llm_stats_services import LLM_STATS
+from backend.services.parser_services import (
+    StructuredOutputError,
+    clean_knowledge_point,
+    knowledge_complete,
+    parse_qa_response,
+    qa_complete,
+    parse_content_group_question,
+    content_group_question_complete,
+    decode_structured_response
+)
+
+
+@dataclass(frozen=True)
+class TaskSpec:
+    """
+    Description of a generation task.
+    """
+    name: str
+    output_model: Type[BaseModel]
+    system: Callable[[Settings], str]
+    template: Callable[[Settings], str]
+    text_format: Callable[[Settings], str]
+    parse_text: Callable[[str], BaseModel]
+    is_complete: Callable[[str], bool]
+    # Combines the outputs of content parts; tasks without one are truncated instead
+    merge: Optional[Callable[[List[BaseModel]], BaseModel]] = None
+
+
+@dataclass
+class GenerationResult:
+    """
+    Parsed output of a generation together with the raw LLM response and the
+    version of the prompt that produced it.
+    Fields of output may be empty when a free-text response could not be parsed.
+    """
+    output: BaseModel
+    response: str
+    prompt_version: str
+
+
+def _parse_knowledge_text(response: str) -> KnowledgeOutput:
+    return KnowledgeOutput.model_construct(knowledge_point=clean_knowledge_point(response))
+
+
+def _merge_knowledge(outputs: List[KnowledgeOutput]) -> KnowledgeOutput:
+    """
+    Join the distinct knowledge points of the parts of a long content.
+    """
+    points = []
+    for output in outputs:
+        if output.knowledge_point and output.knowledge_point not in points:
+            points.append(output.knowledge_point)
+    return KnowledgeOutput.model_construct(knowledge_point=" ".join(points))
+
+
+def _parse_qa_text(response: str) -> QAOutput:
+    question, answer = parse_qa_response(response)
+    return QAOutput.model_construct(question=question, answer=answer)
+
+
+def _parse_content_group_text(response: str) -> ContentGroupQuestionOutput:
+    return ContentGroupQuestionOutput.model_construct(
+        question=parse_content_group_question(response)
+    )
+
+
+TASKS: Dict[str, TaskSpec] = {
+    "knowledge": TaskSpec(
+        name="knowledge",
+        output_model=KnowledgeOutput,
+        system=lambda settings: settings.knowledge_system_prompt,
+        template=lambda settings: settings.knowledge_prompt_template,
+        text_format=lambda settings: settings.knowledge_text_format,
+        parse_text=_parse_knowledge_text,
+        is_complete=knowledge_complete,
+        merge=_merge_knowledge
+    ),
+    "qa": TaskSpec(
+        name="qa",
+        output_model=QAOutput,
+        system=lambda settings: settings.qa_system_prompt,
+        template=lambda settings: settings.qa_prompt_template,
+        text_format=lambda settings: settings.qa_text_format,
+        parse_text=_parse_qa_text,
+        is_complete=qa_complete
+    ),
+    "content_group": TaskSpec(
+        name="content_group",
+        output_model=ContentGroupQuestionOutput,
+        system=lambda settings: settings.content_group_question_system_prompt,
+        template=lambda settings: settings.content_group_question_template,
+        text_format=lambda settings: settings.content_group_question_text_format,
+        parse_text=_parse_content_group_text,
+        is_complete=content_group_question_complete
+    ),
+}
+
+
+def split_prompt_template(template: str) -> Tuple[str, str]:
+    """
+    Split a single combined template into a static prefix and a per-row part,
+    at the first line containing {content}. Used when no system prompt is configured.
+
+    Returns:
+        Tuple of (system prompt, per-row template)
+    """
+    lines = template.splitlines(keepends=True)
+    for index, line in enumerate(lines):
+        if "{content}" in line:
+            return "".join(lines[:index]).strip(), "".join(lines[index:])
+    return "", template
+
+
+def _json_instruction(output_model: Type[BaseModel]) -> str:
+    """
+    Instruction appended to structured prompts, naming the expected JSON fields.
+    """
+    field_names = ", ".join(f'"{name}"' for name in output_model.model_fields)
+    return f"\n\nRespond only with a JSON object with the fields {field_names}."
+
+
+def get_task_prompts(task: str, settings: Settings) -> Tuple[str, str]:
+    """
+    Return the system prompt and per-row template of a task, with the response
+    format instruction of the configured output mode appended to the system prompt.
+    """
+    spec = TASKS[task]
+    system = spec.system(settings)
+    if system:
+        system, template = system.strip(), spec.template(settings)
+    else:
+        system, template = split_prompt_template(spec.template(settings))
+
+    text_format = spec.text_format(settings).strip()
+    if settings.structured_output:
+        system += _json_instruction(spec.output_model)
+    elif text_format:
+        system = f"{system}\n{text_format}"
+    return system, template
+
+
+def get_prompt_version(task: str, settings: Optional[Settings] = None) -> str:
+    """
+    Return the version of a task's current prompt: a short hash of its system
+    prompt and template as sent, which changes whenever either is edited or the
+    output mode is switched.
+    """
+    system, template = get_task_prompts(task, settings or get_settings())
+    digest = hashlib.sha256(f"{system}\0{template}".encode("utf-8")).hexdigest()
+    return digest[:12]
+
+
+def generate(task: str, content: str, row_id: Optional[int] = None) -> GenerationResult:
+    """
+    Run a generation task for one piece of content.
+    The statistics of every LLM call are recorded for the task's throughput reports.
+
+    Args:
+        task: Task name ("knowledge", "qa" or "content_group")
+        content: Content inserted into the task's prompt template
+        row_id: Optional id of the row the content belongs to, stored with the statistics
+
+    Returns:
+        GenerationResult with the parsed output and the raw response
+
+    Raises:
+        StructuredOutputError: In structured mode, if every attempt violated the schema
+    """
+    settings = get_settings()
+    spec = TASKS[task]
+    system, template = get_task_prompts(task, settings)
+    prompt_version = get_prompt_version(task, settings)
+    options = get_generation_options(task)
+    if settings.structured_output and options.num_predict:
+        # The JSON wrapper must not eat into the tokens of the fields themselves
+        options = replace(
+            options, num_predict=options.num_predict + settings.structured_extra_tokens
+        )
+
+    # Fit the content into what is left of the context after the fixed prompt and the output
+    budget = get_input_budget(
+        task,
+        reserved_tokens=estimate_tokens(system + template) + (options.num_predict or 0),
+        num_ctx=options.num_ctx
+    )
+    parts = split_to_budget(content, budget.max_tokens)
+    if budget.strategy != STRATEGY_CHUNK or spec.merge is None:
+        parts = parts[:1]
+
+    results = [
+        _generate_part(
+            task, template.format(content=part), system, options,
+            route_model(task, estimate_tokens(part)), row_id
+        )
+        for part in parts
+    ]
+    if len(results) == 1:
+        output, response = results[0]
+    else:
+        output = spec.merge([output for output, _ in results])
+        response = "\n\n".join(response for _, response in results)
+    return GenerationResult(output=output, response=response, prompt_version=prompt_version)
+
+
+def _generate_part(task: str,
+                   prompt: str,
+                   system: str,
+                   options: GenerationOptions,
+                   route: ModelRoute,
+                   row_id: Optional[int]) -> Tuple[BaseModel, str]:
+    """
+    Generate the output for one rendered prompt.
+
+    Returns:
+        Tuple of (parsed output, raw response)
+    """
+    settings = get_settings()
+    spec = TASKS[task]
+    prompt_version = get_prompt_version(task, settings)
+
+    if not settings.structured_output:
+        for model in filter(None, (route.model, route.escalation_model)):
+            result = call_llm(
+                prompt,
+                model=model,
+                options=options,
+                is_complete=spec.is_complete,
+                system=system
+            )
+            LLM_STATS.record(task, result, prompt_version, row_id)
+            output = spec.parse_text(result.text)
+            # An incomplete parse is only retried on a larger model
+            if all(getattr(output, name) for name in spec.output_model.model_fields):
+                break
+        return output, result.text
+
+    # Text stop sequences could cut the JSON object short
+    options = replace(options, stop=None)
+    schema = spec.output_model.model_json_schema()
+
+    # A schema violation of a small model escalates straight to the large model,
+    # which then gets the retries
+    models = [route.model] * (settings.structured_retries + 1)
+    if route.escalation_model:
+        models = [route.model] + [route.escalation_model] * (settings.structured_retries + 1)
+
+    error = None
+    for attempt, model in enumerate(models):
+        if attempt and options.num_predict:
+            # The response may have been cut off by num_predict before its closing
+            # brace; the same budget at low temperature would fail the same way
+            num_predict = options.num_predict * 2
+            if options.num_ctx:
+                num_predict = min(num_predict,
+                                  options.num_ctx - estimate_tokens(system + prompt))
+            options = replace(options, num_predict=max(num_predict, options.num_predict))
+        # No completion rule: the schema already ends generation at the closing
+        # brace, and reading on to Ollama's final message keeps its token statistics
+        result = call_llm(
+            prompt,
+            model=model,
+            options=options,
+            output_format=schema,
+            system=system
+        )
+        LLM_STATS.record(task, result, prompt_version, row_id)
+        try:
+            output = decode_structured_response(result.text, spec.output_model)
+        except StructuredOutputError as e:
+            error = e
+            continue
+        if task == "knowledge":
+            output.knowledge_point = clean_knowledge_point(output.knowledge_point)
+        return output, result.text
+    raise error
@@ -0,0 +1,89 @@
+"""
+grouping_services.py
+This module decides which questions form a content group.
+
+In "sequential" mode questions are grouped in id order. In "similarity" mode
+every group is built around an anchor question together with the k - 1 most
+similar questions that are still ungrouped, so whichever option ends up as the
+correct answer, the others are plausible distractors.
+
+Similarities are cosine similarities of normalized embeddings (see
+embedding_services), computed one block of anchors at a time as a single
+matrix product. Top-k candidates are selected with argpartition, so the only
+Python loop runs once per anchor, and memory stays at block_size x n floats.
+"""
+from typing import List
+import numpy as np
+
+GROUPING_SEQUENTIAL = "sequential"
+GROUPING_SIMILARITY = "similarity"
+GROUPING_MODES = (GROUPING_SEQUENTIAL, GROUPING_SIMILARITY)
+
+# Candidates ranked per anchor, as a multiple of k: the headroom covers
+# candidates taken by earlier anchors of the same block
+_CANDIDATE_FACTOR = 4
+
+
+def group_sequential(count: int, k: int) -> List[List[int]]:
+    """
+    Group the indexes 0..count-1 into consecutive groups of k; the last group may be smaller.
+    """
+    return [list(range(start, min(start + k, count))) for start in range(0, count, k)]
+
+
+def _top_indexes(similarities: np.ndarray, indexes: np.ndarray, limit: int) -> np.ndarray:
+    """
+    Return the indexes with the highest similarities, most similar first.
+    """
+    if len(indexes) > limit:
+        indexes = indexes[np.argpartition(-similarities[indexes], limit - 1)[:limit]]
+    return indexes[np.argsort(-similarities[indexes], kind="stable")]
+
+
+def group_by_similarity(vectors: np.ndarray, k: int, block_size: int = 256) -> List[List[int]]:
+    """
+    Group rows of normalized vectors into groups of k similar rows.
+
+    Anchors are taken in row order; each anchor is grouped with the k - 1 most
+    similar rows not yet in a group. The last groups may be smaller.
+
+    Args:
+        vectors: Array of shape (n, dimensions) with unit-length rows
+        k: Group size
+        block_size: Number of anchors whose similarities are computed at once
+
+    Returns:
+        Groups of row indexes, each starting with its anchor
+    """
+    count = len(vectors)
+    if k <= 1 or count <= k:
+        return group_sequential(count, k)
+
+    assigned = np.zeros(count, dtype=bool)
+    num_candidates = min(count, k * _CANDIDATE_FACTOR)
+    groups: List[List[int]] = []
+    position = 0
+    while position < count:
+        # The next block of ungrouped anchors, in row order
+        anchors = np.flatnonzero(~assigned[position:])[:block_size] + position
+        if len(anchors) == 0:
+            break
+        position = int(anchors[-1]) + 1
+
+        similarities = vectors[anchors] @ vectors.T
+        similarities[:, assigned] = -np.inf
+        candidates = np.argpartition(-similarities, num_candidates - 1, axis=1)[:, :num_candidates]
+
+        for row, anchor in enumerate(anchors):
+            if assigned[anchor]:
+                continue
+            assigned[anchor] = True
+            members = candidates[row][~assigned[candidates[row]]]
+            if len(members) >= k - 1:
+                members = _top_indexes(similarities[row], members, k - 1)
+            else:
+                # Earlier anchors of the block took the candidates: rank all ungrouped rows
+                members = _top_indexes(similarities[row], np.flatnonzero(~assigned), k - 1)
+            assigned[members] = True
+            groups.append([int(anchor), *members.tolist()])
+    return groups
@@ -0,0 +1,153 @@
+"""
+lease_services.py
+This module hands out rows to batch generation workers through leases in the
+generation_leases table, so that several processes, also on different
+machines sharing the database file, can work through the same selection
+without generating a row twice.
+
+A worker claims a batch of rows that match its selection and are not under an
+active lease in one IMMEDIATE transaction, which takes SQLite's write lock
+before reading and so cannot race another claim. Leases are kept while the run
+lasts, so a row that failed, or still matches the selection after it was
+generated, is not claimed again until its lease expires. Rows of a crashed
+worker become available again after lease_seconds. The leases are released
+when the run ends.
+
+A single row can take several LLM calls, so a batch may outlast its lease.
+While a worker runs, keep_leases renews all of its leases from a background
+thread every third of lease_seconds; only a worker that stopped renewing
+(crashed or hung) loses its rows to another worker.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, List, Sequence
+from sqlalchemy import DateTime, Table, delete, literal, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import ColumnElement
+
+from backend.database import SessionLocal
+from backend.models import GenerationLease
+
+logger = logging.getLogger(__name__)
+
+_LEASES = GenerationLease.__table__
+
+
+def claim_rows(db: Session,
+               task: str,
+               table: Table,
+               conditions: Sequence[ColumnElement],
+               owner: str,
+               limit: int,
+               lease_seconds: float) -> List[int]:
+    """
+    Lease up to limit rows of table matching conditions that nobody else holds.
+
+    Args:
+        db: Database session; its pending transaction is committed first
+        task: Lease namespace, e.g. "knowledge" or a content group table name
+        table: Table whose "id" column identifies the rows
+        conditions: WHERE conditions selecting the rows to generate
+        owner: Unique name of the claiming worker
+        limit: Maximum number of rows to claim
+        lease_seconds: Lease duration
+
+    Returns:
+        Ids of the claimed rows, ascending
+    """
+    now = datetime.now()
+    expires_at = now + timedelta(seconds=lease_seconds)
+    active = select(_LEASES.c.row_id).where(
+        _LEASES.c.task == task, _LEASES.c.expires_at > now
+    )
+    candidates = (
+        select(literal(task), table.c.id, literal(owner), literal(expires_at, DateTime))
+        .where(*conditions, table.c.id.not_in(active))
+        .order_by(table.c.id)
+        .limit(limit)
+    )
+    statement = insert(_LEASES).from_select(
+        ["task", "row_id", "owner", "expires_at"], candidates
+    )
+    # Only expired leases conflict, since active ones are excluded above
+    statement = statement.on_conflict_do_update(
+        index_elements=["task", "row_id"],
+        set_={"owner": statement.excluded.owner, "expires_at": statement.excluded.expires_at}
+    )
+
+    db.commit()
+    try:
+        # Take the write lock before reading, so concurrent claims are serialized
+        db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+        db.execute(statement)
+        claimed = db.execute(
+            select(_LEASES.c.row_id)
+            .where(_LEASES.c.task == task,
+                   _LEASES.c.owner == owner,
+                   _LEASES.c.expires_at == literal(expires_at, DateTime))
+            .order_by(_LEASES.c.row_id)
+        ).scalars().all()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return list(claimed)
+
+
+def renew_leases(db: Session, owner: str, lease_seconds: float) -> int:
+    """
+    Extend all leases held by owner to lease_seconds from now.
+    Rows another worker claimed after the lease expired are not taken back.
+
+    Returns:
+        Number of renewed leases
+    """
+    result = db.execute(
+        update(_LEASES)
+        .where(_LEASES.c.owner == owner)
+        .values(expires_at=datetime.now() + timedelta(seconds=lease_seconds))
+    )
+    db.commit()
+    return result.rowcount
+
+
+@contextmanager
+def keep_leases(owner: str, lease_seconds: float) -> Iterator[None]:
+    """
+    Renew the leases of owner in a background thread while the block runs.
+    """
+    stop = threading.Event()
+
+    def renew() -> None:
+        with SessionLocal() as db:
+            while not stop.wait(lease_seconds / 3):
+                try:
+                    renew_leases(db, owner, lease_seconds)
+                except SQLAlchemyError as e:
+                    # Retried at the next interval, well before the lease runs out
+                    db.rollback()
+                    logger.warning("Failed to renew the leases of %s: %s", owner, e)
+
+    thread = threading.Thread(target=renew, name=f"lease-renewal-{owner}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def release_leases(db: Session, owners: Sequence[str]) -> int:
+    """
+    Release all leases held by the given owners.
+
+    Returns:
+        Number of released leases
+    """
+    result = db.execute(delete(_LEASES).where(_LEASES.c.owner.in_(list(owners))))
+    db.commit()
+    return result.rowcount
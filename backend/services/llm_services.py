@@ -3,51 +3,420 @@ llm_services.py
 This module contains functions to interact with the LLM (Large Language Model) API.
 """
 import json
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, fields
+from threading import Event, Lock
+from typing import Any, Callable, Dict, List, Optional, Union
 import requests
 from fastapi import HTTPException
+from requests.adapters import HTTPAdapter
+
+from backend.config import get_settings
+from backend.services.resilience_services import (
+    LLM_CIRCUIT_BREAKER,
+    LLM_LATENCY,
+    LLMUnavailableError
+)
+
+
+@dataclass(frozen=True)
+class GenerationOptions:
+    """
+    Generation options for an Ollama call.
+
+    All fields except keep_alive are sent in the request's "options" block,
+    which is the only place Ollama reads them from. Fields left as None fall
+    back to the model's defaults.
+    """
+    num_predict: Optional[int] = None     # Maximum number of tokens to generate
+    num_ctx: Optional[int] = None         # Context window size
+    temperature: Optional[float] = None   # Sampling temperature
+    stop: Optional[List[str]] = None      # Stop sequences ending generation early
+    seed: Optional[int] = None            # Seed for reproducible output
+    keep_alive: Optional[Union[str, int]] = None  # How long the model stays loaded
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "GenerationOptions":
+        """
+        Build options from a config preset, ignoring unknown keys.
+        """
+        known = {field.name for field in fields(cls)}
+        return cls(**{key: value for key, value in values.items() if key in known})
+
+    def to_ollama_options(self) -> Dict[str, Any]:
+        """
+        Return the values for Ollama's "options" block.
+        """
+        return {
+            field.name: getattr(self, field.name)
+            for field in fields(self)
+            if field.name != "keep_alive" and getattr(self, field.name) is not None
+        }
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """
+    Model chosen for a call and the model to escalate to when its output
+    fails parsing or validation (None if there is no larger model to try).
+    """
+    model: str
+    escalation_model: Optional[str] = None
+
+
+@dataclass
+class LLMResult:
+    """
+    Generated text of an Ollama call together with the statistics of its final
+    stream message. Durations are in nanoseconds, as reported by Ollama.
+
+    When the stream was closed early (done is False), Ollama never sent its
+    statistics: eval_count and eval_duration are then estimated from the
+    streamed chunks (one token each) and the prompt statistics stay None.
+    """
+    text: str
+    model: str
+    done: bool = False
+    prompt_eval_count: Optional[int] = None
+    prompt_eval_duration: Optional[int] = None
+    eval_count: Optional[int] = None
+    eval_duration: Optional[int] = None
+    load_duration: Optional[int] = None
+    total_duration: Optional[int] = None
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Generation speed, or None if it is unknown."""
+        if not self.eval_count or not self.eval_duration:
+            return None
+        return self.eval_count / self.eval_duration * 1e9
+
+
+# Statistics fields of Ollama's final stream message
+_STAT_FIELDS = (
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+    "load_duration",
+    "total_duration",
+)
+
+
+def get_generation_options(task: str) -> GenerationOptions:
+    """
+    Get the generation preset for a task ("knowledge", "qa", "content_group")
+    from config.yaml, merged over the "default" preset.
+    """
+    presets = get_settings().generation_presets
+    values = {**presets.get("default", {}), **presets.get(task, {})}
+    return GenerationOptions.from_dict(values)
+
+
+def route_model(task: str, input_tokens: int) -> ModelRoute:
+    """
+    Pick the model for a call from the task's routing rule in config.yaml,
+    merged over the "default" rule. Content of at most small_max_tokens
+    estimated tokens goes to the small model, escalating to the large one.
+    Without routing every call uses llm.model.
+    """
+    settings = get_settings()
+    if not settings.routing_enabled:
+        return ModelRoute(settings.llm_model)
+    rules = settings.routing_rules
+    values = {**rules.get("default", {}), **rules.get(task, {})}
+    large_model = values.get("large_model") or settings.llm_model
+    small_model = values.get("small_model")
+    if (small_model and small_model != large_model and
+            input_tokens <= values.get("small_max_tokens", 0)):
+        return ModelRoute(small_model, escalation_model=large_model)
+    return ModelRoute(large_model)
+
+
+def get_routed_models() -> List[str]:
+    """
+    Return every model the routing rules can send calls to.
+    """
+    settings = get_settings()
+    if not settings.routing_enabled:
+        return []
+    models = []
+    for values in settings.routing_rules.values():
+        for model in (values.get("small_model"), values.get("large_model") or settings.llm_model):
+            if model and model not in models:
+                models.append(model)
+    return models
+
 
 def call_llm(prompt: str,
-            model: str = "llama3.2",
-            temperature: float = 0.1,
-            max_tokens: int = 100) -> str:
+            model: Optional[str] = None,
+            options: Optional[GenerationOptions] = None,
+            is_complete: Optional[Callable[[str], bool]] = None,
+            output_format: Optional[Dict[str, Any]] = None,
+            system: Optional[str] = None) -> LLMResult:
     """
     Call Ollama API to generate text.
-    
+
     Args:
         prompt: The prompt to send to the LLM
-        model: The model to use (default: llama3.2)
-        temperature: Controls randomness (default: 0.1 for more deterministic responses)
-        max_tokens: Maximum number of tokens in the response
-        
+        model: The model to use (default: llm.model from config.yaml)
+        options: Generation options such as the output token budget
+            (default: the "default" preset from config.yaml)
+        is_complete: Optional completion rule evaluated on the text received so
+            far (see parser_services). Once it returns True the stream is
+            closed, which stops generation on the Ollama side.
+        output_format: Optional JSON schema constraining the output
+            (sent as Ollama's "format" field)
+        system: Optional static system prompt. Keeping it identical across
+            calls lets Ollama reuse the evaluated prefix, so only the
+            per-call prompt is evaluated.
+
+    With llm.hedging enabled, a call slower than the usual duration of its
+    model and system prompt is hedged with a duplicate request (see
+    _hedged_generate). With llm.circuit_breaker enabled, calls fail fast with
+    LLMUnavailableError (503) while the backend is considered down.
+
     Returns:
-        Generated text from LLM
+        LLMResult with the generated text and the call's token and timing statistics
     """
-    url = "http://localhost:11434/api/generate"
+    settings = get_settings()
+    url = f"{settings.llm_base_url}/api/generate"
+    options = options or get_generation_options("default")
+    model = model or settings.llm_model
 
     payload = {
         "model": model,
         "prompt": prompt,
-        "temperature": temperature,
-        "max_tokens": max_tokens
+        "options": options.to_ollama_options()
     }
+    if options.keep_alive is not None:
+        payload["keep_alive"] = options.keep_alive
+    if output_format is not None:
+        payload["format"] = output_format
+    if system:
+        payload["system"] = system
+
+    latency_key = (model, system or "")
+    breaker = settings.breaker_enabled
+    if breaker and not LLM_CIRCUIT_BREAKER.allow():
+        raise LLMUnavailableError(LLM_CIRCUIT_BREAKER.retry_after())
 
+    hedge_delay = None
+    if settings.hedging_enabled:
+        hedge_delay = LLM_LATENCY.quantile(
+            latency_key, settings.hedging_quantile, settings.hedging_min_samples
+        )
+    started_at = time.monotonic()
     try:
-        # Use requests with stream=True to handle streaming response
-        response = requests.post(url, json=payload, stream=True, timeout=60)
+        if hedge_delay is None:
+            result = _stream_generate(url, payload, settings.llm_timeout, is_complete)
+        else:
+            result = _hedged_generate(
+                url, payload, settings.llm_timeout, is_complete,
+                max(hedge_delay, settings.hedging_min_delay)
+            )
+    except requests.RequestException as e:
+        if breaker:
+            # A backend that answers with a client error is not down, but the
+            # call did not succeed either
+            if _is_backend_failure(e):
+                LLM_CIRCUIT_BREAKER.record_failure()
+            else:
+                LLM_CIRCUIT_BREAKER.release_trial()
+        if isinstance(e, requests.HTTPError):
+            raise HTTPException(status_code=500, detail="Failed to call LLM API") from e
+        raise HTTPException(status_code=500, detail=f"LLM API error: {str(e)}") from e
+    except Exception:
+        if breaker:
+            LLM_CIRCUIT_BREAKER.release_trial()
+        raise
+
+    if breaker:
+        LLM_CIRCUIT_BREAKER.record_success()
+    LLM_LATENCY.record(latency_key, time.monotonic() - started_at)
+    return result
+
+
+def _is_backend_failure(error: requests.RequestException) -> bool:
+    """
+    Check whether an error means the LLM backend is unhealthy: connection errors,
+    timeouts and 5xx responses count, 4xx responses do not.
+    """
+    response = getattr(error, "response", None)
+    return response is None or response.status_code >= 500
+
+
+def _stream_generate(url: str,
+                     payload: Dict[str, Any],
+                     timeout: float,
+                     is_complete: Optional[Callable[[str], bool]],
+                     cancel: Optional[Event] = None,
+                     session: Optional[requests.Session] = None) -> LLMResult:
+    """
+    Send one streaming generate request and collect the response.
+    The stream is closed early once is_complete holds or cancel is set.
+    The request is sent through session if given.
 
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail="Failed to call LLM API")
+    Raises:
+        requests.RequestException: On connection errors, timeouts and non-200 responses
+    """
+    started_at = time.perf_counter_ns()
+    # Use requests with stream=True to handle streaming response;
+    # leaving the block closes the connection, also on early termination
+    post = session.post if session is not None else requests.post
+    with post(url, json=payload, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
 
         # Process streaming response
         full_response = ""
+        final = None
+        chunk_count = 0
+        first_chunk_at = last_chunk_at = None
         for line in response.iter_lines():
+            if cancel is not None and cancel.is_set():
+                break
             if line:
                 data = json.loads(line)
                 full_response += data.get("response", "")
                 if data.get("done", False):
+                    final = data
+                    break
+                chunk_count += 1
+                last_chunk_at = time.perf_counter_ns()
+                first_chunk_at = first_chunk_at or last_chunk_at
+                if is_complete is not None and is_complete(full_response):
                     break
 
-        return full_response.strip()
+    result = LLMResult(text=full_response.strip(), model=payload["model"], done=final is not None)
+    if final is not None:
+        for name in _STAT_FIELDS:
+            setattr(result, name, final.get(name))
+    elif chunk_count:
+        result.eval_count = chunk_count
+        result.eval_duration = last_chunk_at - first_chunk_at
+        result.total_duration = time.perf_counter_ns() - started_at
+    return result
 
-    except requests.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"LLM API error: {str(e)}") from e
+
+# Worker threads running hedged attempts; created on first use
+_HEDGE_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_HEDGE_EXECUTOR_LOCK = Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _HEDGE_EXECUTOR  # pylint: disable=global-statement
+    with _HEDGE_EXECUTOR_LOCK:
+        if _HEDGE_EXECUTOR is None:
+            _HEDGE_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+        return _HEDGE_EXECUTOR
+
+
+class _AbortableAdapter(HTTPAdapter):
+    """
+    HTTP adapter whose requests can be aborted from another thread, also while
+    they still wait for the response headers (e.g. queued by Ollama), by
+    shutting down the sockets of the connections it opened.
+    """
+    def __init__(self):
+        self._connections: List[Any] = []
+        self._aborted = False
+        self._abort_lock = Lock()
+        super().__init__()
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        pool = super().get_connection_with_tls_context(request, verify, proxies=proxies, cert=cert)
+        if getattr(pool, "_abortable", False):
+            return pool
+        new_conn = pool._new_conn
+
+        def tracked_new_conn():
+            connection = new_conn()
+            connect = connection.connect
+
+            def tracked_connect():
+                connect()
+                # An abort that ran before the socket existed could not shut it down
+                with self._abort_lock:
+                    aborted = self._aborted
+                if aborted:
+                    _shutdown(connection)
+
+            connection.connect = tracked_connect
+            with self._abort_lock:
+                self._connections.append(connection)
+            return connection
+
+        pool._new_conn = tracked_new_conn
+        pool._abortable = True
+        return pool
+
+    def abort(self) -> None:
+        """Abort all requests of this adapter, current and future."""
+        with self._abort_lock:
+            self._aborted = True
+            connections = list(self._connections)
+        for connection in connections:
+            _shutdown(connection)
+
+
+def _shutdown(connection: Any) -> None:
+    """Shut down a connection's socket, waking up a thread blocked reading from it."""
+    sock = getattr(connection, "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    connection.close()
+
+
+def _abortable_attempt(adapter: _AbortableAdapter,
+                       url: str,
+                       payload: Dict[str, Any],
+                       timeout: float,
+                       is_complete: Optional[Callable[[str], bool]],
+                       cancel: Event) -> LLMResult:
+    """One hedged attempt, sent through its own session so it can be aborted."""
+    with requests.Session() as session:
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return _stream_generate(url, payload, timeout, is_complete, cancel, session)
+
+
+def _hedged_generate(url: str,
+                     payload: Dict[str, Any],
+                     timeout: float,
+                     is_complete: Optional[Callable[[str], bool]],
+                     delay: float) -> LLMResult:
+    """
+    Send a generate request and, if it has not finished after delay seconds,
+    a duplicate of it. The first successful response wins; the other attempt
+    is aborted by closing its connection, whether it is streaming or still
+    waiting for Ollama to start, so it frees its thread and Ollama slot at once.
+    """
+    cancel = Event()
+    executor = _get_hedge_executor()
+    adapters = [_AbortableAdapter()]
+    attempts = [executor.submit(
+        _abortable_attempt, adapters[0], url, payload, timeout, is_complete, cancel
+    )]
+    done, _ = wait(attempts, timeout=delay)
+    if not done:
+        adapters.append(_AbortableAdapter())
+        attempts.append(executor.submit(
+            _abortable_attempt, adapters[1], url, payload, timeout, is_complete, cancel
+        ))
+    try:
+        error = None
+        for future in as_completed(attempts):
+            try:
+                return future.result()
+            except requests.RequestException as e:
+                error = e
+        raise error
+    finally:
+        cancel.set()
+        for adapter in adapters:
+            adapter.abort()
@@ -0,0 +1,137 @@
+"""
+llm_stats_services.py
+This module records the token and timing statistics of every LLM call and
+rolls them up into per-task and per-model throughput reports.
+
+Records are buffered in memory and inserted in batches with one executemany,
+using the write-back batch size and flush interval, so recording adds no
+database round trip to each generation. Pending records are flushed before a
+report is built and when the application shuts down.
+"""
+import logging
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional
+from sqlalchemy import func, insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from backend.config import get_settings
+from backend.database import SessionLocal
+from backend.models import LLMCallStat
+from backend.services.llm_services import LLMResult
+
+logger = logging.getLogger(__name__)
+
+
+class LLMStatsRecorder:
+    """
+    Thread-safe buffer of LLM call statistics, flushed to llm_call_stats in batches.
+    """
+    def __init__(self):
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self,
+               task: str,
+               result: LLMResult,
+               prompt_version: Optional[str] = None,
+               row_id: Optional[int] = None) -> None:
+        """
+        Buffer the statistics of one call, flushing if the batch is due.
+        """
+        settings = get_settings()
+        with self._lock:
+            self._buffer.append({
+                "task": task,
+                "model": result.model,
+                "prompt_version": prompt_version,
+                "row_id": row_id,
+                "done": result.done,
+                "prompt_eval_count": result.prompt_eval_count,
+                "prompt_eval_duration": result.prompt_eval_duration,
+                "eval_count": result.eval_count,
+                "eval_duration": result.eval_duration,
+                "load_duration": result.load_duration,
+                "total_duration": result.total_duration,
+            })
+            due = (len(self._buffer) >= settings.writeback_batch_size or
+                   time.monotonic() - self._last_flush >= settings.writeback_flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Insert all buffered records with one executemany.
+        Statistics are best effort: a failed insert drops the batch instead of
+        failing the generation that triggered the flush.
+        """
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        if not batch:
+            return
+        with SessionLocal() as db:
+            try:
+                db.execute(insert(LLMCallStat), batch)
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                logger.warning("Failed to record %d LLM call statistics: %s", len(batch), e)
+
+
+LLM_STATS = LLMStatsRecorder()
+
+
+def get_llm_stats_rollup(db: Session) -> List[Dict[str, Any]]:
+    """
+    Aggregate the recorded statistics per task, model and prompt version.
+
+    Returns:
+        One entry per group with call and token counts, total durations in
+        seconds and the prompt evaluation and generation speeds in tokens/s
+    """
+    LLM_STATS.flush()
+    rows = (
+        db.query(
+            LLMCallStat.task,
+            LLMCallStat.model,
+            LLMCallStat.prompt_version,
+            func.count(LLMCallStat.id).label("calls"),
+            func.sum(LLMCallStat.done).label("completed_calls"),
+            func.sum(LLMCallStat.prompt_eval_count).label("prompt_tokens"),
+            func.sum(LLMCallStat.prompt_eval_duration).label("prompt_eval_duration"),
+            func.sum(LLMCallStat.eval_count).label("eval_tokens"),
+            func.sum(LLMCallStat.eval_duration).label("eval_duration"),
+            func.sum(LLMCallStat.load_duration).label("load_duration"),
+            func.sum(LLMCallStat.total_duration).label("total_duration"),
+        )
+        .group_by(LLMCallStat.task, LLMCallStat.model, LLMCallStat.prompt_version)
+        .order_by(LLMCallStat.task, LLMCallStat.model)
+        .all()
+    )
+
+    def per_second(count: Optional[int], duration: Optional[int]) -> Optional[float]:
+        return round(count / duration * 1e9, 2) if count and duration else None
+
+    def seconds(duration: Optional[int]) -> float:
+        return round((duration or 0) / 1e9, 3)
+
+    return [
+        {
+            "task": row.task,
+            "model": row.model,
+            "prompt_version": row.prompt_version,
+            "calls": row.calls,
+            "completed_calls": row.completed_calls or 0,
+            "prompt_tokens": row.prompt_tokens or 0,
+            "eval_tokens": row.eval_tokens or 0,
+            "prompt_tokens_per_second": per_second(row.prompt_tokens, row.prompt_eval_duration),
+            "eval_tokens_per_second": per_second(row.eval_tokens, row.eval_duration),
+            "load_seconds": seconds(row.load_duration),
+            "total_seconds": seconds(row.total_duration),
+            "avg_call_seconds": round(seconds(row.total_duration) / row.calls, 3),
+        }
+        for row in rows
+    ]
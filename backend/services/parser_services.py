@@ -0,0 +1,232 @@
+"""
+parser_services.py
+This module parses LLM responses for each generation task and decides when a
+streamed response is complete.
+
+The completion rules are evaluated by call_llm on the accumulated text after
+every streamed chunk. As soon as a rule reports that all fields the parser needs
+are present, the stream is closed, so Ollama stops generating text that would be
+discarded anyway.
+
+Structured (JSON schema) responses need no completion rule, since the schema
+ends generation at the closing brace. They are decoded by
+decode_structured_response, the single decoder shared by all tasks.
+"""
+import json
+import re
+from typing import Tuple, Type, TypeVar
+from pydantic import BaseModel, ValidationError
+
+OutputModel = TypeVar("OutputModel", bound=BaseModel)
+
+
+class StructuredOutputError(ValueError):
+    """
+    Raised when a structured LLM response is not valid JSON or violates its schema.
+    """
+    def __init__(self, message: str, response: str):
+        super().__init__(message)
+        self.response = response
+
+# Prefixes the model tends to put in front of a knowledge point
+KNOWLEDGE_PREFIXES = [
+    "the key knowledge point is ",
+    "the key knowledge is ",
+    "key knowledge: ",
+    "knowledge point: ",
+    "the main concept is ",
+    "the core concept is "
+]
+
+# A blank line after some text ends a paragraph
+_PARAGRAPH_END = re.compile(r"\S\s*\n\s*\n")
+_BLANK_LINE = re.compile(r"\n[ \t]*\n")
+
+# Markers of the answer options following a single-choice question
+_OPTION_MARKERS = ("A)", "a)")
+
+
+# ----------------------
+# Knowledge points
+# ----------------------
+
+def _knowledge_paragraph_end(text: str) -> int:
+    """
+    Return the index where the first paragraph of a knowledge point ends, or -1.
+
+    Leading blank lines do not end a paragraph, and neither does a blank line
+    after a line ending in ":", which introduces the knowledge point
+    ("Here is the key knowledge point:").
+    """
+    for match in _BLANK_LINE.finditer(text):
+        before = text[:match.start()].rstrip()
+        if before and not before.endswith(":"):
+            return match.start()
+    return -1
+
+
+def clean_knowledge_point(response: str) -> str:
+    """
+    Strip filler prefixes from a knowledge point and capitalize its first letter.
+    Only the first paragraph is kept, ending where knowledge_complete stops the stream.
+    """
+    knowledge_point = response.strip()
+    end = _knowledge_paragraph_end(knowledge_point)
+    if end != -1:
+        knowledge_point = knowledge_point[:end].strip()
+
+    # Remove possible prefixes (case insensitive)
+    for prefix in KNOWLEDGE_PREFIXES:
+        if knowledge_point.lower().startswith(prefix):
+            knowledge_point = knowledge_point[len(prefix):].strip()
+            break
+
+    # Make sure the first letter is capitalized
+    if knowledge_point:
+        knowledge_point = knowledge_point[0].upper() + knowledge_point[1:]
+
+    return knowledge_point
+
+
+def knowledge_complete(text: str) -> bool:
+    """
+    A knowledge point is complete once its first paragraph has ended.
+    """
+    return _knowledge_paragraph_end(text) != -1
+
+
+# ----------------------
+# Question and answer pairs
+# ----------------------
+
+def parse_qa_response(response: str) -> Tuple[str, str]:
+    """
+    Extract the question and answer from a "Question: ... Answer: ..." response.
+
+    Returns:
+        Tuple of (question, answer); either is empty if it could not be found
+    """
+    if "Question:" in response and "Answer:" in response:
+        question_part = response.split("Question:")[1].split("Answer:")[0].strip()
+        answer_part = response.split("Answer:")[1].split("Question:")[0]
+        # Keep only the first answer paragraph
+        answer_part = answer_part.strip().split("\n\n")[0].strip()
+    else:
+        # If the format is not as expected, use a fallback method
+        parts = response.split("\n")
+        question_part = next((p.replace("Question:", "").strip()
+                              for p in parts if p.startswith("Question:")), "")
+        answer_part = next((p.replace("Answer:", "").strip()
+                            for p in parts if p.startswith("Answer:")), "")
+    return question_part, answer_part
+
+
+def qa_complete(text: str) -> bool:
+    """
+    A Q&A pair is complete once the first answer paragraph has ended
+    or the model starts another question.
+    """
+    if "Question:" not in text or "Answer:" not in text:
+        return False
+    answer = text.split("Answer:", 1)[1]
+    return _PARAGRAPH_END.search(answer) is not None or (
+        "Question:" in answer and bool(answer.split("Question:", 1)[0].strip())
+    )
+
+
+# ----------------------
+# Content group single-choice questions
+# ----------------------
+
+def parse_content_group_question(response: str) -> str:
+    """
+    Extract the question text from a single-choice question response,
+    dropping the answer options.
+    """
+    if "Question:" in response:
+        question_text = response.split("Question:")[1].strip()
+    else:
+        question_text = response.strip()
+
+    # if the response contains "A)" or "a)", split the question text
+    if "A)" in question_text or "a)" in question_text:
+        question_text = question_text.split("A)")[0].split("a)")[0].strip()
+    return question_text
+
+
+def content_group_question_complete(text: str) -> bool:
+    """
+    A single-choice question is complete once the first answer option starts.
+    """
+    question = text.split("Question:", 1)[1] if "Question:" in text else text
+    for marker in _OPTION_MARKERS:
+        if marker in question and question.split(marker, 1)[0].strip():
+            return True
+    return False
+
+
+# ----------------------
+# Structured (JSON) responses
+# ----------------------
+
+def _json_object_end(text: str) -> int:
+    """
+    Return the index just past the first complete top-level JSON object in text,
+    or -1 if no object has been closed yet. Braces inside strings are ignored.
+    """
+    depth = 0
+    in_string = False
+    escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = depth > 0
+        elif char == "{":
+            depth += 1
+        elif char == "}" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    return -1
+
+
+def decode_structured_response(response: str, output_model: Type[OutputModel]) -> OutputModel:
+    """
+    Decode a structured LLM response into the task's output model.
+
+    Text before the opening brace or after the closing brace is ignored, and
+    string fields are stripped before validation.
+
+    Args:
+        response: Raw LLM response text
+        output_model: Pydantic model describing the expected fields
+
+    Returns:
+        Validated output model instance
+
+    Raises:
+        StructuredOutputError: If the response is not a JSON object or violates the schema
+    """
+    start = response.find("{")
+    end = _json_object_end(response[start:]) if start != -1 else -1
+    if end == -1:
+        raise StructuredOutputError("LLM response contains no JSON object", response)
+
+    try:
+        data = json.loads(response[start:start + end])
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"LLM response is not valid JSON: {e}", response) from e
+    if not isinstance(data, dict):
+        raise StructuredOutputError("LLM response is not a JSON object", response)
+
+    data = {key: value.strip() if isinstance(value, str) else value for key, value in data.items()}
+    try:
+        return output_model.model_validate(data)
+    except ValidationError as e:
+        raise StructuredOutputError(f"LLM response violates schema: {e}", response) from e
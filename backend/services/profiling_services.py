@@ -0,0 +1,287 @@
+"""
+profiling_services.py
+This module profiles individual requests on demand.
+
+A request is profiled when it carries the X-Profile header (if
+profiling.header_enabled is set) or while profiling has been switched on through
+the admin endpoints. For such a request a background thread samples the stacks
+of the threads running its endpoint every sample_interval seconds, and
+tracemalloc records the allocations made while it runs. The result is kept in
+memory as a speedscope profile (https://www.speedscope.app) plus the top
+allocation differences, and its id is returned in the X-Profile-Id header.
+
+Other requests only pay for a header lookup. Samples are attributed by
+endpoint function, so concurrent requests to the same endpoint and their
+allocations are included in the profile.
+"""
+import asyncio
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.config import get_settings
+
+# Request header that asks for a profile, and response header carrying its id
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+# Requests to these paths are never profiled
+_EXCLUDED_PREFIXES = ("/admin",)
+
+# A sampled frame: (function name, file, line)
+Frame = Tuple[str, str, int]
+
+# Running profiles using tracemalloc; tracing started here stops when the last one ends
+_tracing = {"users": 0, "started": False}
+_tracing_lock = threading.Lock()
+
+
+class ProfileStore:
+    """
+    Thread-safe store of the most recent request profiles and the admin toggle.
+    """
+    def __init__(self):
+        self._profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.enabled = False          # Profile every request, set by the admin toggle
+        self.path_prefix = ""         # Restrict the toggle to paths starting with this
+
+    def add(self, profile: Dict[str, Any]) -> None:
+        """Store a profile, evicting the oldest beyond profiling.max_profiles."""
+        with self._lock:
+            self._profiles[profile["id"]] = profile
+            while len(self._profiles) > get_settings().profiling_max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """Return a stored profile."""
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        """Return the stored profiles without their samples, newest first."""
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [
+            {key: value for key, value in profile.items()
+             if key not in ("speedscope", "allocations")}
+            for profile in reversed(profiles)
+        ]
+
+    def clear(self) -> None:
+        """Remove all stored profiles."""
+        with self._lock:
+            self._profiles.clear()
+
+
+PROFILES = ProfileStore()
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the stacks of the threads currently running an endpoint function.
+    """
+    def __init__(self, scope: Dict[str, Any], interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self._scope = scope
+        self._interval = interval
+        self._stop_event = threading.Event()
+        self.samples: List[Tuple[Frame, ...]] = []
+        self.weights: List[float] = []
+
+    def run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop_event.wait(self._interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            # The endpoint is only known once the router has matched the request
+            endpoint = self._scope.get("endpoint")
+            code = getattr(endpoint, "__code__", None)
+            if code is None:
+                continue
+            for thread_id, frame in sys._current_frames().items():  # pylint: disable=protected-access
+                if thread_id == self.ident:
+                    continue
+                stack = []
+                running_endpoint = False
+                while frame is not None:
+                    running_endpoint = running_endpoint or frame.f_code is code
+                    stack.append((frame.f_code.co_name, frame.f_code.co_filename, frame.f_lineno))
+                    frame = frame.f_back
+                if running_endpoint:
+                    stack.reverse()
+                    self.samples.append(tuple(stack))
+                    self.weights.append(elapsed)
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the thread to end."""
+        self._stop_event.set()
+        self.join()
+
+
+def build_speedscope(name: str,
+                     samples: List[Tuple[Frame, ...]],
+                     weights: List[float],
+                     duration: float) -> Dict[str, Any]:
+    """
+    Convert stack samples (root frame first) into a speedscope "sampled" profile.
+    """
+    frame_index: Dict[Frame, int] = {}
+    frames = []
+    indexed_samples = []
+    for stack in samples:
+        indexes = []
+        for frame in stack:
+            if frame not in frame_index:
+                frame_index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            indexes.append(frame_index[frame])
+        indexed_samples.append(indexes)
+
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": duration,
+            "samples": indexed_samples,
+            "weights": weights
+        }],
+        "name": name,
+        "exporter": "knowpilot"
+    }
+
+
+def _allocation_diff(before: tracemalloc.Snapshot,
+                     after: tracemalloc.Snapshot,
+                     limit: int) -> List[Dict[str, Any]]:
+    """
+    The source lines whose allocated memory grew most between two snapshots,
+    leaving out the profiler's own allocations.
+    """
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__)
+    ]
+    stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    return [
+        {
+            "file": stat.traceback[0].filename,
+            "line": stat.traceback[0].lineno,
+            "size_diff": stat.size_diff,
+            "size": stat.size,
+            "count_diff": stat.count_diff
+        }
+        for stat in stats[:limit]
+    ]
+
+
+class RequestProfile:
+    """
+    CPU sampling and allocation tracing for the duration of one request.
+    """
+    def __init__(self, scope: Dict[str, Any]):
+        settings = get_settings()
+        self.scope = scope
+        self.id = uuid.uuid4().hex
+        self._settings = settings
+        self._sampler = StackSampler(scope, settings.profiling_sample_interval)
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._started_at = 0.0
+
+    def start(self) -> None:
+        """Start tracing allocations and sampling stacks."""
+        with _tracing_lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self._settings.profiling_traceback_frames)
+                _tracing["started"] = True
+            _tracing["users"] += 1
+            self._snapshot = tracemalloc.take_snapshot()
+        self._started_at = time.perf_counter()
+        self._sampler.start()
+
+    def finish(self, status_code: Optional[int]) -> None:
+        """Stop profiling and store the result."""
+        duration = time.perf_counter() - self._started_at
+        self._sampler.stop()
+        with _tracing_lock:
+            snapshot = tracemalloc.take_snapshot()
+            _tracing["users"] -= 1
+            if _tracing["users"] == 0 and _tracing["started"]:
+                tracemalloc.stop()
+                _tracing["started"] = False
+
+        name = f"{self.scope.get('method', '')} {self.scope.get('path', '')}"
+        PROFILES.add({
+            "id": self.id,
+            "method": self.scope.get("method"),
+            "path": self.scope.get("path"),
+            "status_code": status_code,
+            "started_at": datetime.now().isoformat(),
+            "duration": duration,
+            "sample_count": len(self._sampler.samples),
+            "speedscope": build_speedscope(
+                name, self._sampler.samples, self._sampler.weights, duration
+            ),
+            "allocations": _allocation_diff(
+                self._snapshot, snapshot, self._settings.profiling_top_allocations
+            )
+        })
+
+
+def _wants_profile(scope: Dict[str, Any]) -> bool:
+    """
+    Check whether a request should be profiled.
+    """
+    path = scope.get("path", "")
+    if path.startswith(_EXCLUDED_PREFIXES):
+        return False
+    if PROFILES.enabled and path.startswith(PROFILES.path_prefix):
+        return True
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_HEADER:
+            return value not in (b"", b"0", b"false") and get_settings().profiling_header_enabled
+    return False
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling the requests selected by header or admin toggle.
+    Requests that are not profiled are passed through untouched.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope)
+        status_code = None
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = [
+                    *message["headers"], (PROFILE_ID_HEADER, profile.id.encode())
+                ]
+            await send(message)
+
+        # Taking and comparing allocation snapshots can take a while;
+        # keep both off the event loop
+        await asyncio.to_thread(profile.start)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            await asyncio.to_thread(profile.finish, status_code)
@@ -0,0 +1,159 @@
+"""
+resilience_services.py
+This module protects the LLM calls against slow and failing backends.
+
+LatencyTracker keeps the recent call durations per model and system prompt,
+i.e. per task; their p95 (by default) is the delay after which call_llm sends a
+hedged duplicate request.
+
+CircuitBreaker counts consecutive backend failures. Once the threshold is
+reached the circuit opens and calls fail fast for reset_timeout seconds; then
+a single trial call is let through, which closes the circuit again on success.
+A call that ends in any other error neither closes nor reopens the circuit; it
+only frees the trial slot for the next call.
+Bulk jobs wait for an open circuit instead of failing every remaining row.
+"""
+import time
+from collections import deque
+from threading import Lock
+from typing import Deque, Dict, Hashable, Optional
+from fastapi import HTTPException
+
+from backend.config import get_settings
+
+
+class LLMUnavailableError(HTTPException):
+    """
+    Raised without calling the LLM while the circuit breaker is open.
+    """
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail=f"LLM backend unavailable, retry in {retry_after:.0f} s",
+            headers={"Retry-After": str(max(int(retry_after), 1))}
+        )
+
+
+class LatencyTracker:
+    """
+    Thread-safe window of recent successful call durations per key.
+    """
+    def __init__(self, window: int = 200):
+        self._durations: Dict[Hashable, Deque[float]] = {}
+        self._window = window
+        self._lock = Lock()
+
+    def record(self, key: Hashable, seconds: float) -> None:
+        """Add the duration of a successful call."""
+        with self._lock:
+            self._durations.setdefault(key, deque(maxlen=self._window)).append(seconds)
+
+    def quantile(self, key: Hashable, q: float, min_samples: int) -> Optional[float]:
+        """
+        Return the q-quantile of the recent durations for a key,
+        or None while fewer than min_samples calls were recorded.
+        """
+        with self._lock:
+            durations = sorted(self._durations.get(key, ()))
+        if not durations or len(durations) < min_samples:
+            return None
+        index = min(int(q * len(durations)), len(durations) - 1)
+        return durations[index]
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker for the LLM backend.
+    Thresholds are read from the settings on every use.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    def _remaining(self) -> float:
+        """Seconds until an open circuit admits a trial call; 0 if closed."""
+        if self._opened_at is None:
+            return 0.0
+        elapsed = time.monotonic() - self._opened_at
+        return max(get_settings().breaker_reset_timeout - elapsed, 0.0)
+
+    def allow(self) -> bool:
+        """
+        Check whether a call may go to the backend.
+        After the reset timeout only one trial call is admitted at a time.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._remaining() > 0 or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        """Close the circuit."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Free the trial slot after a call that neither succeeded nor failed the backend."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Count a failure; open the circuit at the threshold or if a trial failed."""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if (self._opened_at is not None or
+                    self._failures >= get_settings().breaker_failure_threshold):
+                self._opened_at = time.monotonic()
+
+    def retry_after(self) -> float:
+        """Seconds until the next call may be admitted."""
+        with self._lock:
+            return self._remaining()
+
+    def is_open(self) -> bool:
+        """Check whether calls are currently rejected."""
+        with self._lock:
+            return self._opened_at is not None and (
+                self._remaining() > 0 or self._trial_in_flight
+            )
+
+    def wait_until_available(self, max_wait: float) -> bool:
+        """
+        Block while the circuit is open, for at most max_wait seconds.
+
+        Returns:
+            True if calls may be attempted again, False if the circuit is still open
+        """
+        deadline = time.monotonic() + max_wait
+        while self.is_open():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(max(self.retry_after(), 0.1), remaining))
+        return True
+
+
+LLM_LATENCY = LatencyTracker()
+LLM_CIRCUIT_BREAKER = CircuitBreaker()
+
+
+def wait_for_llm() -> bool:
+    """
+    Pause a bulk job while the LLM circuit breaker is open, for at most
+    llm.circuit_breaker.max_pause seconds.
+
+    Returns:
+        True if the job may continue, False if the backend did not recover
+    """
+    settings = get_settings()
+    if not settings.breaker_enabled:
+        return True
+    return LLM_CIRCUIT_BREAKER.wait_until_available(settings.breaker_max_pause)
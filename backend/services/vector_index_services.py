@@ -0,0 +1,408 @@
+"""
+vector_index_services.py
+This module keeps a persistent, memory-mapped index of the question embeddings
+for semantic search.
+
+The index of an embedding model lives in its own directory under
+embedding.index_path:
+    vectors.<n>.f32   contiguous float32 rows, one normalized vector per slot
+    ids.<n>.npy       Question.id of every slot (-1 for removed questions)
+    hashes.<n>.npy    content hash of every slot
+    meta.json         model, dimensions, row count, a version counter and
+                      the names of the data files of that version
+
+Opening the index only maps vectors.f32, so it takes milliseconds regardless of
+its size, and all uvicorn workers share the same page cache. Searches compare
+the version in meta.json and reopen the index after another process synced it.
+
+Syncing is incremental: contents are compared by hash, changed rows are
+overwritten in place, new rows are appended and removed rows become
+tombstones. Only new or edited contents are embedded (see embedding_services).
+A rebuild writes new files without tombstones. Files are never replaced under
+their published names: a sync writes the ids, hashes and (on a rebuild) vectors
+of version n under new names and publishes them by replacing meta.json, so a
+reader always maps files that belong together.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from backend.config import get_settings
+from backend.database import SessionLocal
+from backend.models import Question
+from backend.services.embedding_services import content_hash, get_question_embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: syncs are only serialized within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Index rows scored per matrix product while searching
+_SEARCH_BLOCK_ROWS = 65536
+
+# Bytes of the content hash kept per slot
+_HASH_DTYPE = "S32"
+
+# Extension of each data file of the index
+_EXTENSIONS = {"vectors": "f32", "ids": "npy", "hashes": "npy"}
+
+# Data files of indexes written before file names were versioned
+_UNVERSIONED_FILES = {kind: f"{kind}.{extension}" for kind, extension in _EXTENSIONS.items()}
+
+_DATA_FILE = re.compile(r"^(vectors|ids|hashes)(\.\d+)?\.(f32|npy)$")
+
+# Attempts to open the index when a sync removes the files between reading
+# meta.json and opening them
+_OPEN_ATTEMPTS = 3
+
+
+def _index_directory(model: str) -> str:
+    """Directory holding the index of an embedding model."""
+    safe_model = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+    return os.path.join(os.path.abspath(get_settings().embedding_index_path), safe_model)
+
+
+def _versioned_files(version: int) -> Dict[str, str]:
+    """Names of the data files of an index version."""
+    return {kind: f"{kind}.{version}.{extension}" for kind, extension in _EXTENSIONS.items()}
+
+
+def _write_atomic(path: str, write) -> None:
+    """Write a file through a temporary file, replacing it in one step."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as file:
+        write(file)
+    os.replace(temp_path, path)
+
+
+class IndexSnapshot(NamedTuple):
+    """
+    Mapped vectors with the ids and content hashes of their slots, swapped as a whole.
+    """
+    vectors: Optional[np.ndarray]
+    ids: np.ndarray
+    hashes: np.ndarray
+    version: int
+    files: Dict[str, str]
+
+
+_EMPTY_SNAPSHOT = IndexSnapshot(
+    None, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=_HASH_DTYPE), -1, _UNVERSIONED_FILES
+)
+
+
+class EmbeddingIndex:
+    """
+    Memory-mapped embedding index of the questions table for the configured model.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()          # Guards (re)opening
+        self._sync_mutex = threading.Lock()    # Serializes syncs within the process
+        self._model: Optional[str] = None
+        self.snapshot = _EMPTY_SNAPSHOT
+
+    def _path(self, name: str) -> str:
+        return os.path.join(_index_directory(self._model), name)
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path("meta.json"), encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def open(self) -> None:
+        """
+        Map the index of the configured embedding model; a missing index is empty.
+        """
+        with self._lock:
+            self._model = get_settings().embedding_model
+            for attempt in range(_OPEN_ATTEMPTS):
+                meta = self._read_meta()
+                try:
+                    self.snapshot = self._map(meta)
+                    return
+                except FileNotFoundError:
+                    # A newer sync removed the files; its meta.json names the current ones
+                    if attempt == _OPEN_ATTEMPTS - 1:
+                        raise
+
+    def _map(self, meta: Optional[Dict[str, Any]]) -> IndexSnapshot:
+        """Map the data files named by meta.json."""
+        if meta is None:
+            return _EMPTY_SNAPSHOT
+        files = meta.get("files", _UNVERSIONED_FILES)
+        if meta["count"] == 0:
+            return _EMPTY_SNAPSHOT._replace(version=meta["version"], files=files)
+        return IndexSnapshot(
+            vectors=np.memmap(
+                self._path(files["vectors"]), dtype=np.float32, mode="r",
+                shape=(meta["count"], meta["dimensions"])
+            ),
+            # Unversioned ids and hashes files may be ahead of meta.json,
+            # but still match it by prefix as slots are only appended
+            ids=np.load(self._path(files["ids"]))[:meta["count"]],
+            hashes=np.load(self._path(files["hashes"]))[:meta["count"]],
+            version=meta["version"],
+            files=files
+        )
+
+    def refresh(self) -> IndexSnapshot:
+        """
+        Reopen the index if the model changed or another process synced it.
+
+        Returns:
+            The current snapshot
+        """
+        if self._model != get_settings().embedding_model:
+            self.open()
+        else:
+            meta = self._read_meta()
+            if (meta["version"] if meta else -1) != self.snapshot.version:
+                self.open()
+        return self.snapshot
+
+    def status(self) -> Dict[str, Any]:
+        """Model, size and location of the index."""
+        snapshot = self.refresh()
+        return {
+            "model": self._model,
+            "path": _index_directory(self._model),
+            "version": snapshot.version,
+            "rows": int((snapshot.ids >= 0).sum()),
+            "tombstones": int((snapshot.ids < 0).sum()),
+            "dimensions": None if snapshot.vectors is None else int(snapshot.vectors.shape[1])
+        }
+
+    def search(self, queries: np.ndarray, limit: int) -> List[List[Tuple[int, float]]]:
+        """
+        Find the most similar questions for a batch of normalized query vectors.
+
+        Args:
+            queries: Array of shape (number of queries, dimensions)
+            limit: Results per query
+
+        Returns:
+            Per query, (question id, cosine similarity) pairs, most similar first
+        """
+        snapshot = self.refresh()
+        vectors, ids = snapshot.vectors, snapshot.ids
+        if vectors is None:
+            return [[] for _ in queries]
+        if queries.shape[1] != vectors.shape[1]:
+            raise ValueError(
+                f"Query dimensions {queries.shape[1]} do not match the index ({vectors.shape[1]})"
+            )
+
+        # Running top-k per query, merged with the top-k of every block
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(vectors), _SEARCH_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + _SEARCH_BLOCK_ROWS])
+            scores = queries @ block.T
+            scores[:, ids[start:start + len(block)] < 0] = -np.inf
+            if scores.shape[1] > limit:
+                top = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+                scores = np.take_along_axis(scores, top, axis=1)
+            else:
+                top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            if best_scores.shape[1] > limit:
+                keep = np.argpartition(-best_scores, limit - 1, axis=1)[:, :limit]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return [
+            [(int(ids[row]), float(score))
+             for row, score in zip(rows, scores) if np.isfinite(score)]
+            for rows, scores in zip(best_rows, best_scores)
+        ]
+
+    @contextmanager
+    def _sync_lock(self):
+        """Serialize syncs within this process and, where supported, across workers."""
+        directory = _index_directory(get_settings().embedding_model)
+        os.makedirs(directory, exist_ok=True)
+        with self._sync_mutex, open(os.path.join(directory, "sync.lock"), "wb") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def sync(self, db: Session, rebuild: bool = False) -> Dict[str, Any]:
+        """
+        Bring the index up to date with the questions table.
+        Searches keep using the previous snapshot until the sync is published.
+
+        Args:
+            db: Database session
+            rebuild: Rewrite the whole index, dropping tombstones
+
+        Returns:
+            Numbers of added, updated, removed and unchanged questions
+        """
+        rows = db.query(Question.id, Question.content).order_by(Question.id).all()
+        with self._sync_lock():
+            # Another worker may have synced while this one waited for the lock
+            snapshot = self.refresh()
+            hashes = np.array([content_hash(content)[:32] for _, content in rows],
+                              dtype=_HASH_DTYPE)
+            slots = {int(question_id): slot for slot, question_id in enumerate(snapshot.ids)
+                     if question_id >= 0}
+            current_ids = {question_id for question_id, _ in rows}
+
+            added = [i for i, (question_id, _) in enumerate(rows) if question_id not in slots]
+            updated = [i for i, (question_id, _) in enumerate(rows)
+                       if question_id in slots and snapshot.hashes[slots[question_id]] != hashes[i]]
+            removed = [slot for question_id, slot in slots.items()
+                       if question_id not in current_ids]
+            result = {
+                "model": self._model,
+                "rebuilt": rebuild or snapshot.vectors is None,
+                "added": len(added),
+                "updated": len(updated),
+                "removed": len(removed),
+                "unchanged": len(rows) - len(added) - len(updated)
+            }
+
+            if result["rebuilt"]:
+                self._write_all(rows, hashes, get_question_embeddings(db, rows), snapshot.version)
+            elif added or updated or removed:
+                changed = [rows[i] for i in added + updated]
+                vectors = get_question_embeddings(db, changed)
+                if changed and vectors.shape[1] != snapshot.vectors.shape[1]:
+                    # The model now returns another dimension: the old slots are unusable
+                    result["rebuilt"] = True
+                    self._write_all(rows, hashes, get_question_embeddings(db, rows),
+                                    snapshot.version)
+                else:
+                    self._write_changes(
+                        snapshot, rows, hashes, (added, updated, removed), slots, vectors
+                    )
+            else:
+                return result
+            self.open()
+        return result
+
+    def _write_all(self, rows, hashes: np.ndarray, vectors: np.ndarray, version: int) -> None:
+        """Write a complete index under the file names of the next version."""
+        ids = np.array([question_id for question_id, _ in rows], dtype=np.int64)
+        files = _versioned_files(version + 1)
+        _write_atomic(self._path(files["vectors"]), lambda file: file.write(vectors.tobytes()))
+        _write_atomic(self._path(files["ids"]), lambda file: np.save(file, ids))
+        _write_atomic(self._path(files["hashes"]), lambda file: np.save(file, hashes))
+        self._write_meta(len(ids), vectors.shape[1] if len(ids) else 0, version, files)
+
+    def _write_changes(self,
+                       snapshot: IndexSnapshot,
+                       rows,
+                       hashes: np.ndarray,
+                       changes: Tuple[List[int], List[int], List[int]],
+                       slots: Dict[int, int],
+                       vectors: np.ndarray) -> None:
+        """
+        Overwrite updated slots, tombstone removed ones and append added rows.
+        vectors holds the added rows followed by the updated ones.
+        The vectors file is changed in place; ids and hashes get new files.
+        """
+        added, updated, removed = changes
+        ids, slot_hashes = snapshot.ids.copy(), snapshot.hashes.copy()
+        vectors_path = self._path(snapshot.files["vectors"])
+        if updated or removed:
+            mapped = np.memmap(vectors_path, dtype=np.float32, mode="r+",
+                               shape=snapshot.vectors.shape)
+            for offset, index in enumerate(updated, start=len(added)):
+                slot = slots[rows[index][0]]
+                mapped[slot] = vectors[offset]
+                slot_hashes[slot] = hashes[index]
+            mapped[removed] = 0
+            ids[removed] = -1
+            mapped.flush()
+            del mapped
+        if added:
+            with open(vectors_path, "r+b") as file:
+                # Append after the published rows: rows left behind by an
+                # interrupted sync are overwritten instead of shifting the slots
+                file.seek(snapshot.vectors.nbytes)
+                file.write(np.ascontiguousarray(vectors[:len(added)]).tobytes())
+                file.truncate()
+            ids = np.concatenate([ids, np.array([rows[i][0] for i in added], dtype=np.int64)])
+            slot_hashes = np.concatenate([slot_hashes, hashes[added]])
+        files = {**_versioned_files(snapshot.version + 1), "vectors": snapshot.files["vectors"]}
+        _write_atomic(self._path(files["ids"]), lambda file: np.save(file, ids))
+        _write_atomic(self._path(files["hashes"]), lambda file: np.save(file, slot_hashes))
+        self._write_meta(len(ids), snapshot.vectors.shape[1], snapshot.version, files)
+
+    def _write_meta(self, count: int, dimensions: int, version: int,
+                    files: Dict[str, str]) -> None:
+        """
+        Publish a new version; readers reopen the index when they see it.
+        Data files of older versions are removed, except those of the previous
+        version, which readers may still be opening.
+        """
+        previous = self.snapshot.files
+        meta = {
+            "model": self._model,
+            "dimensions": int(dimensions),
+            "count": int(count),
+            "version": version + 1,
+            "files": files
+        }
+        _write_atomic(self._path("meta.json"),
+                      lambda file: file.write(json.dumps(meta).encode("utf-8")))
+
+        keep = set(files.values()) | set(previous.values())
+        directory = _index_directory(self._model)
+        for name in os.listdir(directory):
+            if _DATA_FILE.match(name) and name not in keep:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError as e:
+                    # e.g. still mapped on Windows; removed after a later sync
+                    logger.debug("Could not remove old index file %s: %s", name, e)
+
+
+EMBEDDING_INDEX = EmbeddingIndex()
+
+
+def sync_embedding_index(rebuild: bool = False) -> Dict[str, Any]:
+    """
+    Sync the embedding index with its own database session,
+    for use outside of requests (startup, import script).
+    """
+    with SessionLocal() as db:
+        return EMBEDDING_INDEX.sync(db, rebuild=rebuild)
+
+
+async def _sync_in_background() -> None:
+    """Sync the index in a worker thread; failures only postpone it to the next sync."""
+    try:
+        result = await asyncio.to_thread(sync_embedding_index)
+        logger.info("Embedding index synced: %s", result)
+    except (HTTPException, SQLAlchemyError, OSError) as e:
+        logger.warning("Embedding index sync failed: %s", getattr(e, "detail", e))
+
+
+def start_embedding_index() -> Optional["asyncio.Task[None]"]:
+    """
+    Map the embedding index and, if embedding.sync_on_startup is set, start
+    syncing it in the background. Must be called from within the running event loop.
+    """
+    EMBEDDING_INDEX.open()
+    if not get_settings().embedding_sync_on_startup:
+        return None
+    return asyncio.create_task(_sync_in_background())
@@ -0,0 +1,141 @@
+"""
+warmup_services.py
+This module pre-loads the configured LLM models when the application starts
+and keeps them resident, so the first generation request does not wait for
+Ollama to load a model into memory.
+
+Loading a model is done with an empty-prompt generate request carrying a
+keep_alive value and the default generation options. Ollama reloads a model
+whose context size (num_ctx) differs from the loaded one, so the warm-up must
+load it with the options real calls send. The result of the last load per model is kept in memory and
+reported by the health endpoint.
+"""
+import asyncio
+from datetime import datetime
+from threading import Lock
+from typing import Any, Dict, List, Optional
+import requests
+
+from backend.config import get_settings
+from backend.services.llm_services import get_generation_options, get_routed_models
+
+
+class ModelResidency:
+    """
+    Thread-safe record of which models are loaded and when they were last refreshed.
+    """
+    def __init__(self):
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._lock = Lock()
+
+    def record(self, model: str, ready: bool, error: Optional[str] = None) -> None:
+        """Store the outcome of a load attempt for a model."""
+        with self._lock:
+            entry = self._models.setdefault(model, {"ready": False, "loaded_at": None})
+            entry["ready"] = ready
+            entry["error"] = error
+            if ready:
+                entry["loaded_at"] = datetime.now().isoformat()
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Return a copy of the per-model status."""
+        with self._lock:
+            return {model: dict(entry) for model, entry in self._models.items()}
+
+    def is_ready(self, models: List[str]) -> bool:
+        """Check whether all given models are currently loaded."""
+        with self._lock:
+            return all(self._models.get(model, {}).get("ready") for model in models)
+
+
+MODEL_RESIDENCY = ModelResidency()
+
+
+def get_warmup_models() -> List[str]:
+    """
+    Return the models that should be kept resident: llm.model and every routed model.
+    """
+    models = [get_settings().llm_model]
+    models.extend(model for model in get_routed_models() if model not in models)
+    return models
+
+
+def load_model(model: str) -> bool:
+    """
+    Ask Ollama to load a model and keep it resident for the configured keep_alive.
+
+    Returns:
+        True if the model was loaded
+    """
+    settings = get_settings()
+    payload = {
+        "model": model,
+        "prompt": "",
+        "stream": False,
+        "keep_alive": settings.warmup_keep_alive,
+        # Same num_ctx as the generation calls, so they find the model loaded as is
+        "options": get_generation_options("default").to_ollama_options()
+    }
+    try:
+        response = requests.post(
+            f"{settings.llm_base_url}/api/generate",
+            json=payload,
+            timeout=settings.warmup_timeout
+        )
+        response.close()
+        if response.status_code != 200:
+            MODEL_RESIDENCY.record(model, False, f"HTTP {response.status_code}")
+            return False
+    except requests.RequestException as e:
+        MODEL_RESIDENCY.record(model, False, str(e))
+        return False
+
+    MODEL_RESIDENCY.record(model, True)
+    return True
+
+
+def warm_up_models() -> bool:
+    """
+    Load every configured model.
+
+    Returns:
+        True if all models are resident
+    """
+    return all([load_model(model) for model in get_warmup_models()])
+
+
+def models_ready() -> bool:
+    """
+    Check whether the application is ready to serve generation requests.
+    Always true when warm-up is disabled.
+    """
+    if not get_settings().warmup_enabled:
+        return True
+    return MODEL_RESIDENCY.is_ready(get_warmup_models())
+
+
+async def keep_models_resident() -> None:
+    """
+    Warm up the models, then refresh their residency periodically.
+    Failed loads are retried on the next round.
+    """
+    settings = get_settings()
+    while True:
+        await asyncio.to_thread(warm_up_models)
+        if models_ready():
+            if settings.warmup_refresh_interval <= 0:
+                return
+            delay = settings.warmup_refresh_interval
+        else:
+            delay = settings.warmup_retry_interval
+        await asyncio.sleep(delay)
+
+
+def start_model_residency() -> Optional["asyncio.Task[None]"]:
+    """
+    Start the background warm-up task if warm-up is enabled.
+    Must be called from within the running event loop.
+    """
+    if not get_settings().warmup_enabled:
+        return None
+    return asyncio.create_task(keep_models_resident())
@@ -0,0 +1,108 @@
+"""
+writeback_services.py
+This module buffers the results of bulk generation runs and writes them back to
+the database in batches.
+
+Each flush runs one parameterized UPDATE (or INSERT) as an executemany over the buffered
+rows and commits, so SQLite's write lock is only held for the duration of a
+batch instead of the whole run, and completed batches survive a later failure.
+"""
+import time
+from typing import Any, Dict, List, Optional
+from sqlalchemy import insert, update, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Executable
+
+from backend.config import get_settings
+from backend.models import GenerationOutcome, Question
+
+
+class BulkWriter:
+    """
+    Buffers parameter sets for a single UPDATE statement and flushes them as one
+    executemany when the batch is full or the flush interval has elapsed.
+
+    Use as a context manager so the remaining rows are flushed at the end:
+
+        with question_writer(db) as writer:
+            writer.add({"id": 1, "answer": "..."})
+    """
+    def __init__(self,
+                 db: Session,
+                 statement: Executable,
+                 batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None):
+        settings = get_settings()
+        self.db = db
+        self.statement = statement
+        self.batch_size = batch_size or settings.writeback_batch_size
+        self.flush_interval = flush_interval if flush_interval is not None \
+            else settings.writeback_flush_interval
+        self.written = 0
+        self.failures: List[Dict[str, Any]] = []
+        self._buffer: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+
+    def add(self, params: Dict[str, Any]) -> None:
+        """
+        Buffer one row's parameters, flushing if the batch is due.
+        """
+        self._buffer.append(params)
+        if (len(self._buffer) >= self.batch_size or
+                time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write all buffered rows with one executemany and commit.
+        On a database error the batch is rolled back and recorded in failures.
+        """
+        batch, self._buffer = self._buffer, []
+        self._last_flush = time.monotonic()
+        if not batch:
+            return
+        try:
+            self.db.execute(self.statement, batch)
+            self.db.commit()
+            self.written += len(batch)
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            self.failures.extend(
+                {"id": params.get("id"), "error": f"Database error: {str(e)}"}
+                for params in batch
+            )
+
+    def __enter__(self) -> "BulkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.flush()
+
+
+def question_writer(db: Session) -> BulkWriter:
+    """
+    Create a writer for updates of the questions table keyed by "id".
+    Each parameter set holds the id plus the columns to update.
+    """
+    return BulkWriter(db, update(Question))
+
+
+def content_group_writer(db: Session, table_name: str) -> BulkWriter:
+    """
+    Create a writer setting question, correct_answer and updated_at on rows
+    of a content group table, keyed by "id".
+    """
+    statement = text(f"""
+        UPDATE {table_name}
+        SET question = :question, correct_answer = :answer, updated_at = :updated_at
+        WHERE id = :id
+    """)
+    return BulkWriter(db, statement)
+
+
+def outcome_writer(db: Session) -> BulkWriter:
+    """
+    Create a writer inserting rows into generation_outcomes.
+    """
+    return BulkWriter(db, insert(GenerationOutcome))
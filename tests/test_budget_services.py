@@ -0,0 +1,62 @@
+from dataclasses import replace
+
+import pytest
+
+from backend.config import get_settings
+from backend.services import budget_services
+from backend.services.budget_services import (
+    estimate_tokens,
+    split_to_budget,
+    truncate_to_budget
+)
+
+
+@pytest.fixture(autouse=True)
+def four_chars_per_token(monkeypatch):
+    settings = replace(get_settings(), input_chars_per_token=4)
+    monkeypatch.setattr(budget_services, "get_settings", lambda: settings)
+
+
+def _without_spaces(text):
+    return "".join(text.split())
+
+
+def test_text_within_budget_is_one_part():
+    assert split_to_budget("  Short content.  ", 10) == ["Short content."]
+
+
+def test_parts_are_packed_from_paragraphs_and_sentences():
+    text = ("First sentence here. Second sentence here.\n\n"
+            "Third sentence is here. Fourth one is here.")
+    parts = split_to_budget(text, 12)
+    assert len(parts) > 1
+    assert all(estimate_tokens(part) <= 12 for part in parts)
+    assert " ".join(parts).split() == text.split()
+
+
+def test_oversized_word_is_sliced_not_truncated():
+    word = "x" * 100
+    parts = split_to_budget(word, 10)
+    assert all(estimate_tokens(part) <= 10 for part in parts)
+    assert "".join(parts) == word
+
+
+def test_cjk_paragraph_is_split_without_losing_content():
+    sentence = "雷暴天气时应避免起飞并等待天气好转后再执行飞行任务" * 6 + "。"
+    text = sentence * 33
+    parts = split_to_budget(text, 768)
+    assert len(parts) > 1
+    assert all(estimate_tokens(part) <= 768 for part in parts)
+    assert _without_spaces("".join(parts)) == _without_spaces(text)
+
+
+def test_cjk_text_without_punctuation_keeps_every_character():
+    text = "雷" * 5100
+    parts = split_to_budget(text, 768)
+    assert all(estimate_tokens(part) <= 768 for part in parts)
+    assert "".join(parts) == text
+
+
+def test_truncate_keeps_the_leading_part():
+    text = "First sentence here. Second sentence here. Third sentence here."
+    assert truncate_to_budget(text, 6) == "First sentence here."
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from backend.models import GenerationOutcome, Question, STATUS_DONE, STATUS_FAILED
+from backend.schemas import ContentGroupQuestionOutput, KnowledgeOutput, QAOutput
+from backend.services import bulk_services
+from backend.services.generation_services import GenerationResult
+from backend.services.writeback_services import BulkWriter, question_writer
+
+
+@pytest.fixture
+def questions(db):
+    contents = [
+        "Avoid thunderstorms by at least 20 nautical miles when flying above them.",
+        "Avoid thunderstorms by at least 20 nautical miles when flying above them!",
+        "Check the fuel system pressure before every flight.",
+    ]
+    db.add_all(Question(id=index + 1, content=content) for index, content in enumerate(contents))
+    db.commit()
+    return [(index + 1, content) for index, content in enumerate(contents)]
+
+
+@pytest.fixture(autouse=True)
+def llm_available(monkeypatch):
+    monkeypatch.setattr(bulk_services, "wait_for_llm", lambda: True)
+
+
+def _statuses(db, column):
+    db.expire_all()
+    return {question.id: getattr(question, column) for question in db.query(Question)}
+
+
+def _failing_first_writer(monkeypatch):
+    """Make the first question writer of a run fail every batch it writes."""
+    calls = []
+
+    def writer(db):
+        calls.append(db)
+        if len(calls) == 1:
+            return BulkWriter(db, text("UPDATE missing_table SET x = :id"))
+        return question_writer(db)
+    monkeypatch.setattr(bulk_services, "question_writer", writer)
+
+
+def test_knowledge_rows_whose_write_failed_are_marked_failed(db, questions, monkeypatch):
+    monkeypatch.setattr(bulk_services, "generate", lambda task, content, row_id=None: GenerationResult(
+        KnowledgeOutput.model_construct(knowledge_point=f"Point {row_id}"), "", "v1"
+    ))
+    _failing_first_writer(monkeypatch)
+
+    result = bulk_services.generate_knowledge_bulk(db, questions)
+
+    assert result["success_count"] == 0
+    assert result["failure_count"] == 3
+    assert set(_statuses(db, "knowledge_status").values()) == {STATUS_FAILED}
+
+
+def test_knowledge_cluster_errors_report_duplicates(db, questions, monkeypatch):
+    def generate(task, content, row_id=None):
+        if row_id == 1:
+            raise HTTPException(status_code=500, detail="down")
+        return GenerationResult(KnowledgeOutput.model_construct(knowledge_point="Fuel"), "", "v1")
+    monkeypatch.setattr(bulk_services, "generate", generate)
+
+    result = bulk_services.generate_knowledge_bulk(db, questions)
+
+    assert sorted(failure["id"] for failure in result["failures"]) == [1, 2]
+    assert _statuses(db, "knowledge_status") == {1: STATUS_FAILED, 2: STATUS_FAILED, 3: STATUS_DONE}
+
+
+def test_qa_rows_whose_write_failed_are_marked_failed(db, questions, monkeypatch):
+    monkeypatch.setattr(bulk_services, "generate", lambda task, content, row_id=None: GenerationResult(
+        QAOutput.model_construct(question="Q?", answer="A."), "", "v1"
+    ))
+    _failing_first_writer(monkeypatch)
+
+    result = bulk_services.generate_qa_bulk(db, questions)
+
+    assert result["failure_count"] == 3
+    assert set(_statuses(db, "qa_status").values()) == {STATUS_FAILED}
+
+
+def test_content_group_job_prunes_expired_outcomes(db, monkeypatch):
+    db.execute(text(
+        "CREATE TABLE content_group_2 (id INTEGER PRIMARY KEY, content1 TEXT, content2 TEXT, "
+        "question TEXT, correct_answer TEXT, updated_at DATETIME)"
+    ))
+    db.execute(text("INSERT INTO content_group_2 (id, content1, content2) VALUES (1, 'a', 'b')"))
+    now = datetime.now()
+    db.add_all([
+        GenerationOutcome(job_id="old", table_name="content_group_2", row_id=1,
+                          status="success", created_at=now - timedelta(days=30)),
+        GenerationOutcome(job_id="recent", table_name="content_group_2", row_id=1,
+                          status="success", created_at=now - timedelta(days=1)),
+    ])
+    db.commit()
+    monkeypatch.setattr(bulk_services, "generate", lambda task, content, row_id=None: GenerationResult(
+        ContentGroupQuestionOutput.model_construct(question="Which?"), "", "v1"
+    ))
+    rows = db.execute(text("SELECT * FROM content_group_2")).mappings().all()
+
+    result = bulk_services.generate_content_group_bulk(db, "content_group_2", rows, job_id="new")
+
+    assert result["success_count"] == 1
+    jobs = {outcome.job_id for outcome in db.query(GenerationOutcome)}
+    assert jobs == {"recent", "new"}
@@ -0,0 +1,35 @@
+from backend.services.dedup_services import cluster_near_duplicates
+
+
+def test_near_duplicates_are_clustered():
+    texts = [
+        "Check the fuel system pressure before every flight.",
+        "Check the fuel system pressure before every flight!",
+        "Avoid take-off during thunderstorms.",
+    ]
+    assert cluster_near_duplicates(texts) == [[0, 1], [2]]
+
+
+def test_non_latin_texts_are_not_merged():
+    texts = [
+        "雷暴天气时避免起飞",
+        "检查燃油系统压力",
+        "—",
+        "…",
+        "Überprüfen Sie den Kraftstoffdruck vor jedem Flug",
+        "Vérifiez la pression du système carburant",
+    ]
+    assert cluster_near_duplicates(texts) == [[index] for index in range(len(texts))]
+
+
+def test_non_latin_near_duplicates_are_clustered():
+    texts = [
+        "雷暴天气时应避免起飞，并等待天气好转后再执行飞行任务",
+        "雷暴天气时应避免起飞，并等待天气好转后再执行飞行任务。",
+        "检查燃油系统压力",
+    ]
+    assert cluster_near_duplicates(texts) == [[0, 1], [2]]
+
+
+def test_texts_without_words_stay_singletons():
+    assert cluster_near_duplicates(["", "—", "...", "—"]) == [[0], [1], [2], [3]]
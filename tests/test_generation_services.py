@@ -0,0 +1,91 @@
+import json
+from dataclasses import replace
+
+from backend.config import get_settings
+from backend.services import generation_services, llm_services
+from backend.services.generation_services import TASKS, get_prompt_version, get_task_prompts
+
+
+def _settings(structured_output: bool):
+    return replace(get_settings(), structured_output=structured_output)
+
+
+def test_structured_prompts_do_not_ask_for_free_text():
+    for task in TASKS:
+        system, _ = get_task_prompts(task, _settings(True))
+        assert "Format your response" not in system
+        assert "Respond only with a JSON object" in system
+
+
+def test_free_text_prompts_have_no_json_instruction():
+    system, _ = get_task_prompts("qa", _settings(False))
+    assert "Question: [your generated question]" in system
+    assert "JSON" not in system
+
+
+def test_prompt_version_depends_on_output_mode():
+    for task in TASKS:
+        assert get_prompt_version(task, _settings(True)) != get_prompt_version(task, _settings(False))
+
+
+class _StreamResponse:
+    """Streamed Ollama response: a JSON object in chunks, then the final message."""
+    def __init__(self, chunks, final):
+        self.lines = [json.dumps({"response": chunk, "done": False}) for chunk in chunks]
+        self.lines.append(json.dumps({"response": "", "done": True, **final}))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        yield from (line.encode() for line in self.lines)
+
+
+def test_structured_generation_keeps_ollama_statistics(monkeypatch):
+    final = {"prompt_eval_count": 42, "prompt_eval_duration": 1000,
+             "eval_count": 3, "eval_duration": 2000, "load_duration": 5, "total_duration": 3005}
+    monkeypatch.setattr(
+        llm_services.requests, "post",
+        lambda url, json, stream, timeout: _StreamResponse(
+            ['{"question": "Q?", ', '"answer": "A."}'], final
+        )
+    )
+    monkeypatch.setattr(generation_services, "get_settings", lambda: _settings(True))
+    recorded = []
+    monkeypatch.setattr(generation_services.LLM_STATS, "record",
+                        lambda task, result, *args: recorded.append(result))
+
+    result = generation_services.generate("qa", "Content")
+
+    assert (result.output.question, result.output.answer) == ("Q?", "A.")
+    assert recorded[0].done
+    assert recorded[0].prompt_eval_count == 42
+    assert recorded[0].load_duration == 5
+
+
+def test_truncated_structured_response_is_retried_with_a_larger_budget(monkeypatch):
+    responses = ['{"knowledge_point": "Pilots must avoid thunderstorms by',
+                 '{"knowledge_point": "Pilots must avoid thunderstorms by 20 miles."}']
+    budgets = []
+
+    def call_llm(prompt, model=None, options=None, output_format=None, system=None):
+        budgets.append(options.num_predict)
+        return llm_services.LLMResult(text=responses[len(budgets) - 1], model=model, done=True)
+
+    settings = replace(_settings(True), structured_retries=1)
+    monkeypatch.setattr(generation_services, "get_settings", lambda: settings)
+    monkeypatch.setattr(generation_services, "call_llm", call_llm)
+    monkeypatch.setattr(generation_services.LLM_STATS, "record", lambda *args: None)
+
+    result = generation_services.generate("knowledge", "Content")
+
+    assert result.output.knowledge_point == "Pilots must avoid thunderstorms by 20 miles."
+    base = generation_services.get_generation_options("knowledge").num_predict
+    assert budgets[0] == base + settings.structured_extra_tokens
+    assert budgets[1] == budgets[0] * 2
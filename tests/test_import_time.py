@@ -0,0 +1,46 @@
+import json
+import subprocess
+import sys
+
+# Modules the CLI importer and worker processes must not pay for at import time
+HEAVY_MODULES = ("fastapi", "numpy", "requests", "yaml")
+
+# Importing a CLI entry point may take at most this share of importing the whole app
+MAX_SHARE_OF_APP_IMPORT = 0.7
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+from backend.config import _load_settings
+from backend.database import get_engine
+print(json.dumps({{
+    "seconds": elapsed,
+    "modules": sorted(name for name in {heavy!r} if name in sys.modules),
+    "settings_loaded": _load_settings.cache_info().currsize > 0,
+    "engine_created": get_engine.cache_info().currsize > 0,
+}}))
+"""
+
+
+def _probe(module: str) -> dict:
+    """Import a module in a fresh interpreter and report what the import did."""
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_importer_import_is_lightweight():
+    result = _probe("backend.import_docx_to_db")
+    assert result["modules"] == []
+    assert not result["settings_loaded"]
+    assert not result["engine_created"]
+
+
+def test_importer_import_time_budget():
+    importer = min(_probe("backend.import_docx_to_db")["seconds"] for _ in range(3))
+    app = min(_probe("backend.main")["seconds"] for _ in range(3))
+    assert importer <= app * MAX_SHARE_OF_APP_IMPORT, (importer, app)
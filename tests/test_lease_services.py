@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend.crud import question_filters
+from backend.models import Question, STATUS_PENDING
+from backend.services import lease_services
+from backend.services.lease_services import claim_rows, keep_leases, renew_leases
+
+TABLE = Question.__table__
+CONDITIONS = question_filters("knowledge", statuses=[STATUS_PENDING])
+
+
+@pytest.fixture
+def questions(db):
+    db.add_all(Question(id=index, content=f"Content {index}") for index in range(1, 101))
+    db.commit()
+
+
+def _claim(db, owner, lease_seconds=600, limit=10):
+    return claim_rows(db, "knowledge", TABLE, CONDITIONS, owner, limit, lease_seconds)
+
+
+def test_concurrent_claims_are_disjoint(db, questions):
+    url = db.get_bind().url
+    start = threading.Barrier(4)
+    claimed = {}
+
+    def worker(owner):
+        engine = create_engine(url, connect_args={"timeout": 30})
+        ids = []
+        with Session(engine) as session:
+            start.wait()
+            while batch := _claim(session, owner, limit=7):
+                ids.extend(batch)
+        engine.dispose()
+        claimed[owner] = ids
+
+    threads = [threading.Thread(target=worker, args=(f"worker-{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    all_ids = [row_id for ids in claimed.values() for row_id in ids]
+    assert sorted(all_ids) == list(range(1, 101))
+
+
+def test_expired_leases_are_claimed_again(db, questions):
+    assert _claim(db, "first", lease_seconds=0.01) == list(range(1, 11))
+    time.sleep(0.05)
+    assert _claim(db, "second") == list(range(1, 11))
+
+
+def test_renewed_leases_are_not_claimed_again(db, questions):
+    _claim(db, "first", lease_seconds=0.01)
+    assert renew_leases(db, "first", 600) == 10
+    time.sleep(0.05)
+    assert _claim(db, "second") == list(range(11, 21))
+
+
+def test_keep_leases_renews_while_the_worker_runs(db, questions, monkeypatch):
+    monkeypatch.setattr(lease_services, "SessionLocal", lambda: Session(db.get_bind()))
+    with keep_leases("first", 0.3):
+        _claim(db, "first", lease_seconds=0.3)
+        time.sleep(1)
+        assert _claim(db, "second") == list(range(11, 21))
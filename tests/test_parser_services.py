@@ -0,0 +1,71 @@
+import pytest
+
+from backend.schemas import ContentGroupQuestionOutput, QAOutput
+from backend.services.parser_services import (
+    StructuredOutputError,
+    clean_knowledge_point,
+    decode_structured_response,
+    knowledge_complete
+)
+
+
+def test_knowledge_point_keeps_first_paragraph():
+    response = "Pilots must avoid thunderstorms by 20 miles.\n\nThis is important because..."
+    assert knowledge_complete(response)
+    assert clean_knowledge_point(response) == "Pilots must avoid thunderstorms by 20 miles."
+
+
+def test_knowledge_point_after_introduction_is_kept():
+    response = "Here is the key knowledge point:\n\nPilots must avoid thunderstorms by 20 miles."
+    assert not knowledge_complete(response)
+    assert clean_knowledge_point(response) == response
+
+
+def test_knowledge_point_after_leading_blank_lines_is_kept():
+    response = "\n\n  the key knowledge point is pilots must avoid thunderstorms."
+    assert not knowledge_complete(response)
+    assert clean_knowledge_point(response) == "Pilots must avoid thunderstorms."
+
+
+def test_knowledge_stream_is_incomplete_until_paragraph_ends():
+    assert not knowledge_complete("Pilots must avoid")
+    assert not knowledge_complete("Pilots must avoid thunderstorms.\n")
+    assert knowledge_complete("Pilots must avoid thunderstorms.\n \nMore")
+
+
+# ----------------------
+# Structured responses
+# ----------------------
+
+
+def test_decode_strips_fields_and_ignores_surrounding_text():
+    response = 'Sure! {"question": "  What is X? ", "answer": "Y\\n"} Hope this helps {'
+    output = decode_structured_response(response, QAOutput)
+    assert (output.question, output.answer) == ("What is X?", "Y")
+
+
+def test_decode_ignores_braces_and_quotes_inside_strings():
+    response = '{"question": "Which set is {a, \\"b\\"}?"}'
+    output = decode_structured_response(response, ContentGroupQuestionOutput)
+    assert output.question == 'Which set is {a, "b"}?'
+
+
+def test_decode_decodes_only_the_first_object():
+    response = '{"question": "First?"}\n{"question": "Second?"}'
+    assert decode_structured_response(response, ContentGroupQuestionOutput).question == "First?"
+
+
+@pytest.mark.parametrize("response", [
+    "Question: What is X?",
+    '{"question": "What is X?"',
+    "{'question': 'What is X?'}",
+])
+def test_decode_rejects_responses_without_a_json_object(response):
+    with pytest.raises(StructuredOutputError) as error:
+        decode_structured_response(response, ContentGroupQuestionOutput)
+    assert error.value.response == response
+
+
+def test_decode_rejects_schema_violations():
+    with pytest.raises(StructuredOutputError):
+        decode_structured_response('{"question": "What is X?"}', QAOutput)
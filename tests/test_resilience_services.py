@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+from dataclasses import replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.config import get_settings
+from backend.services import llm_services, resilience_services
+from backend.services.resilience_services import CircuitBreaker, LatencyTracker
+
+
+@pytest.fixture
+def breaker_settings(monkeypatch):
+    settings = replace(get_settings(), breaker_enabled=True, hedging_enabled=False,
+                       breaker_failure_threshold=3, breaker_reset_timeout=0.05)
+    monkeypatch.setattr(resilience_services, "get_settings", lambda: settings)
+    monkeypatch.setattr(llm_services, "get_settings", lambda: settings)
+    return settings
+
+
+def _open(breaker):
+    for _ in range(3):
+        breaker.record_failure()
+
+
+def test_breaker_opens_at_threshold(breaker_settings):
+    breaker = CircuitBreaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open()
+    assert not breaker.allow()
+    assert breaker.retry_after() > 0
+
+
+def test_breaker_admits_one_trial_after_timeout(breaker_settings):
+    breaker = CircuitBreaker()
+    _open(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert not breaker.is_open()
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens_circuit(breaker_settings):
+    breaker = CircuitBreaker()
+    _open(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open()
+    assert not breaker.allow()
+
+
+def test_released_trial_keeps_circuit_open(breaker_settings):
+    breaker = CircuitBreaker()
+    _open(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.release_trial()
+    # The slot is free for the next trial, but a failure reopens at once
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open()
+
+
+def test_unexpected_error_in_trial_does_not_close_circuit(breaker_settings, monkeypatch):
+    breaker = CircuitBreaker()
+    monkeypatch.setattr(llm_services, "LLM_CIRCUIT_BREAKER", breaker)
+
+    def broken_generate(*args, **kwargs):
+        raise ValueError("malformed stream")
+
+    monkeypatch.setattr(llm_services, "_stream_generate", broken_generate)
+    _open(breaker)
+    time.sleep(0.06)
+
+    with pytest.raises(ValueError):
+        llm_services.call_llm("prompt")
+
+    breaker.record_failure()
+    assert breaker.is_open()
+
+
+def test_latency_quantile_needs_min_samples():
+    tracker = LatencyTracker()
+    for seconds in (1.0, 2.0):
+        tracker.record("task", seconds)
+    assert tracker.quantile("task", 0.5, min_samples=3) is None
+    assert tracker.quantile("other", 0.5, min_samples=0) is None
+
+
+def test_latency_quantile_picks_from_sorted_durations():
+    tracker = LatencyTracker()
+    for seconds in (5.0, 1.0, 4.0, 2.0, 3.0):
+        tracker.record("task", seconds)
+    assert tracker.quantile("task", 0.0, min_samples=1) == 1.0
+    assert tracker.quantile("task", 0.5, min_samples=1) == 3.0
+    assert tracker.quantile("task", 1.0, min_samples=1) == 5.0
+
+
+def test_latency_window_drops_old_durations():
+    tracker = LatencyTracker(window=3)
+    for seconds in (10.0, 1.0, 2.0, 3.0):
+        tracker.record("task", seconds)
+    assert tracker.quantile("task", 1.0, min_samples=3) == 3.0
+    assert tracker.quantile("task", 1.0, min_samples=4) is None
+
+
+def test_losing_hedged_attempt_is_aborted_while_waiting_for_headers():
+    requests_seen = []
+    hung_client_left = threading.Event()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            requests_seen.append(self.path)
+            if len(requests_seen) == 1:
+                # Never answer; wait for the client to close the connection
+                self.connection.settimeout(5)
+                try:
+                    if self.connection.recv(1) == b"":
+                        hung_client_left.set()
+                except OSError:
+                    pass
+                return
+            body = json.dumps({"response": "Answer", "done": True}).encode() + b"\n"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/api/generate"
+        started_at = time.monotonic()
+        result = llm_services._hedged_generate(url, {"model": "m", "prompt": "p"}, 30, None, 0.1)
+
+        assert result.text == "Answer"
+        assert time.monotonic() - started_at < 5
+        assert hung_client_left.wait(5)
+    finally:
+        server.shutdown()
+        server.server_close()
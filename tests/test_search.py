@@ -0,0 +1,55 @@
+from sqlalchemy import text
+
+from backend.migrations import SEARCH_TABLE, ensure_search_index
+from backend.models import Question, STATUS_DONE
+from backend.routers.search import search
+
+
+def _index(db):
+    ensure_search_index(db.get_bind())
+
+
+def test_snippet_escapes_stored_markup(db):
+    _index(db)
+    db.add(Question(id=1, content='Turbulence <img src=x onerror="alert(1)"> ahead'))
+    db.commit()
+
+    result = search(q="turbulence", fields=None, limit=20, offset=0, db=db)
+
+    snippet = result["results"][0]["snippet"]
+    assert "<img" not in snippet
+    assert "&lt;img src=x onerror=&quot;alert(1)&quot;&gt;" in snippet
+    assert snippet.startswith("<mark>Turbulence</mark>")
+
+
+def test_index_follows_content_updates_only(db):
+    _index(db)
+    db.add(Question(id=1, content="Holding pattern entry"))
+    db.commit()
+
+    db.get(Question, 1).qa_status = STATUS_DONE
+    db.commit()
+    db.get(Question, 1).content = "Crosswind landing technique"
+    db.commit()
+
+    assert search(q="crosswind", fields=None, limit=20, offset=0, db=db)["total"] == 1
+    assert search(q="holding", fields=None, limit=20, offset=0, db=db)["total"] == 0
+
+
+def test_update_trigger_of_existing_database_is_replaced(db):
+    _index(db)
+    db.execute(text(f"DROP TRIGGER {SEARCH_TABLE}_au"))
+    db.execute(text(f"""
+        CREATE TRIGGER {SEARCH_TABLE}_au AFTER UPDATE ON questions
+        BEGIN
+            DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+        END
+    """))
+    db.commit()
+
+    _index(db)
+
+    sql = db.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = :name"
+    ), {"name": f"{SEARCH_TABLE}_au"}).scalar()
+    assert "AFTER UPDATE OF content, knowledge_point, question, answer" in sql
@@ -0,0 +1,121 @@
+import os
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from backend.config import get_settings
+from backend.models import Question
+from backend.routers import search
+from backend.services import vector_index_services
+from backend.services.vector_index_services import EmbeddingIndex
+
+DIMENSIONS = 8
+
+
+def _one_hot(rows, dimensions=DIMENSIONS):
+    """Embedding stub: content "n" is the unit vector of axis n."""
+    vectors = np.zeros((len(rows), dimensions), dtype=np.float32)
+    for index, (_, content) in enumerate(rows):
+        vectors[index, int(content)] = 1.0
+    return vectors
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    settings = replace(get_settings(), embedding_index_path=str(tmp_path / "index"))
+    monkeypatch.setattr(vector_index_services, "get_settings", lambda: settings)
+    monkeypatch.setattr(vector_index_services, "get_question_embeddings",
+                        lambda db, rows: _one_hot(rows))
+    return EmbeddingIndex()
+
+
+def _add_questions(db, contents):
+    db.add_all(Question(id=int(content) + 1, content=content) for content in contents)
+    db.commit()
+
+
+def _top_id(index, axis):
+    return index.search(_one_hot([(None, str(axis))]), 1)[0][0][0]
+
+
+def test_sync_appends_new_questions(db, index):
+    _add_questions(db, "012")
+    index.sync(db)
+    _add_questions(db, "34")
+    assert index.sync(db)["added"] == 2
+    assert [_top_id(index, axis) for axis in range(5)] == [1, 2, 3, 4, 5]
+
+
+def test_rows_of_an_interrupted_sync_do_not_shift_slots(db, index):
+    _add_questions(db, "012")
+    index.sync(db)
+    # A sync that appended vectors but failed before publishing ids and meta.json
+    with open(index._path("vectors.f32"), "ab") as file:
+        file.write(_one_hot([(None, "7"), (None, "7")]).tobytes())
+
+    _add_questions(db, "3")
+    index.sync(db)
+
+    assert [_top_id(index, axis) for axis in range(4)] == [1, 2, 3, 4]
+    assert index.snapshot.vectors.shape == (4, DIMENSIONS)
+
+
+def test_sync_rebuilds_when_the_dimension_changes(db, index, monkeypatch):
+    _add_questions(db, "01")
+    index.sync(db)
+    monkeypatch.setattr(vector_index_services, "get_question_embeddings",
+                        lambda db, rows: _one_hot(rows, DIMENSIONS * 2))
+    _add_questions(db, "2")
+
+    assert index.sync(db)["rebuilt"]
+    assert index.snapshot.vectors.shape == (3, DIMENSIONS * 2)
+
+
+def test_semantic_search_reports_a_dimension_mismatch(db, index, monkeypatch):
+    _add_questions(db, "01")
+    index.sync(db)
+    monkeypatch.setattr(search, "EMBEDDING_INDEX", index)
+    monkeypatch.setattr(search, "embed_texts", lambda texts: np.ones((1, 3), dtype=np.float32))
+
+    with pytest.raises(HTTPException) as error:
+        search.semantic_search(q="thunderstorm", limit=5, db=db)
+    assert error.value.status_code == 503
+
+
+def test_interrupted_rebuild_leaves_the_published_index_intact(db, index, monkeypatch):
+    _add_questions(db, "012")
+    index.sync(db)
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    # A rebuild that wrote its data files but failed before publishing meta.json
+    db.delete(db.get(Question, 1))
+    _add_questions(db, "3")
+    monkeypatch.setattr(index, "_write_meta", fail)
+    with pytest.raises(OSError):
+        index.sync(db, rebuild=True)
+
+    index.open()
+    assert index.snapshot.vectors.shape == (3, DIMENSIONS)
+    assert [_top_id(index, axis) for axis in range(3)] == [1, 2, 3]
+
+
+def test_sync_publishes_new_files_and_removes_old_versions(db, index):
+    _add_questions(db, "0")
+    index.sync(db)
+    first = index.snapshot.files
+    _add_questions(db, "1")
+    index.sync(db, rebuild=True)
+    second = index.snapshot.files
+    _add_questions(db, "2")
+    index.sync(db)
+
+    files = set(os.listdir(os.path.dirname(index._path("meta.json"))))
+    assert second["vectors"] != first["vectors"]
+    assert index.snapshot.files["vectors"] == second["vectors"]
+    assert set(index.snapshot.files.values()) | set(second.values()) <= files
+    assert not set(first.values()) & files
+    assert [_top_id(index, axis) for axis in range(3)] == [1, 2, 3]
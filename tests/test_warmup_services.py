@@ -0,0 +1,20 @@
+from backend.services import warmup_services
+from backend.services.llm_services import get_generation_options
+
+
+class _Response:
+    status_code = 200
+
+    def close(self):
+        pass
+
+
+def test_load_model_sends_the_generation_context_size(monkeypatch):
+    payloads = []
+    monkeypatch.setattr(
+        warmup_services.requests, "post",
+        lambda url, json, timeout: payloads.append(json) or _Response()
+    )
+    assert warmup_services.load_model("llama3.2")
+    for task in ("knowledge", "qa", "content_group"):
+        assert payloads[0]["options"]["num_ctx"] == get_generation_options(task).num_ctx